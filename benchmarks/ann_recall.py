@@ -0,0 +1,46 @@
+import argparse
+import time
+
+import numpy as np
+
+from recog.gallery import FaceGallery
+from recog.ann_index import IVFIndex, recall_latency_report
+
+"""
+    Recall vs latency of IVFIndex against brute force on synthetic encodings.
+
+    Run from the repository root:
+        python -m benchmarks.ann_recall --size 100000 --queries 500
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF index recall/latency report")
+    parser.add_argument('--size', type=int, default=100000, help="gallery size")
+    parser.add_argument('--queries', type=int, default=500, help="number of query faces")
+    parser.add_argument('--noise', type=float, default=0.03, help="query noise (std per dimension)")
+    parser.add_argument('--n-lists', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    encodings = (rng.normal(size=(args.size, 128)) * 0.09).astype(np.float32)
+    gallery = FaceGallery(capacity=args.size)
+    gallery.extend(encodings, [f"person_{i}" for i in range(args.size)])
+
+    # Queries are noisy copies of enrolled faces, like a new camera capture
+    picks = rng.choice(args.size, args.queries)
+    queries = encodings[picks] + rng.normal(size=(args.queries, 128)).astype(np.float32) * args.noise
+
+    index = IVFIndex(n_lists=args.n_lists, seed=args.seed)
+    index.attach(gallery)
+    started = time.perf_counter()
+    index.train()
+    print(f"Trained {len(index.centroids)} lists over {args.size} faces "
+          f"in {time.perf_counter() - started:.2f}s")
+
+    print(f"{'n_probe':>8} {'recall@1':>9} {'ms/query':>9}")
+    for row in recall_latency_report(gallery, index, queries):
+        print(f"{row['n_probe']:>8} {row['recall_at_1']:>9.3f} {row['ms_per_query']:>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import face_recognition
+
+from recog.batch_encoder import BatchEncoder
+from recog.pipeline import encode_faces
+
+"""
+    Batched vs per-frame face encoding benchmark.
+
+    Simulates --cameras cameras, each a thread encoding --frames frames
+    taken from real images (faces are detected once up front, so only
+    encoding is timed). The per-frame path calls encode_faces once per
+    frame like process_frame does; the batched path sends every frame
+    through one shared BatchEncoder for each --batch-sizes value.
+
+    With --workers N both paths run their encoding in a process pool of N
+    workers instead of the calling thread.
+
+    Run from the repository root:
+        python -m benchmarks.bench_batch_encoding --images faces/ --cameras 8 --output batch.json
+
+    Output (JSON):
+        {"meta": {...}, "results": [{"mode", "max_batch", "faces", "seconds",
+          "faces_per_sec", "frame_p50_ms", "frame_p95_ms", "mean_batch"}, ...]}
+"""
+
+
+def load_workload(images, scale, max_images):
+    """(rgb_frame, face_locations) of every image with at least one face"""
+    pattern = os.path.join(images, '*') if os.path.isdir(images) else images
+    workload = []
+    for path in sorted(glob.glob(pattern))[:max_images]:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        if scale != 1.0:
+            frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        locations = face_recognition.face_locations(rgb)
+        if locations:
+            workload.append((rgb, locations))
+    return workload
+
+
+def run(workload, cameras, frames, encode):
+    """Encode frames on one thread per camera, returns (seconds, frame latencies)"""
+    latencies = []
+    lock = threading.Lock()
+
+    def camera(offset):
+        own = []
+        for i in range(frames):
+            rgb, locations = workload[(offset + i) % len(workload)]
+            started = time.perf_counter()
+            encode(rgb, locations)
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=camera, args=(c * 7,)) for c in range(cameras)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched face encoding benchmark")
+    parser.add_argument('--images', required=True, help="image directory or glob with faces")
+    parser.add_argument('--scale', type=float, default=0.5, help="resize factor of the frames")
+    parser.add_argument('--max-images', type=int, default=50)
+    parser.add_argument('--cameras', type=int, default=8)
+    parser.add_argument('--frames', type=int, default=50, help="frames per camera")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[8, 32])
+    parser.add_argument('--max-wait', type=float, default=0.01)
+    parser.add_argument('--workers', type=int, default=0, help="process pool size (0: no pool)")
+    parser.add_argument('--output', default=None, help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    workload = load_workload(args.images, args.scale, args.max_images)
+    if not workload:
+        parser.error("no faces found in the images")
+    faces = sum(len(workload[(c * 7 + i) % len(workload)][1])
+                for c in range(args.cameras) for i in range(args.frames))
+
+    pool = ProcessPoolExecutor(args.workers) if args.workers else None
+    runner = (lambda fn, *fn_args: pool.submit(fn, *fn_args).result()) if pool else None
+
+    modes = [('per_frame', None)] + [('batched', size) for size in args.batch_sizes]
+    results = []
+    for mode, max_batch in modes:
+        encoder = None
+        if mode == 'per_frame':
+            encode = (lambda rgb, locations: runner(encode_faces, rgb, locations)) if pool else encode_faces
+        else:
+            encoder = BatchEncoder(max_batch=max_batch, max_wait=args.max_wait, runner=runner)
+            encode = encoder.encode
+
+        seconds, latencies = run(workload, args.cameras, args.frames, encode)
+        batching = encoder.stats() if encoder else {}
+        if encoder:
+            encoder.close()
+        results.append({
+            'mode': mode,
+            'max_batch': max_batch,
+            'faces': faces,
+            'seconds': seconds,
+            'faces_per_sec': faces / seconds,
+            'frame_p50_ms': float(np.percentile(latencies, 50)),
+            'frame_p95_ms': float(np.percentile(latencies, 95)),
+            'mean_batch': batching.get('mean_batch', 1.0),
+        })
+        print(f"{mode:>9} {max_batch or '':>4}: {results[-1]['faces_per_sec']:.1f} faces/s, "
+              f"frame p95 {results[-1]['frame_p95_ms']:.1f} ms", flush=True)
+
+    if pool:
+        pool.shutdown()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cameras': args.cameras,
+            'frames_per_camera': args.frames,
+            'scale': args.scale,
+            'max_wait': args.max_wait,
+            'workers': args.workers,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
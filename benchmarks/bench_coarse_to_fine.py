@@ -0,0 +1,170 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+import face_recognition
+
+from recog.coarse_to_fine import crop_regions, refine_and_encode, to_frame_box
+from recog.face_tracker import iou
+
+"""
+    Coarse-to-fine vs uniform scaling benchmark.
+
+    Runs face detection + encoding over real images or video frames with
+    several strategies and compares each to a full-resolution reference
+    (detection and encoding on the unscaled frame):
+
+        uniform@S        detect and encode on the frame resized by S
+        coarse2fine@S    detect on the frame resized by S, refine and
+                         encode on full-resolution crops
+
+    Reported per strategy: time per frame (mean / p95), faces found,
+    detection recall against the reference (IoU >= 0.5), and the mean L2
+    distance between each matched face's encoding and its reference
+    encoding (lower means closer to full-resolution accuracy).
+
+    Run from the repository root:
+        python -m benchmarks.bench_coarse_to_fine --images photos/ --output c2f.json
+        python -m benchmarks.bench_coarse_to_fine --video hallway.mp4 --max-frames 200
+"""
+
+
+def load_frames(images, video, max_frames, stride):
+    """BGR frames from an image directory/glob or a video file"""
+    frames = []
+    if images:
+        pattern = os.path.join(images, '*') if os.path.isdir(images) else images
+        for path in sorted(glob.glob(pattern)):
+            frame = cv2.imread(path)
+            if frame is not None:
+                frames.append(frame)
+            if len(frames) >= max_frames:
+                break
+    if video:
+        cap = cv2.VideoCapture(video)
+        index = 0
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index % stride == 0:
+                frames.append(frame)
+            index += 1
+        cap.release()
+    return frames
+
+
+def uniform(frame, scale, upsample, model):
+    small = frame if scale == 1.0 else cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    locations = face_recognition.face_locations(rgb, number_of_times_to_upsample=upsample, model=model)
+    encodings = face_recognition.face_encodings(rgb, locations)
+    boxes = [tuple(int(round(v / scale)) for v in box) for box in locations]
+    return boxes, encodings
+
+
+def coarse_to_fine(frame, scale, upsample, model):
+    small = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    locations = face_recognition.face_locations(rgb, number_of_times_to_upsample=upsample, model=model)
+    regions, origins = crop_regions(frame, locations, scale)
+    refined = refine_and_encode(regions, model)
+    boxes = [to_frame_box(box, origin) for (box, _, _), origin in zip(refined, origins)]
+    return boxes, [encoding for _, encoding, _ in refined]
+
+
+def compare(reference, boxes, encodings):
+    """(true positives, encoding distances) against the reference faces"""
+    ref_boxes, ref_encodings = reference
+    used = set()
+    distances = []
+    for box, encoding in zip(boxes, encodings):
+        scores = [(iou(box, ref_box), i) for i, ref_box in enumerate(ref_boxes) if i not in used]
+        if not scores:
+            continue
+        best, i = max(scores)
+        if best >= 0.5:
+            used.add(i)
+            if encoding is not None:
+                distances.append(float(np.linalg.norm(np.asarray(encoding) - ref_encodings[i])))
+    return len(used), distances
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coarse-to-fine detection benchmark")
+    parser.add_argument('--images', help="image directory or glob")
+    parser.add_argument('--video', help="video file")
+    parser.add_argument('--max-frames', type=int, default=100)
+    parser.add_argument('--stride', type=int, default=5, help="use every n-th video frame")
+    parser.add_argument('--scales', type=float, nargs='+', default=[0.25, 0.5])
+    parser.add_argument('--upsample', type=int, default=1, help="upsampling of the coarse detection")
+    parser.add_argument('--model', default='hog')
+    parser.add_argument('--output', default=None, help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, args.video, args.max_frames, args.stride)
+    if not frames:
+        parser.error("no frames loaded, pass --images or --video")
+
+    # Full-resolution reference, also the cost baseline
+    strategies = [('uniform@1.0', lambda f: uniform(f, 1.0, args.upsample, args.model))]
+    for scale in args.scales:
+        strategies.append((f'uniform@{scale}',
+                           lambda f, s=scale: uniform(f, s, args.upsample, args.model)))
+        strategies.append((f'coarse2fine@{scale}',
+                           lambda f, s=scale: coarse_to_fine(f, s, args.upsample, args.model)))
+
+    references = []
+    results = []
+    for name, run in strategies:
+        timings, found, matched, distances = [], 0, 0, []
+        for index, frame in enumerate(frames):
+            started = time.perf_counter()
+            boxes, encodings = run(frame)
+            timings.append(time.perf_counter() - started)
+            found += len(boxes)
+            if name == 'uniform@1.0':
+                references.append((boxes, [np.asarray(e) for e in encodings]))
+            hits, frame_distances = compare(references[index], boxes, encodings)
+            matched += hits
+            distances.extend(frame_distances)
+
+        reference_faces = sum(len(ref[0]) for ref in references)
+        timings_ms = np.array(timings) * 1000
+        results.append({
+            'strategy': name,
+            'frames': len(frames),
+            'mean_ms': float(timings_ms.mean()),
+            'p95_ms': float(np.percentile(timings_ms, 95)),
+            'faces_found': found,
+            'recall': matched / reference_faces if reference_faces else None,
+            'mean_encoding_distance': float(np.mean(distances)) if distances else None,
+        })
+        print(f"{name:>18}: {results[-1]['mean_ms']:.1f} ms/frame, recall {results[-1]['recall']}, "
+              f"encoding distance {results[-1]['mean_encoding_distance']}", flush=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'frame_size': list(frames[0].shape[:2]),
+            'model': args.model,
+            'upsample': args.upsample,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
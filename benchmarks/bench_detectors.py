@@ -0,0 +1,146 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from recog.detectors import get_detector, available_detectors
+from recog.face_tracker import iou
+
+"""
+    Detector backend benchmark.
+
+    Runs every detector over a labelled image folder and reports speed and
+    detection quality against the labels (a match is IoU >= --iou):
+
+        mean_ms / p95_ms    detection time per image
+        recall              labelled faces found
+        precision           detections that are labelled faces
+
+    Labels are a JSON file mapping image file names to lists of
+    [top, right, bottom, left] boxes in full-resolution pixels:
+
+        {"frame_0001.jpg": [[120, 410, 260, 270]], "frame_0002.jpg": []}
+
+    Without --labels, full-resolution HOG with one upsample serves as the
+    reference (recall then means "agreement with HOG").
+
+    Run from the repository root:
+        python -m benchmarks.bench_detectors --images faces/ --labels faces/labels.json
+        python -m benchmarks.bench_detectors --images faces/ --scale 0.25 --detectors hog haar haar+hog
+"""
+
+
+def load_images(images, labels_path, max_images):
+    pattern = os.path.join(images, '*') if os.path.isdir(images) else images
+    labels = None
+    if labels_path:
+        with open(labels_path) as f:
+            labels = json.load(f)
+
+    samples = []
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.basename(path)
+        if labels is not None and name not in labels:
+            continue
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        boxes = None if labels is None else [tuple(box) for box in labels[name]]
+        samples.append((name, frame, boxes))
+        if len(samples) >= max_images:
+            break
+    return samples
+
+
+def score(truth, found, threshold):
+    """Greedy one-to-one matching, returns the true positives"""
+    used = set()
+    for box in found:
+        candidates = [(iou(box, ref), i) for i, ref in enumerate(truth) if i not in used]
+        if candidates:
+            best, i = max(candidates)
+            if best >= threshold:
+                used.add(i)
+    return len(used)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face detector backend benchmark")
+    parser.add_argument('--images', required=True, help="image directory or glob")
+    parser.add_argument('--labels', default=None, help="JSON labels, see module docstring")
+    parser.add_argument('--detectors', nargs='+', default=None,
+                        help="detector specs (default: every available one except cnn)")
+    parser.add_argument('--scale', type=float, default=1.0, help="resize factor before detection")
+    parser.add_argument('--upsample', type=int, default=1)
+    parser.add_argument('--iou', type=float, default=0.4, help="IoU that counts as a match")
+    parser.add_argument('--max-images', type=int, default=500)
+    parser.add_argument('--output', default=None, help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    samples = load_images(args.images, args.labels, args.max_images)
+    if not samples:
+        parser.error("no images loaded")
+    if args.labels is None:
+        reference = get_detector('hog')
+        samples = [(name, frame, reference.detect(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), 1))
+                   for name, frame, _ in samples]
+
+    specs = args.detectors or [spec for spec in available_detectors() if spec != 'cnn']
+    results = []
+    for spec in specs:
+        detector = get_detector(spec)
+        timings, found, hits = [], 0, 0
+        for _, frame, truth in samples:
+            small = frame if args.scale == 1.0 else cv2.resize(frame, (0, 0), fx=args.scale, fy=args.scale)
+            rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+            started = time.perf_counter()
+            boxes = detector.detect(rgb, args.upsample)
+            timings.append(time.perf_counter() - started)
+
+            boxes = [tuple(int(round(v / args.scale)) for v in box) for box in boxes]
+            found += len(boxes)
+            hits += score(truth, boxes, args.iou)
+
+        faces = sum(len(truth) for _, _, truth in samples)
+        timings_ms = np.array(timings) * 1000
+        results.append({
+            'detector': detector.name,
+            'images': len(samples),
+            'mean_ms': float(timings_ms.mean()),
+            'p95_ms': float(np.percentile(timings_ms, 95)),
+            'faces': faces,
+            'found': found,
+            'recall': hits / faces if faces else None,
+            'precision': hits / found if found else None,
+        })
+        print(f"{detector.name:>12}: {results[-1]['mean_ms']:.1f} ms/image, "
+              f"recall {results[-1]['recall']}, precision {results[-1]['precision']}", flush=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'opencv': cv2.__version__,
+            'labels': args.labels or 'hog reference',
+            'scale': args.scale,
+            'upsample': args.upsample,
+            'iou': args.iou,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
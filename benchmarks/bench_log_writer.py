@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from recog.log_store import INSERT, SCHEMA
+from recog.log_partitions import LogPartitions
+from recog.log_writer import RecognitionLogWriter
+
+"""
+    Recognition log write benchmark.
+
+    Simulates --cameras threads logging --rows recognitions each into a
+    fresh SQLite file and compares:
+
+        per_row     INSERT + commit per row on a shared connection under a
+                    lock, as log_recognition used to do
+        writer      RecognitionLogWriter.put (one background writer, WAL,
+                    executemany batches, day partitions) for each
+                    --batch-sizes value
+
+    Reported per mode: sustained throughput (rows until all are on disk)
+    and the latency the recognition thread sees per call.
+
+    Run from the repository root:
+        python -m benchmarks.bench_log_writer --cameras 8 --rows 5000 --output log_writer.json
+
+    Output (JSON):
+        {"meta": {...}, "results": [{"mode", "max_batch", "rows", "seconds", "rows_per_sec",
+          "call_p50_us", "call_p99_us", "call_max_us", "dropped"}, ...]}
+"""
+
+
+def make_row(camera, i):
+    return (f"person_{i % 50}", 0.6, int(time.time()), f"camera_{camera}", None)
+
+
+def run(cameras, rows, log):
+    """Log rows on one thread per camera, returns per-call latencies in microseconds"""
+    latencies = []
+    lock = threading.Lock()
+
+    def camera(index):
+        own = []
+        for i in range(rows):
+            row = make_row(index, i)
+            started = time.perf_counter()
+            log(row)
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=camera, args=(c,)) for c in range(cameras)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies) * 1e6
+
+
+def bench_per_row(path, cameras, rows):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute(SCHEMA)
+    conn.commit()
+    db_lock = threading.Lock()
+
+    def log(row):
+        with db_lock:
+            conn.execute(INSERT, row)
+            conn.commit()
+
+    started = time.perf_counter()
+    latencies = run(cameras, rows, log)
+    seconds = time.perf_counter() - started
+    conn.close()
+    return seconds, latencies, 0
+
+
+def bench_writer(path, cameras, rows, max_batch, max_delay):
+    partitions = LogPartitions(path, legacy_db=None)
+    writer = RecognitionLogWriter(partitions, max_batch=max_batch, max_delay=max_delay,
+                                  max_queue=cameras * rows)
+    started = time.perf_counter()
+    latencies = run(cameras, rows, writer.put)
+    # Throughput counts until the last row is committed, not just queued
+    writer.close()
+    seconds = time.perf_counter() - started
+    partitions.close()
+    return seconds, latencies, writer.stats()['dropped']
+
+
+def count_rows(paths):
+    """Logged rows over one or more database files"""
+    total = 0
+    for path in paths:
+        conn = sqlite3.connect(path)
+        try:
+            total += conn.execute('SELECT COUNT(*) FROM recognition_logs').fetchone()[0]
+        finally:
+            conn.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognition log write benchmark")
+    parser.add_argument('--cameras', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=2000, help="rows per camera")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--max-delay', type=float, default=0.5)
+    parser.add_argument('--dir', default=None, help="directory of the temporary databases")
+    parser.add_argument('--output', default=None, help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    modes = [('per_row', None)] + [('writer', size) for size in args.batch_sizes]
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for mode, max_batch in modes:
+            if mode == 'per_row':
+                path = os.path.join(directory, 'per_row.db')
+                seconds, latencies, dropped = bench_per_row(path, args.cameras, args.rows)
+                paths = [path]
+            else:
+                path = os.path.join(directory, f"writer_{max_batch}")
+                seconds, latencies, dropped = bench_writer(path, args.cameras, args.rows,
+                                                           max_batch, args.max_delay)
+                paths = [found for _, _, found in LogPartitions(path, legacy_db=None).partitions()]
+            written = count_rows(paths)
+            results.append({
+                'mode': mode,
+                'max_batch': max_batch,
+                'rows': written,
+                'seconds': seconds,
+                'rows_per_sec': written / seconds,
+                'call_p50_us': float(np.percentile(latencies, 50)),
+                'call_p99_us': float(np.percentile(latencies, 99)),
+                'call_max_us': float(latencies.max()),
+                'dropped': dropped,
+            })
+            print(f"{mode:>7} {max_batch or '':>4}: {results[-1]['rows_per_sec']:.0f} rows/s, "
+                  f"call p99 {results[-1]['call_p99_us']:.0f} us", flush=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'cameras': args.cameras,
+            'rows_per_camera': args.rows,
+            'max_delay': args.max_delay,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+"""
+    Gallery matching benchmark.
+
+    Fills a FaceRecognitionSystem with synthetic 128-d encodings and times
+    match_encodings (the matching step of process_frame) for several query
+    faces per frame. Every (backend, gallery size) pair runs in its own
+    subprocess so the reported peak RSS belongs to that backend alone.
+
+    Run from the repository root:
+        python -m benchmarks.bench_matching --sizes 1000 10000 100000 1000000 \
+            --backends brute ivf shared --output bench_matching.json
+
+    Output (JSON):
+        {"meta": {...}, "results": [{"backend", "gallery_size", "faces_per_frame",
+          "iterations", "p50_ms", "p95_ms", "p99_ms", "mean_ms",
+          "frames_per_sec", "faces_per_sec", "build_seconds", "peak_rss_mb",
+          "peak_rss_children_mb"}, ...]}
+"""
+
+BACKENDS = ('brute', 'ivf', 'shared')
+
+
+def make_index(backend, workers):
+    from recog.ann_index import BruteForceIndex, IVFIndex
+    from recog.shared_gallery import SharedMemoryIndex
+
+    if backend == 'brute':
+        return BruteForceIndex()
+    if backend == 'ivf':
+        return IVFIndex(n_probe=8)
+    if backend == 'shared':
+        return SharedMemoryIndex(n_workers=workers, min_shared_size=0)
+    raise ValueError(f"Unknown backend {backend}")
+
+
+def synthetic_encodings(size, seed):
+    """Encodings with roughly the spread of real dlib face encodings"""
+    rng = np.random.default_rng(seed)
+    encodings = np.empty((size, 128), dtype=np.float32)
+    chunk = 100000
+    for start in range(0, size, chunk):
+        end = min(start + chunk, size)
+        encodings[start:end] = rng.normal(scale=0.09, size=(end - start, 128))
+    return encodings
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_one(backend, size, faces_per_frame, repeat, max_seconds, workers, seed):
+    """Benchmark one backend at one gallery size (runs inside the subprocess)"""
+    from recog.face_recog import FaceRecognitionSystem
+
+    # The system creates its database, log and gallery files in the cwd
+    os.chdir(tempfile.mkdtemp(prefix='bench_matching_'))
+
+    encodings = synthetic_encodings(size, seed)
+    names = [f"person_{i}" for i in range(size)]
+    rng = np.random.default_rng(seed + 1)
+
+    started = time.perf_counter()
+    system = FaceRecognitionSystem(index=make_index(backend, workers))
+    system.gallery.extend(encodings, names)
+    system.match_encodings(encodings[:1])  # trains / publishes the index
+    build_seconds = time.perf_counter() - started
+
+    results = []
+    for n_faces in faces_per_frame:
+        latencies = []
+        budget_end = time.perf_counter() + max_seconds
+        for _ in range(repeat):
+            # Half the faces are enrolled people, half are strangers
+            picks = rng.choice(size, n_faces)
+            queries = encodings[picks] + rng.normal(scale=0.03, size=(n_faces, 128)).astype(np.float32)
+            queries[n_faces // 2:] = rng.normal(scale=0.09, size=(n_faces - n_faces // 2, 128))
+
+            t0 = time.perf_counter()
+            system.match_encodings(queries)
+            latencies.append(time.perf_counter() - t0)
+            if time.perf_counter() > budget_end:
+                break
+
+        latencies_ms = np.array(latencies) * 1000
+        mean_ms = float(latencies_ms.mean())
+        results.append({
+            'backend': backend,
+            'gallery_size': size,
+            'faces_per_frame': n_faces,
+            'iterations': len(latencies),
+            'p50_ms': float(np.percentile(latencies_ms, 50)),
+            'p95_ms': float(np.percentile(latencies_ms, 95)),
+            'p99_ms': float(np.percentile(latencies_ms, 99)),
+            'mean_ms': mean_ms,
+            'frames_per_sec': 1000.0 / mean_ms if mean_ms else None,
+            'faces_per_sec': 1000.0 * n_faces / mean_ms if mean_ms else None,
+            'build_seconds': build_seconds,
+        })
+
+    # Matcher processes of the shared backend are reaped by close(), after
+    # which their peak shows up under RUSAGE_CHILDREN
+    if hasattr(system.index, 'close'):
+        system.index.close()
+    rss = peak_rss_mb()
+    children_rss = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    for row in results:
+        row['peak_rss_mb'] = rss
+        row['peak_rss_children_mb'] = children_rss
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gallery matching benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--faces', type=int, nargs='+', default=[1, 5, 10, 20, 50],
+                        help="query faces per frame")
+    parser.add_argument('--repeat', type=int, default=200, help="frames per configuration")
+    parser.add_argument('--max-seconds', type=float, default=10.0,
+                        help="time budget per configuration")
+    parser.add_argument('--workers', type=int, default=None, help="processes for the shared backend")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="JSON file (default: stdout)")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # Child mode: exactly one backend and size, JSON on stdout
+        rows = run_one(args.backends[0], args.sizes[0], args.faces, args.repeat,
+                       args.max_seconds, args.workers, args.seed)
+        print(json.dumps(rows))
+        return
+
+    results = []
+    for size in args.sizes:
+        for backend in args.backends:
+            command = [
+                sys.executable, '-m', 'benchmarks.bench_matching', '--worker',
+                '--backends', backend, '--sizes', str(size),
+                '--faces', *map(str, args.faces),
+                '--repeat', str(args.repeat), '--max-seconds', str(args.max_seconds),
+                '--seed', str(args.seed),
+            ]
+            if args.workers:
+                command += ['--workers', str(args.workers)]
+            print(f"Running {backend} @ {size} faces...", file=sys.stderr)
+            completed = subprocess.run(command, capture_output=True, text=True,
+                                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            if completed.returncode != 0:
+                print(completed.stderr, file=sys.stderr)
+                results.append({'backend': backend, 'gallery_size': size,
+                                'error': completed.stderr.strip().splitlines()[-1:]})
+                continue
+            results.extend(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from recog.log_store import migrate, window_stats
+
+"""
+    Recognition statistics query benchmark.
+
+    Fills a database in the pre-rollup layout (DATETIME text timestamps, no
+    indexes) with --rows raw log rows spread over --days days, then times
+    the per-name statistics of several windows three ways:
+
+        legacy      the old get_recognition_stats query: text comparison
+                    and GROUP BY over recognition_logs
+        indexed     the same aggregate on epoch timestamps through the
+                    covering (timestamp, name, confidence) index
+        rollup      window_stats on the hourly/daily rollup tables
+
+    The schema migration in between (conversion, indexes, rollup backfill)
+    is timed as well.
+
+    Run from the repository root:
+        python -m benchmarks.bench_recognition_stats --rows 2000000 --output stats.json
+
+    Output (JSON):
+        {"meta": {...}, "migration_seconds", "results": [{"mode", "days", "names", "ms"}, ...]}
+"""
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE recognition_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        confidence REAL,
+        timestamp DATETIME,
+        camera_id TEXT,
+        image_path TEXT
+    )
+'''
+
+
+def fill_legacy(path, rows, days, names, cameras):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    rng = random.Random(0)
+    now = datetime.now()
+    chunk = 100000
+    for start in range(0, rows, chunk):
+        conn.executemany(
+            'INSERT INTO recognition_logs (name, confidence, timestamp, camera_id) VALUES (?, ?, ?, ?)',
+            [(f"person_{rng.randrange(names)}", rng.uniform(0.5, 1.0),
+              now - timedelta(seconds=rng.uniform(0, days * 86400)), f"camera_{rng.randrange(cameras)}")
+             for _ in range(min(chunk, rows - start))])
+        conn.commit()
+    return conn
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognition statistics query benchmark")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=90, help="days the rows are spread over")
+    parser.add_argument('--names', type=int, default=200)
+    parser.add_argument('--cameras', type=int, default=8)
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 7, 30])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--dir', default=None, help="directory of the temporary database")
+    parser.add_argument('--output', default=None, help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        conn = fill_legacy(os.path.join(directory, 'stats.db'), args.rows, args.days,
+                           args.names, args.cameras)
+        print(f"{args.rows} rows written", flush=True)
+
+        for days in args.windows:
+            ms, rows = timed(lambda: conn.execute(f'''
+                SELECT name, COUNT(*), AVG(confidence) FROM recognition_logs
+                WHERE timestamp >= datetime('now', '-{days} days')
+                GROUP BY name
+            ''').fetchall(), args.repeat)
+            results.append({'mode': 'legacy', 'days': days, 'names': len(rows), 'ms': ms})
+
+        started = time.perf_counter()
+        migrate(conn)
+        migration_seconds = time.perf_counter() - started
+        print(f"migration: {migration_seconds:.1f} s", flush=True)
+
+        for days in args.windows:
+            since = int(time.time()) - days * 86400
+            ms, rows = timed(lambda: conn.execute(
+                'SELECT name, COUNT(*), AVG(confidence) FROM recognition_logs '
+                'WHERE timestamp >= ? GROUP BY name', (since,)).fetchall(), args.repeat)
+            results.append({'mode': 'indexed', 'days': days, 'names': len(rows), 'ms': ms})
+            ms, rows = timed(lambda: window_stats(conn, since), args.repeat)
+            results.append({'mode': 'rollup', 'days': days, 'names': len(rows), 'ms': ms})
+        conn.close()
+
+    for result in results:
+        print(f"{result['mode']:>8} {result['days']:>3} days: {result['ms']:.1f} ms", flush=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'rows': args.rows,
+            'days': args.days,
+            'names': args.names,
+            'cameras': args.cameras,
+        },
+        'migration_seconds': migration_seconds,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,13 @@ import threading
 import time
 from datetime import datetime
 import os
+import sys
+
+# The recognition engine (recog/) is shared by every app, it lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from recog.face_recog import FaceRecognitionSystem
+from recog.pipeline import RecognitionPipeline
 
 """
     Methods:
@@ -47,6 +52,7 @@ class ModernFaceRecognitionGUI:
         
         # Camera variables
         self.cap = None
+        self.pipeline = None  # RecognitionPipeline while the camera runs
         self.is_running = False
         self.current_frame = None
         
@@ -56,6 +62,7 @@ class ModernFaceRecognitionGUI:
         self.fps_var = ctk.StringVar(value="FPS: 0")
         self.face_count_var = ctk.StringVar(value="Registered: 0")
         self.tolerance_var = ctk.DoubleVar(value=0.6)
+        self.selected_faces = {}  # name -> BooleanVar of its checkbox
         
         # Create GUI elements
         self.create_widgets()
@@ -388,6 +395,11 @@ class ModernFaceRecognitionGUI:
         if not self.is_running:
             self.cap = cv2.VideoCapture(2)
             if self.cap.isOpened():
+                if self.face_system:
+                    # Capture and recognition run in background stages (threads)
+                    self.pipeline = RecognitionPipeline(self.face_system, self.cap, "gui_camera",
+                                                        use_processes=False)
+                    self.pipeline.start()
                 self.is_running = True
                 self.status_var.set("Camera running...")
                 self.start_btn.configure(state="disabled")
@@ -399,6 +411,9 @@ class ModernFaceRecognitionGUI:
     def stop_camera(self):
         """Stop camera capture"""
         self.is_running = False
+        if self.pipeline:
+            self.pipeline.stop()
+            self.pipeline = None
         if self.cap:
             self.cap.release()
         self.status_var.set("Camera stopped")
@@ -409,11 +424,16 @@ class ModernFaceRecognitionGUI:
     def update_video(self):
         """Update video display"""
         if self.is_running and self.cap:
-            ret, frame = self.cap.read()
+            if self.pipeline:
+                # Newest frame the pipeline finished, if any
+                processed_frame, results = self.pipeline.read(timeout=0)
+                ret = processed_frame is not None
+            else:
+                ret, frame = self.cap.read()
+                if ret:
+                    # Process frame with face recognition
+                    processed_frame, results = self.process_frame_with_recognition(frame)
             if ret:
-                # Process frame with face recognition
-                processed_frame, results = self.process_frame_with_recognition(frame)
-                
                 # Convert to display format
                 display_frame = self.prepare_frame_for_display(processed_frame)
                 
@@ -426,7 +446,11 @@ class ModernFaceRecognitionGUI:
                 self.update_status(results)
         
         if self.is_running:
-            self.root.after(30, self.update_video)  # ~33 FPS
+            # ~33 FPS, slower while the motion gate reports an idle camera
+            delay = 0.03
+            if self.face_system:
+                delay = self.face_system.frame_interval("gui_camera", delay)
+            self.root.after(int(delay * 1000), self.update_video)
     
     def process_frame_with_recognition(self, frame):
         """Process frame with face recognition"""
@@ -468,7 +492,12 @@ class ModernFaceRecognitionGUI:
         current_time = time.time()
         if hasattr(self, 'last_time'):
             fps = 1.0 / (current_time - self.last_time)
-            self.fps_var.set(f"FPS: {fps:.1f}")
+            gate = self.face_system.get_motion_stats().get("gui_camera") if self.face_system else None
+            if gate:
+                idle = " idle" if gate['idle'] else ""
+                self.fps_var.set(f"FPS: {fps:.1f} (gate {gate['hit_rate']:.0%}{idle})")
+            else:
+                self.fps_var.set(f"FPS: {fps:.1f}")
         self.last_time = current_time
         
         # Update face count
@@ -491,9 +520,13 @@ class ModernFaceRecognitionGUI:
             messagebox.showwarning("Warning", "Please start the camera first")
             return
         
-        # Capture current frame
+        # Capture current frame (the pipeline owns the camera while it runs)
         if self.cap:
-            ret, frame = self.cap.read()
+            if self.pipeline:
+                frame = self.pipeline.latest_frame()
+                ret = frame is not None
+            else:
+                ret, frame = self.cap.read()
             if ret:
                 # Save temporary image
                 temp_path = f"temp_capture_{int(time.time())}.jpg"
@@ -607,28 +640,47 @@ class ModernFaceRecognitionGUI:
             widget.destroy()
         
         if self.face_system:
-            faces = self.face_system.known_face_names
-            pass
+            # One entry per identity, even if it has several encodings
+            faces = list(dict.fromkeys(self.face_system.known_face_names))
         else:
             # Placeholder faces
             faces = ["Sample Person 1", "Sample Person 2", "John Doe", "Jane Smith"]
         
+        self.selected_faces = {}
         for i, name in enumerate(faces):
             face_frame = ctk.CTkFrame(self.faces_scrollable_frame)
             face_frame.grid(row=i, column=0, padx=5, pady=2, sticky="ew")
             face_frame.grid_columnconfigure(0, weight=1)
             
-            name_label = ctk.CTkLabel(
+            selected_var = ctk.BooleanVar(value=False)
+            name_checkbox = ctk.CTkCheckBox(
                 face_frame,
                 text=name,
+                variable=selected_var,
                 font=ctk.CTkFont(size=12)
             )
-            name_label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
+            name_checkbox.grid(row=0, column=0, padx=10, pady=5, sticky="w")
+            self.selected_faces[name] = selected_var
     
     def delete_selected_face(self):
-        """Delete selected face from database"""
-        # This would need to be implemented with your face system
-        messagebox.showinfo("Info", "Delete face functionality not implemented yet")
+        """Delete selected faces from database"""
+        names = [name for name, var in self.selected_faces.items() if var.get()]
+        
+        if not names:
+            messagebox.showwarning("Warning", "Please select at least one face to delete")
+            return
+        
+        if not self.face_system:
+            messagebox.showerror("Error", "Face recognition system not initialized")
+            return
+        
+        if not messagebox.askyesno("Confirm", f"Delete {len(names)} selected face(s)?"):
+            return
+        
+        # Tombstoned immediately, compacted in the background
+        self.face_system.remove_known_faces(names)
+        self.update_faces_list()
+        self.status_var.set(f"Deleted: {', '.join(names)}")
     
     def toggle_fullscreen(self, event=None):
         """Toggle fullscreen mode"""
@@ -644,6 +696,8 @@ class ModernFaceRecognitionGUI:
     def on_closing(self):
         """Handle application closing"""
         self.stop_camera()
+        if self.face_system:
+            self.face_system.close()
         self.root.quit()
         self.root.destroy()
 
@@ -5,6 +5,7 @@ import cv2
 from PIL import Image, ImageTk
 
 from recog.face_recog import FaceRecognitionSystem
+from recog.pipeline import RecognitionPipeline
 #from utils.timeout import set_timeout
 #import time
 from pathlib import Path
@@ -31,6 +32,7 @@ class VideoDisplay:
         self.init_face_system()
 
         self.cap = None
+        self.pipeline = None # recognition stages while the video runs
 
         # video
         self.update_video()
@@ -156,7 +158,9 @@ class VideoDisplay:
             self.face_system = FaceRecognitionSystem(
                 tolerance=0.43,
                 model='hog',
-                enable_logging=True
+                enable_logging=True,
+                box_color=(102, 0, 148),
+                box_thickness=1
             )
             print("Face recognition system initialized")
         except Exception as e:
@@ -181,8 +185,17 @@ class VideoDisplay:
 
     def update_video(self):
         if self.running and self.video_label:
-            ret, frame = self.cap.read()
-            if ret:
+            if self.pipeline:
+                # newest frame the pipeline finished, None when nothing new yet
+                frame, results = self.pipeline.read(timeout=0)
+            else:
+                # no pipeline (no face system): read the camera directly
+                frame, results = None, []
+                if hasattr(self.cap, 'isOpened') and self.cap.isOpened():
+                    ret, frame = self.cap.read()
+                    if not ret:
+                        frame = None
+            if frame is not None:
                 #---------
                 if self.detected_count >= 3:
                     print("More that expected")
@@ -192,7 +205,8 @@ class VideoDisplay:
                         self.process_detected()
                         self.detected_count = 0
                 else:
-                    processed_frame, results = self.face_system.process_frame(frame, f"camera_{0}")
+                    if not self.pipeline and self.face_system:
+                        processed_frame, results = self.face_system.process_frame(frame, f"camera_{0}")
                     if len(results) > 0 and results[0]['confidence'] > 0.6:
                         self.detected_count = self.detected_count + 1
                         self.detected_face = results[0]
@@ -208,7 +222,11 @@ class VideoDisplay:
                 self.video_label.configure(image=img_tk)
                 self.video_label.image = img_tk
 
-        self.after_id = self.root.after(30, self.update_video) # ~33 fps
+        # ~33 fps, slower while the motion gate reports an idle camera
+        delay = 0.03
+        if self.face_system:
+            delay = self.face_system.frame_interval(f"camera_{0}", delay)
+        self.after_id = self.root.after(int(delay * 1000), self.update_video)
 
     def blank_display(self):
         # turn the display to blank
@@ -222,13 +240,31 @@ class VideoDisplay:
         self.create_detected_face()
 
     def close_open_cam(self):
+        self.stop_pipeline()
         if hasattr(self.cap, 'isOpened') and self.cap.isOpened():
             self.cap.release()
 
     #---------------------------------- ACTIONS --------------------------------------
     def start_video(self):
         self.running = True
+        self.start_pipeline()
         
     def stop_video(self):
-        self.running = False 
+        self.running = False
+        self.stop_pipeline()
+
+    def start_pipeline(self):
+        # capture -> detect -> encode -> match -> render in background stages
+        if self.pipeline or not self.face_system:
+            return
+        if not (hasattr(self.cap, 'isOpened') and self.cap.isOpened()):
+            return
+        # threads: the face system (gallery, database) stays in this process
+        self.pipeline = RecognitionPipeline(self.face_system, self.cap, f"camera_{0}", use_processes=False)
+        self.pipeline.start()
+
+    def stop_pipeline(self):
+        if self.pipeline:
+            self.pipeline.stop()
+            self.pipeline = None 
 
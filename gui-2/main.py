@@ -1,7 +1,12 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import ttk, messagebox
 from ttkthemes import ThemedTk, ThemedStyle
 
+# The recognition engine (recog/) is shared by every app, it lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from style.style_config import Style
 
 from body.video_display import VideoDisplay
@@ -106,9 +111,11 @@ def main():
     def on_closing():
         try:
             video_display = app.content_classes['video']
-            video_display.running = False
+            video_display.stop_video()
             if video_display.cap.isOpened():
                 video_display.cap.release()
+            if video_display.face_system:
+                video_display.face_system.close()
         except Exception as e:
             print("Closing OpenCV error")
         finally:
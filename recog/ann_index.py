@@ -0,0 +1,259 @@
+import time
+
+import numpy as np
+
+from recog.gallery import nearest_two
+
+"""
+    Classes:
+        BruteForceIndex --- exact scan over the whole gallery
+        IVFIndex        --- k-means partitioned (inverted file) index
+
+    Both expose:
+        attach(self, gallery)
+        search(self, face_encodings)
+            -> (best_index, best_distance, runner_up_index, runner_up_distance)
+
+    Functions:
+        recall_latency_report(gallery, index, queries, probes=(1, 2, 4, 8, 16, 32))
+"""
+
+class BruteForceIndex:
+    """Exact search, compares every query with every gallery row"""
+
+    def __init__(self):
+        self.gallery = None
+
+    def attach(self, gallery):
+        self.gallery = gallery
+
+    def search(self, face_encodings):
+        return self.gallery.match(face_encodings)
+
+
+class IVFIndex:
+    def __init__(self,
+                 n_lists=None,
+                 n_probe=8,
+                 min_train_size=4096,
+                 kmeans_iterations=10,
+                 seed=0):
+        """
+        Inverted-file index over the gallery encodings
+
+        The gallery is partitioned with k-means. A query is only compared with
+        the rows of the `n_probe` partitions whose centroids are closest, and
+        those candidates are re-ranked with exact distances.
+
+        Args:
+            n_lists: Number of partitions (default: 2 * sqrt(N))
+            n_probe: Partitions scanned per query (higher = better recall, slower)
+            min_train_size: Below this gallery size the index falls back to brute force
+            kmeans_iterations: Lloyd iterations used when training
+            seed: Seed for centroid initialisation
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+
+        self.gallery = None
+        self.centroids = None
+        self._lists = []
+        self._indexed = 0
+        self._trained_size = 0
+        self._generation = None
+
+    def attach(self, gallery):
+        self.gallery = gallery
+        self.centroids = None
+        self._lists = []
+        self._indexed = 0
+        self._trained_size = 0
+        self._generation = gallery.generation
+
+    # ------------------------------ build -------------------------------
+
+    def _sync(self):
+        """Bring the partitions up to date with the gallery"""
+        gallery = self.gallery
+        size = len(gallery)
+
+        if size < self.min_train_size:
+            self.centroids = None
+            return
+
+        if self.centroids is not None and gallery.generation != self._generation:
+            self._remap()
+
+        stale = (
+            self.centroids is None
+            or gallery.generation != self._generation
+            or size >= 2 * self._trained_size
+        )
+        if stale:
+            self.train()
+        elif size > self._indexed:
+            self._assign_rows(np.arange(self._indexed, size))
+            self._indexed = size
+
+    def _remap(self):
+        """Follow a gallery compaction by renumbering rows instead of retraining"""
+        remap = self.gallery.last_remap
+        if remap is None or remap[0] != self._generation or remap[1] != self.gallery.generation:
+            return
+        old_to_new = remap[2]
+        lists = []
+        for rows in self._lists:
+            rows = old_to_new[rows]
+            lists.append(rows[rows >= 0])
+        self._lists = lists
+        # Compaction keeps row order, so unindexed rows stay at the end
+        self._indexed = int(np.count_nonzero(old_to_new[:self._indexed] >= 0))
+        self._generation = self.gallery.generation
+
+    def train(self):
+        """(Re)build centroids and partitions from the current gallery"""
+        data = self.gallery.encodings
+        size = data.shape[0]
+        n_lists = self.n_lists or max(1, int(2 * np.sqrt(size)))
+        n_lists = min(n_lists, size)
+
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(size, max(n_lists * 32, 10000))
+        sample = data[rng.choice(size, sample_size, replace=False)]
+        self.centroids = _kmeans(sample, n_lists, self.kmeans_iterations, rng)
+
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+        self._assign_rows(np.arange(size))
+        self._indexed = size
+        self._trained_size = size
+        self._generation = self.gallery.generation
+
+    def _assign_rows(self, rows):
+        """Append gallery rows to the partition of their nearest centroid"""
+        assignment = _nearest_centroid(self.gallery.encodings[rows], self.centroids)
+        order = np.argsort(assignment, kind='stable')
+        rows = rows[order]
+        assignment = assignment[order]
+        lists, starts = np.unique(assignment, return_index=True)
+        ends = np.append(starts[1:], len(rows))
+        for list_id, start, end in zip(lists, starts, ends):
+            self._lists[list_id] = np.concatenate([self._lists[list_id], rows[start:end]])
+
+    # ------------------------------ search ------------------------------
+
+    def search(self, face_encodings, n_probe=None):
+        """
+        Approximate search with exact re-ranking of the probed candidates
+
+        Args:
+            face_encodings: Sequence or (Q, dim) array of query encodings
+            n_probe: Override the configured probe count for this call
+
+        Returns:
+            tuple: Same layout as FaceGallery.match
+        """
+        self._sync()
+        if self.centroids is None:
+            return self.gallery.match(face_encodings)
+
+        gallery = self.gallery
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, gallery.dim)
+        n_queries = queries.shape[0]
+        n_probe = min(n_probe or self.n_probe, len(self._lists))
+
+        best_index = np.full(n_queries, -1, dtype=np.int64)
+        best_sq = np.full(n_queries, np.inf, dtype=np.float32)
+        runner_up_index = np.full(n_queries, -1, dtype=np.int64)
+        runner_up_sq = np.full(n_queries, np.inf, dtype=np.float32)
+        if n_queries == 0:
+            return best_index, best_sq, runner_up_index, runner_up_sq
+
+        centroid_sq = _sq_distances(queries, self.centroids)
+        if n_probe < centroid_sq.shape[1]:
+            probes = np.argpartition(centroid_sq, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = np.tile(np.arange(centroid_sq.shape[1]), (n_queries, 1))
+
+        for i in range(n_queries):
+            candidates = np.concatenate([self._lists[c] for c in probes[i]])
+            if candidates.size == 0:
+                continue
+            sq = gallery.sq_distances(queries[i:i + 1], candidates)
+            top2, top2_sq = nearest_two(sq)
+            best_index[i] = candidates[top2[0, 0]]
+            best_sq[i] = top2_sq[0, 0]
+            if top2[0, 1] >= 0:
+                runner_up_index[i] = candidates[top2[0, 1]]
+                runner_up_sq[i] = top2_sq[0, 1]
+
+        return best_index, np.sqrt(best_sq), runner_up_index, np.sqrt(runner_up_sq)
+
+
+def _sq_distances(queries, points):
+    sq = queries @ points.T
+    sq *= -2.0
+    sq += np.einsum('ij,ij->i', points, points)
+    sq += np.einsum('ij,ij->i', queries, queries)[:, None]
+    return sq
+
+
+def _nearest_centroid(data, centroids, chunk=8192):
+    """Index of the closest centroid for every row, computed in chunks"""
+    assignment = np.empty(data.shape[0], dtype=np.int64)
+    for start in range(0, data.shape[0], chunk):
+        block = data[start:start + chunk]
+        assignment[start:start + chunk] = np.argmin(_sq_distances(block, centroids), axis=1)
+    return assignment
+
+
+def _kmeans(data, k, iterations, rng):
+    """Plain Lloyd's k-means, empty clusters are re-seeded from random rows"""
+    centroids = data[rng.choice(data.shape[0], k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignment = _nearest_centroid(data, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(data.shape[0], int(empty.sum()))]
+    return centroids
+
+
+def recall_latency_report(gallery, index, queries, probes=(1, 2, 4, 8, 16, 32)):
+    """
+    Compare an IVFIndex against brute force for several probe counts
+
+    Args:
+        gallery: FaceGallery the index is attached to
+        index: IVFIndex to evaluate
+        queries: (Q, dim) array of query encodings
+        probes: Probe counts to try
+
+    Returns:
+        list of dicts: n_probe, recall_at_1, ms_per_query (plus a brute-force row)
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, gallery.dim)
+    n_queries = max(queries.shape[0], 1)
+
+    started = time.perf_counter()
+    exact_index = gallery.match(queries)[0]
+    brute_ms = (time.perf_counter() - started) * 1000 / n_queries
+    report = [{'n_probe': 'brute', 'recall_at_1': 1.0, 'ms_per_query': brute_ms}]
+
+    index.search(queries[:1])  # make sure training is not timed
+    for n_probe in probes:
+        started = time.perf_counter()
+        found = index.search(queries, n_probe=n_probe)[0]
+        elapsed_ms = (time.perf_counter() - started) * 1000 / n_queries
+        report.append({
+            'n_probe': n_probe,
+            'recall_at_1': float(np.mean(found == exact_index)),
+            'ms_per_query': elapsed_ms
+        })
+    return report
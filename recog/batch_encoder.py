@@ -0,0 +1,216 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+"""
+    Cross-frame, cross-camera batched face encoding.
+
+    With many cameras each showing a face or two, encoding one frame at a
+    time means tiny batches and per-call overhead. BatchEncoder collects the
+    face crops that concurrent callers (daemon workers, pipeline encode
+    workers) submit and encodes them together once max_batch faces are
+    waiting or the oldest request has waited max_wait seconds. Each caller
+    gets exactly its own encodings back, in order.
+
+    The batch itself aligns every face to a 150x150 chip and computes all
+    descriptors with one dlib call, which is where the batching pays off
+    (one network pass instead of one per face). Landmarks and chips are the
+    ones face_recognition.face_encodings uses for the same model, so batched
+    and per-frame encodings are interchangeable. dlib builds without the
+    batched descriptor API fall back to encoding the crops one by one.
+
+    Methods (BatchEncoder):
+        encode(self, rgb_frame, face_locations, timeout=None)
+        submit(self, rgb_frame, face_locations) --- Future
+        close
+        stats
+    Functions:
+        face_crops(rgb_frame, face_locations, margin=0.5)
+        encode_batch(crops, model='small') --- module level for process pools
+"""
+
+
+def face_crops(rgb_frame, face_locations, margin=0.5):
+    """
+    Cut faces with some context out of a frame
+
+    Returns:
+        list: (rgb_crop, box_in_crop) per face location
+    """
+    height, width = rgb_frame.shape[:2]
+    crops = []
+    for box in face_locations:
+        top, right, bottom, left = (int(v) for v in box)
+        margin_y = int((bottom - top) * margin)
+        margin_x = int((right - left) * margin)
+        y0, x0 = max(0, top - margin_y), max(0, left - margin_x)
+        crop = rgb_frame[y0:min(height, bottom + margin_y), x0:min(width, right + margin_x)]
+        crops.append((np.ascontiguousarray(crop), (top - y0, right - x0, bottom - y0, left - x0)))
+    return crops
+
+
+def encode_batch(crops, model='small'):
+    """
+    Encode (rgb_crop, box) pairs with a single batched descriptor call
+
+    Args:
+        crops: (rgb_crop, box_in_crop) pairs, see face_crops
+        model: Landmark model, as in face_recognition.face_encodings
+               ('small' is the 5-point predictor, 'large' the 68-point one)
+
+    Returns:
+        list: One 128-d encoding per crop
+    """
+    if not crops:
+        return []
+    # Imported here so BatchEncoder itself (queueing, routing) does not need dlib
+    import dlib
+    import face_recognition
+    try:
+        api = face_recognition.api
+        pose_predictor = api.pose_predictor_5_point if model == 'small' else api.pose_predictor_68_point
+        chips = []
+        for crop, (top, right, bottom, left) in crops:
+            landmarks = pose_predictor(crop, dlib.rectangle(left, top, right, bottom))
+            # compute_face_descriptor(image, landmarks) aligns with the same size and padding
+            chips.append(dlib.get_face_chip(crop, landmarks, size=150, padding=0.25))
+        return [np.array(descriptor) for descriptor in api.face_encoder.compute_face_descriptor(chips)]
+    except (AttributeError, TypeError):
+        # No batched descriptor API in this dlib build
+        return [face_recognition.face_encodings(crop, [box], model=model)[0] for crop, box in crops]
+
+
+class _Request:
+    __slots__ = ('crops', 'future', 'submitted_at')
+
+    def __init__(self, crops):
+        self.crops = crops
+        self.future = Future()
+        self.submitted_at = time.time()
+
+
+class BatchEncoder:
+    def __init__(self, max_batch=32, max_wait=0.01, runner=None, model='small'):
+        """
+        Encoding service shared by every camera of a FaceRecognitionSystem
+
+        Args:
+            max_batch: Faces encoded together at most
+            max_wait: Seconds the oldest request waits for the batch to fill
+            runner: Callable runner(fn, *args) executing a batch, e.g. one
+                    that hands it to a process pool (default: call it)
+            model: Landmark model of the encodings, like the per-frame
+                   encode_faces path ('small' by default)
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.runner = runner
+        self.model = model
+
+        self.batches = 0
+        self.requests = 0
+        self.faces = 0
+        self.wait_seconds = 0.0
+        self._pending = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, rgb_frame, face_locations):
+        """
+        Queue the faces of one frame
+
+        Returns:
+            Future: resolves to the list of encodings, one per face location
+        """
+        request = _Request(face_crops(rgb_frame, face_locations))
+        if not request.crops:
+            request.future.set_result([])
+            return request.future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchEncoder is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="batch-encoder", daemon=True)
+                self._thread.start()
+            self._pending.append(request)
+            self._cond.notify_all()
+        return request.future
+
+    def encode(self, rgb_frame, face_locations, timeout=None):
+        """Encode the faces of one frame as part of the next batch (blocking)"""
+        return self.submit(rgb_frame, face_locations).result(timeout)
+
+    def _next_batch(self):
+        """Wait for a full batch or the oldest request's deadline"""
+        with self._cond:
+            while True:
+                if not self._pending:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+                waiting = sum(len(request.crops) for request in self._pending)
+                remaining = self._pending[0].submitted_at + self.max_wait - time.time()
+                if waiting >= self.max_batch or remaining <= 0 or self._closed:
+                    break
+                self._cond.wait(remaining)
+
+            # Whole requests only, so results route back per frame
+            batch, size = [], 0
+            while self._pending and (not batch or size + len(self._pending[0].crops) <= self.max_batch):
+                request = self._pending.pop(0)
+                batch.append(request)
+                size += len(request.crops)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            crops = [crop for request in batch for crop in request.crops]
+            started = time.time()
+            try:
+                if self.runner is not None:
+                    encodings = self.runner(encode_batch, crops, self.model)
+                else:
+                    encodings = encode_batch(crops, self.model)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            with self._cond:
+                self.batches += 1
+                self.requests += len(batch)
+                self.faces += len(crops)
+                self.wait_seconds += sum(started - request.submitted_at for request in batch)
+            offset = 0
+            for request in batch:
+                request.future.set_result(encodings[offset:offset + len(request.crops)])
+                offset += len(request.crops)
+
+    def close(self):
+        """Encode what is still queued, then stop the batching thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'batches', 'faces', 'mean_batch', 'mean_wait_ms', 'queued'}
+        """
+        with self._cond:
+            return {
+                'batches': self.batches,
+                'faces': self.faces,
+                'mean_batch': self.faces / self.batches if self.batches else 0.0,
+                'mean_wait_ms': 1000 * self.wait_seconds / self.requests if self.requests else 0.0,
+                'queued': len(self._pending),
+            }
@@ -0,0 +1,249 @@
+import json
+import os
+import re
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import cv2
+import numpy as np
+import face_recognition
+
+from recog.registration_cache import file_hash, settings_key
+
+"""
+    Parallel, resumable bulk enrolment from an image directory.
+
+    Two layouts are understood:
+
+        photos/<name>/<any>.jpg     one folder per person, several photos each
+        photos/<name>.jpg           one photo per person, named after the file
+                                    (a _YYYYMMDD_HHMMSS suffix as written by
+                                    camera registration is dropped)
+
+    Images are decoded, downscaled to max_side pixels when larger (phone
+    and DSLR photos are far bigger than detection needs) and encoded on a
+    process pool. Results are committed to the gallery in batches: one
+    gallery extend and one fsynced journal write per batch, no compaction
+    while the import runs and a single snapshot at the end.
+
+    Files whose content was encoded before with the same settings come
+    from the system's registration cache without being decoded, so a
+    rebuild of the gallery from the photo archive is mostly hashing.
+
+    Progress is appended to a JSON-lines checkpoint after each batch is in
+    the journal. A rerun skips every image listed there, and an image whose
+    batch reached the journal but not the checkpoint (crash in between) is
+    recognised by its identical encoding and not enrolled twice.
+
+    Functions:
+        find_images(directory) --- (path, name) pairs
+        encode_image(path, max_side=1600, model='hog', num_jitters=1) --- module level for the pool
+        bulk_enroll(face_system, directory, workers=None, batch_size=256,
+                    max_side=1600, checkpoint=None)
+"""
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+# registered_faces/<name>_<YYYYMMDD_HHMMSS>.jpg
+_REGISTRATION_SUFFIX = re.compile(r'_\d{8}_\d{6}$')
+
+
+def find_images(directory):
+    """(path, name) of every image, sorted so reruns see the same order"""
+    images = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.abspath(os.path.join(root, filename))
+            if os.path.abspath(root) == os.path.abspath(directory):
+                name = _REGISTRATION_SUFFIX.sub('', os.path.splitext(filename)[0])
+            else:
+                name = os.path.basename(root)
+            images.append((path, name))
+    return images
+
+
+def encode_image(path, max_side=1600, model='hog', num_jitters=1):
+    """
+    Encode the face of one enrolment photo
+
+    The largest face wins when there are several. Detection runs without
+    upsampling first and retries with one upsample if nothing was found.
+
+    Returns:
+        tuple: (path, status, box, encoding) with status 'ok', 'multiple'
+               (largest face used), 'no_face' or 'unreadable'; box is in
+               original image pixels
+    """
+    image = cv2.imread(path)
+    if image is None:
+        return path, 'unreadable', None, None
+    factor = min(1.0, max_side / max(image.shape[:2]))
+    if factor < 1.0:
+        image = cv2.resize(image, (0, 0), fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    locations = face_recognition.face_locations(rgb, number_of_times_to_upsample=0, model=model)
+    if not locations:
+        locations = face_recognition.face_locations(rgb, number_of_times_to_upsample=1, model=model)
+    if not locations:
+        return path, 'no_face', None, None
+
+    largest = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+    # Same model as _registration_encoding, so bulk and single enrolments match alike
+    encoding = face_recognition.face_encodings(rgb, [largest], num_jitters=num_jitters, model=model)[0]
+    box = tuple(int(round(v / factor)) for v in largest)
+    return path, 'ok' if len(locations) == 1 else 'multiple', box, encoding
+
+
+def _read_checkpoint(path):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Torn last line of a crashed run
+                continue
+            done[entry['path']] = entry['status']
+    return done
+
+
+def bulk_enroll(face_system, directory, workers=None, batch_size=256, max_side=1600, checkpoint=None):
+    """
+    Enrol every face photo of a directory
+
+    Args:
+        face_system: FaceRecognitionSystem to enrol into
+        directory: Photo directory, see the module docstring for the layout
+        workers: Pool processes (default: CPU count)
+        batch_size: Images committed to the gallery together
+        max_side: Longer image side is downscaled to this before detection
+        checkpoint: Progress file (default: bulk_enroll.jsonl in the gallery directory)
+
+    Returns:
+        dict: {'images', 'skipped', 'cached', 'enrolled', 'duplicates', 'multiple',
+               'no_face', 'unreadable', 'seconds'}
+    """
+    logger = face_system.logger
+    started = time.time()
+    gallery_dir = face_system.gallery_path or 'face_gallery'
+    checkpoint = checkpoint or os.path.join(gallery_dir, 'bulk_enroll.jsonl')
+
+    images = find_images(directory)
+    done = _read_checkpoint(checkpoint)
+    names = dict(images)
+    todo = [path for path, _ in images if path not in done]
+    summary = {'images': len(images), 'skipped': len(images) - len(todo), 'cached': 0, 'enrolled': 0,
+               'duplicates': 0, 'multiple': 0, 'no_face': 0, 'unreadable': 0}
+    logger.info(f"Bulk enrolment of {directory}: {len(images)} images, "
+                f"{summary['skipped']} already done, {len(todo)} to encode")
+    if not todo:
+        summary['seconds'] = time.time() - started
+        return summary
+
+    # A crash between a batch's journal write and its checkpoint line left
+    # encodings in the gallery that the checkpoint does not know about
+    existing = set()
+    if done:
+        with face_system.gallery_lock:
+            encodings, _, live_names = face_system.gallery.live_arrays()
+        existing = {(name, row.tobytes()) for name, row in zip(live_names, encodings)}
+
+    # Content already encoded with these settings skips the pool
+    cache = face_system.registration_cache
+    settings = settings_key(use='bulk_enroll', model=face_system.model,
+                            num_jitters=face_system.num_jitters, max_side=max_side)
+    hashes, cached = {}, {}
+    if cache:
+        with ThreadPoolExecutor(max_workers=8) as hashers:
+            hashes = dict(zip(todo, hashers.map(_safe_hash, todo)))
+        cached = cache.get_many([h for h in hashes.values() if h], settings)
+    hits = [path for path in todo if hashes.get(path) in cached]
+    misses = [path for path in todo if hashes.get(path) not in cached]
+    summary['cached'] = len(hits)
+
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint)), exist_ok=True)
+    encode = partial(encode_image, max_side=max_side, model=face_system.model,
+                     num_jitters=face_system.num_jitters)
+    with open(checkpoint, 'a') as progress, \
+         ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                             mp_context=mp.get_context('spawn')) as pool:
+        batch = [(path,) + cached[hashes[path]] for path in hits]
+        for start in range(0, len(batch), batch_size):
+            _commit_batch(face_system, batch[start:start + batch_size], names, existing, progress, summary)
+
+        batch = []
+        for result in pool.map(encode, misses, chunksize=8):
+            batch.append(result)
+            if len(batch) >= batch_size:
+                _cache_results(cache, settings, hashes, batch)
+                _commit_batch(face_system, batch, names, existing, progress, summary)
+                batch = []
+        _cache_results(cache, settings, hashes, batch)
+        _commit_batch(face_system, batch, names, existing, progress, summary)
+
+    # One snapshot for the whole import instead of journal compactions on the way
+    if face_system.journal:
+        face_system.journal.compact(wait=True)
+    else:
+        face_system.save_face_database()
+
+    summary['seconds'] = time.time() - started
+    logger.info(f"Bulk enrolment done in {summary['seconds']:.0f} s: {summary['enrolled']} enrolled "
+                f"({summary['cached']} images from the registration cache), "
+                f"{summary['no_face']} without a face, {summary['multiple']} with several faces, "
+                f"{summary['unreadable']} unreadable, {summary['duplicates']} already enrolled")
+    return summary
+
+
+def _safe_hash(path):
+    try:
+        return file_hash(path)
+    except OSError:
+        return None
+
+
+def _cache_results(cache, settings, hashes, batch):
+    """Remember freshly encoded images; unreadable files are not cached"""
+    if not cache:
+        return
+    entries = [(hashes[path], status, box, encoding) for path, status, box, encoding in batch
+               if hashes.get(path) and status != 'unreadable']
+    if entries:
+        cache.put_many(settings, entries)
+
+
+def _commit_batch(face_system, batch, names, existing, progress, summary):
+    """Enrol one batch, then record it in the checkpoint"""
+    if not batch:
+        return
+    encodings, batch_names = [], []
+    for path, status, _, encoding in batch:
+        if encoding is None:
+            summary[status] += 1
+            continue
+        if status == 'multiple':
+            summary['multiple'] += 1
+        key = (names[path], np.asarray(encoding, dtype=np.float32).tobytes())
+        if key in existing:
+            summary['duplicates'] += 1
+            continue
+        encodings.append(encoding)
+        batch_names.append(names[path])
+
+    if encodings:
+        face_system._enroll_batch(encodings, batch_names)
+        summary['enrolled'] += len(encodings)
+
+    for path, status, _, _ in batch:
+        progress.write(json.dumps({'path': path, 'status': status, 'name': names[path]}) + '\n')
+    progress.flush()
+    os.fsync(progress.fileno())
+    face_system.logger.info(f"Bulk enrolment: {summary['enrolled']} enrolled so far")
@@ -0,0 +1,480 @@
+import json
+import os
+import signal
+import threading
+import time
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import cv2
+
+from recog.gallery_store import write_json_atomic
+from recog.frame_deadline import LatencyMonitor
+from recog.quality_governor import QualityGovernor
+from recog.batch_encoder import BatchEncoder
+from recog.encoding_cache import EncodingCache
+from recog.face_tracker import FaceTracker
+from recog.motion_gate import MotionGate
+from recog.sightings import SightingSessionizer
+from recog.log_partitions import LogPartitions
+
+"""
+    Headless multi-camera recognition daemon.
+
+    One process opens every camera of a config file and shares a single
+    FaceRecognitionSystem (one gallery, one background RecognitionLogWriter
+    batching every camera's log rows into the partitioned SQLite log) and
+    one process pool for detection and encoding between them.
+
+    Each camera has a capture thread that keeps only its newest frame; a
+    frame replaced before it was scheduled counts as dropped. The scheduler
+    hands frames to the workers by weighted fair (stride) scheduling: every
+    camera advances by 1/weight per processed frame and the camera furthest
+    behind goes next, so a busy camera cannot starve the others. A camera
+    never has more than one frame in flight (its tracker and motion gate
+    need frames in order). The global CPU budget is the number of workers
+    plus an optional cap on the total frames per second. A live frame that
+    waited longer than its camera's deadline is dropped unprocessed.
+    Setting target_fps turns the quality governor on; without it every
+    frame is processed at the fixed 0.25x resize factor.
+
+    Config (JSON):
+        {
+          "cameras": [
+            {"id": "entrance", "source": 0, "weight": 2, "max_fps": 10, "deadline": 0.3},
+            {"id": "lobby", "source": "rtsp://10.0.0.12/stream"}
+          ],
+          "workers": 4,
+          "max_total_fps": 40,
+          "deadline": 0.5,
+          "target_fps": 10,
+          "encode_batch": 16,
+          "encode_batch_wait": 0.01,
+          "encoding_cache": false,
+          "track_faces": false,
+          "motion_gate": false,
+          "gallery": "face_gallery",
+          "tolerance": 0.4,
+          "model": "hog",
+          "detector": "haar+hog",
+          "server_url": null,
+          "session_gap": 5,
+          "raw_logging": false,
+          "log_dir": "recognition_logs",
+          "log_partition": "day",
+          "log_retention_days": 90,
+          "status_file": "daemon_status.json",
+          "stats_interval": 30
+        }
+
+    Methods (CameraDaemon):
+        start
+        run --- start and block until stop() or SIGINT/SIGTERM
+        stop
+        stats
+    Functions:
+        load_config(path)
+        daemon_from_config(path)
+"""
+
+
+def load_config(path):
+    """Read and validate a daemon config file"""
+    with open(path, 'r') as f:
+        config = json.load(f)
+    cameras = config.get('cameras') or []
+    if not cameras:
+        raise ValueError(f"No cameras configured in {path}")
+    ids = [str(camera.get('id', camera.get('source'))) for camera in cameras]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Camera ids must be unique in {path}")
+    return config
+
+
+def daemon_from_config(path):
+    """Build the shared FaceRecognitionSystem and a CameraDaemon from a config file"""
+    from recog.face_recog import FaceRecognitionSystem
+
+    config = load_config(path)
+    # Faces of all cameras are encoded in shared batches (0 disables)
+    batch_size = config.get('encode_batch', 16)
+    batch_encoder = None
+    if batch_size and batch_size > 1:
+        batch_encoder = BatchEncoder(max_batch=batch_size, max_wait=config.get('encode_batch_wait', 0.01))
+    face_system = FaceRecognitionSystem(
+        tolerance=config.get('tolerance', 0.4),
+        model=config.get('model', 'hog'),
+        detector=config.get('detector'),
+        server_url=config.get('server_url'),
+        enable_logging=True,
+        governor=QualityGovernor(target_fps=config['target_fps']) if config.get('target_fps') else None,
+        batch_encoder=batch_encoder,
+        # Frame-to-frame reuse is off unless the config asks for it
+        tracker=FaceTracker() if config.get('track_faces') else None,
+        motion_gate=MotionGate() if config.get('motion_gate') else None,
+        encoding_cache=EncodingCache() if config.get('encoding_cache') else None,
+        sessionizer=SightingSessionizer(gap=config.get('session_gap', 5.0)),
+        gallery_path=config.get('gallery') or 'face_gallery',
+        raw_logging=config.get('raw_logging', False),
+        log_partitions=LogPartitions(config.get('log_dir', 'recognition_logs'),
+                                     period=config.get('log_partition', 'day'),
+                                     retention_days=config.get('log_retention_days'))
+    )
+
+    return CameraDaemon(
+        face_system,
+        config['cameras'],
+        workers=config.get('workers'),
+        max_total_fps=config.get('max_total_fps'),
+        deadline=config.get('deadline', 0.5),
+        status_file=config.get('status_file'),
+        stats_interval=config.get('stats_interval', 30)
+    )
+
+
+class _Camera:
+    def __init__(self, spec, deadline):
+        self.source = spec['source']
+        self.id = str(spec.get('id', self.source))
+        self.weight = float(spec.get('weight', 1.0))
+        self.max_fps = spec.get('max_fps')
+        # Video files are read as fast as they are processed, never dropped
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        self.latency = LatencyMonitor(None if self.is_file else spec.get('deadline', deadline))
+
+        self.cap = None
+        self.pending = None  # (frame, captured_at)
+        self.busy = False
+        self.finished = False
+        self.connected = False
+        self.pass_value = 0.0
+        self.next_due = 0.0
+
+        self.captured = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.faces = 0
+        self.window_start = time.time()
+        self.window_captured = 0
+        self.window_processed = 0
+
+
+class CameraDaemon:
+    def __init__(self,
+                 face_system,
+                 cameras,
+                 workers=None,
+                 max_total_fps=None,
+                 deadline=0.5,
+                 status_file=None,
+                 stats_interval=30,
+                 reconnect_seconds=5.0,
+                 use_processes=True):
+        """
+        Serve several cameras from one FaceRecognitionSystem
+
+        Args:
+            face_system: Shared FaceRecognitionSystem
+            cameras: List of camera specs ({'id', 'source', 'weight', 'max_fps', 'deadline'})
+            workers: Frames processed in parallel (default: CPU count)
+            max_total_fps: Cap on processed frames per second over all cameras
+            deadline: Default seconds a live frame may wait for a worker
+            status_file: JSON file rewritten with stats() every stats_interval
+            stats_interval: Seconds between stats reports
+            reconnect_seconds: Wait before reopening a camera that failed
+            use_processes: Run detection/encoding in a shared process pool
+        """
+        self.system = face_system
+        self.cameras = [_Camera(spec, deadline) for spec in cameras]
+        self.workers = workers or os.cpu_count() or 1
+        self.max_total_fps = max_total_fps
+        self.status_file = status_file
+        self.stats_interval = stats_interval
+        self.reconnect_seconds = reconnect_seconds
+        self.use_processes = use_processes
+        self.logger = face_system.logger
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._next_slot = 0.0
+        self._threads = []
+        self._pool = None
+        self._started_at = None
+
+    # ------------------------------ lifecycle ------------------------------
+
+    def start(self):
+        """Open the cameras and start capturing and scheduling"""
+        if self.use_processes and self.system.executor is None:
+            self.system.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp.get_context('spawn')
+            )
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="daemon-worker")
+        self._started_at = time.time()
+
+        for camera in self.cameras:
+            thread = threading.Thread(target=self._capture, args=(camera,),
+                                      name=f"capture-{camera.id}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        for target, name in ((self._schedule, "scheduler"), (self._report, "stats")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.logger.info(f"Daemon started: {len(self.cameras)} cameras, {self.workers} workers")
+
+    def run(self):
+        """Start the daemon and block until it is stopped"""
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: self.stop())
+        self.start()
+        while not self._stop.is_set():
+            self._stop.wait(1.0)
+            if all(camera.finished for camera in self.cameras):
+                with self._cond:
+                    if not self._in_flight and not any(c.pending for c in self.cameras):
+                        self.stop()
+        self._shutdown()
+
+    def stop(self):
+        """Ask every thread to finish"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _shutdown(self):
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self.system.executor is not None:
+            self.system.executor.shutdown(wait=False, cancel_futures=True)
+            self.system.executor = None
+        for camera in self.cameras:
+            if camera.cap is not None:
+                camera.cap.release()
+                camera.cap = None
+        self._write_stats()
+        self.logger.info("Daemon stopped")
+
+    # ------------------------------- capture -------------------------------
+
+    def _open(self, camera):
+        cap = cv2.VideoCapture(camera.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+
+    def _capture(self, camera):
+        """Keep the newest frame of one camera in its slot"""
+        last_retrieve = 0.0
+        while not self._stop.is_set():
+            if camera.cap is None:
+                camera.cap = self._open(camera)
+                camera.connected = camera.cap is not None
+                if camera.cap is None:
+                    self.logger.warning(f"Camera {camera.id}: cannot open {camera.source}, "
+                                        f"retrying in {self.reconnect_seconds:.0f}s")
+                    self._stop.wait(self.reconnect_seconds)
+                    continue
+
+            if camera.is_file:
+                # Offline source: wait for the slot instead of dropping
+                with self._cond:
+                    self._cond.wait_for(lambda: camera.pending is None or self._stop.is_set())
+            else:
+                # An idle camera is still drained (grab is cheap) but only
+                # decoded at the slower idle rate
+                interval = self.system.frame_interval(camera.id)
+                if interval and time.time() - last_retrieve < interval:
+                    if not camera.cap.grab():
+                        self._lost(camera)
+                    else:
+                        self._stop.wait(0.01)
+                    continue
+
+            ret, frame = camera.cap.read()
+            if not ret:
+                if camera.is_file:
+                    camera.finished = True
+                    camera.cap.release()
+                    camera.cap = None
+                    break
+                self._lost(camera)
+                continue
+            last_retrieve = time.time()
+
+            with self._cond:
+                if camera.pending is not None:
+                    camera.dropped += 1
+                camera.pending = (frame, last_retrieve)
+                camera.captured += 1
+                camera.window_captured += 1
+                self._cond.notify_all()
+
+    def _lost(self, camera):
+        self.logger.warning(f"Camera {camera.id}: stream lost, reconnecting")
+        camera.cap.release()
+        camera.cap = None
+        camera.connected = False
+        self._stop.wait(self.reconnect_seconds)
+
+    # ------------------------------ scheduling -----------------------------
+
+    def _pick(self, now):
+        """Next camera by stride scheduling, or None (call with _cond held)"""
+        for camera in self.cameras:
+            if camera.pending is not None and camera.latency.expired(camera.pending[1], now):
+                camera.pending = None
+        eligible = [camera for camera in self.cameras
+                    if camera.pending is not None and not camera.busy and now >= camera.next_due]
+        if not eligible:
+            return None
+        for camera in eligible:
+            # A camera coming back from a quiet spell does not get a burst
+            camera.pass_value = max(camera.pass_value, self._virtual_time)
+        camera = min(eligible, key=lambda c: c.pass_value)
+        self._virtual_time = camera.pass_value
+        camera.pass_value += 1.0 / camera.weight
+        return camera
+
+    def _wait_time(self, now):
+        """Seconds until a rate limit may let a waiting frame through (_cond held)"""
+        waits = [camera.next_due - now for camera in self.cameras
+                 if camera.pending is not None and not camera.busy and camera.next_due > now]
+        if self._next_slot > now:
+            waits.append(self._next_slot - now)
+        return min(waits) if waits else 0.5
+
+    def _schedule(self):
+        while not self._stop.is_set():
+            with self._cond:
+                now = time.time()
+                camera = None
+                if self._in_flight < self.workers and now >= self._next_slot:
+                    camera = self._pick(now)
+                if camera is None:
+                    # Woken by a new frame or a finished job; the timeout
+                    # covers per-camera and global rate limits
+                    self._cond.wait(timeout=self._wait_time(now))
+                    continue
+
+                frame, captured_at = camera.pending
+                camera.pending = None
+                camera.busy = True
+                self._in_flight += 1
+                if camera.max_fps:
+                    camera.next_due = now + 1.0 / camera.max_fps
+                if self.max_total_fps:
+                    self._next_slot = now + 1.0 / self.max_total_fps
+                # The slot is free again, file sources may read on
+                self._cond.notify_all()
+
+            self._pool.submit(self._process, camera, frame, captured_at)
+
+    def _process(self, camera, frame, captured_at):
+        try:
+            _, results = self.system.process_frame(frame, camera.id, annotate=False)
+            error = False
+        except Exception as e:
+            results = []
+            error = True
+            self.logger.error(f"Camera {camera.id}: error processing frame: {str(e)}")
+
+        with self._cond:
+            camera.busy = False
+            camera.processed += 1
+            camera.window_processed += 1
+            camera.faces += len(results)
+            camera.errors += error
+            camera.latency.record(captured_at)
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    # -------------------------------- stats --------------------------------
+
+    def stats(self):
+        """
+        Per-camera counters since start and rates over the current window
+
+        Returns:
+            dict: {'uptime', 'workers', 'in_flight', 'encoding_cache', 'batch_encoder', 'sessions', 'log',
+                   'cameras': {id: {
+                   'connected', 'captured', 'processed', 'dropped', 'errors',
+                   'faces', 'capture_fps', 'fps', 'idle',
+                   'latency' (LatencyMonitor.stats)}}}
+        """
+        now = time.time()
+        motion = self.system.get_motion_stats()
+        cache = self.system.get_cache_stats()
+        batching = self.system.get_batch_stats()
+        sessions = self.system.get_session_stats()
+        log = self.system.get_log_stats()
+        with self._cond:
+            report = {
+                'uptime': now - (self._started_at or now),
+                'workers': self.workers,
+                'in_flight': self._in_flight,
+                'encoding_cache': cache,
+                'batch_encoder': batching,
+                'sessions': sessions,
+                'log': log,
+                'cameras': {},
+            }
+            for camera in self.cameras:
+                window = max(now - camera.window_start, 1e-9)
+                report['cameras'][camera.id] = {
+                    'connected': camera.connected,
+                    'captured': camera.captured,
+                    'processed': camera.processed,
+                    'dropped': camera.dropped,
+                    'errors': camera.errors,
+                    'faces': camera.faces,
+                    'capture_fps': camera.window_captured / window,
+                    'fps': camera.window_processed / window,
+                    'latency': camera.latency.stats(),
+                    'idle': motion.get(camera.id, {}).get('idle', False),
+                }
+        return report
+
+    def _write_stats(self):
+        report = self.stats()
+        for camera_id, camera in report['cameras'].items():
+            latency = camera['latency']
+            self.logger.info(f"Camera {camera_id}: {camera['fps']:.1f} fps processed "
+                             f"({camera['capture_fps']:.1f} captured), "
+                             f"{camera['dropped']} dropped, {latency['expired']} past deadline, "
+                             f"latency p50 {latency['p50_ms']:.0f} / p95 {latency['p95_ms']:.0f} ms"
+                             f"{', idle' if camera['idle'] else ''}")
+        cache = report['encoding_cache']
+        if cache:
+            self.logger.info(f"Encoding cache: {cache['hits']} hits, {cache['misses']} misses "
+                             f"({cache['hit_rate']:.0%}), {cache['size']} entries")
+        batching = report['batch_encoder']
+        if batching:
+            self.logger.info(f"Batch encoder: {batching['faces']} faces in {batching['batches']} batches "
+                             f"(mean {batching['mean_batch']:.1f}), mean wait {batching['mean_wait_ms']:.1f} ms")
+        if self.status_file:
+            try:
+                write_json_atomic(self.status_file, report)
+            except Exception as e:
+                self.logger.error(f"Error writing daemon status: {str(e)}")
+
+    def _report(self):
+        while not self._stop.wait(self.stats_interval):
+            self._write_stats()
+            # Start a new rate window
+            with self._cond:
+                now = time.time()
+                for camera in self.cameras:
+                    camera.window_start = now
+                    camera.window_captured = 0
+                    camera.window_processed = 0
@@ -0,0 +1,119 @@
+import cv2
+import face_recognition
+
+from recog.face_tracker import iou
+from recog.detectors import MIN_HOG_FACE, get_detector
+
+"""
+    Coarse-to-fine face encoding.
+
+    Faces are found on the downscaled frame as usual, then every candidate
+    is cut out of the full-resolution frame with a margin, detection is
+    refined on that crop and the face is encoded from it. Small faces at a
+    distance get a full-resolution chip for the encoder instead of a handful
+    of upscaled pixels, while the expensive full-resolution work is limited
+    to the face regions. Crops of large faces are shrunk to about
+    face_size pixels, the encoder works on 150 px chips anyway.
+
+    Functions:
+        crop_regions(frame, face_locations, scale, margin=0.4, face_size=150)
+        refine_and_encode(regions, detector='hog') --- module level for process pools
+        to_frame_box(box, origin)
+        refined_locations(refined, origins, scale) --- refined boxes on the downscaled frame
+"""
+
+def crop_regions(frame, face_locations, scale, margin=0.4, face_size=150):
+    """
+    Cut the candidate faces out of the full-resolution frame
+
+    Args:
+        frame: Full-resolution BGR frame
+        face_locations: (top, right, bottom, left) boxes on the downscaled frame
+        scale: Resize factor of the downscaled frame
+        margin: Context added around each box, as a fraction of its size
+        face_size: Faces taller than this are shrunk to it
+
+    Returns:
+        tuple: (regions, origins) where regions are (rgb_crop, hint_box) pairs,
+               hint_box being the coarse box in crop coordinates, and origins
+               are (y0, x0, factor) to map crop boxes back to the frame
+    """
+    height, width = frame.shape[:2]
+    regions, origins = [], []
+    for top, right, bottom, left in face_locations:
+        top, right, bottom, left = top / scale, right / scale, bottom / scale, left / scale
+        margin_y = (bottom - top) * margin
+        margin_x = (right - left) * margin
+        y0, y1 = max(0, int(top - margin_y)), min(height, int(bottom + margin_y))
+        x0, x1 = max(0, int(left - margin_x)), min(width, int(right + margin_x))
+
+        crop = frame[y0:y1, x0:x1]
+        factor = min(1.0, face_size / max(bottom - top, 1.0))
+        if factor < 1.0:
+            crop = cv2.resize(crop, (0, 0), fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+
+        hint = (int((top - y0) * factor), int((right - x0) * factor),
+                int((bottom - y0) * factor), int((left - x0) * factor))
+        regions.append((crop, hint))
+        origins.append((y0, x0, factor))
+    return regions, origins
+
+
+def refine_and_encode(regions, detector='hog'):
+    """
+    Refine detection on each crop and encode the face found there
+
+    Falls back to the coarse box when the refinement finds nothing that
+    overlaps it, so every candidate gets an encoding.
+
+    Args:
+        regions: (rgb_crop, hint_box) pairs from crop_regions
+        detector: FaceDetector or detector spec (see get_detector) that
+                  re-detects the face on the crop
+
+    Returns:
+        list: (box_in_crop, encoding or None, refined) per region
+    """
+    detector = get_detector(detector)
+    refined = []
+    for crop, hint in regions:
+        upsample = 1 if hint[2] - hint[0] < MIN_HOG_FACE else 0
+        found = detector.detect(crop, upsample)
+
+        box, was_refined = hint, False
+        if found:
+            best = max(found, key=lambda candidate: iou(candidate, hint))
+            if iou(best, hint) >= 0.3:
+                box, was_refined = best, True
+
+        encodings = face_recognition.face_encodings(crop, [box])
+        refined.append((box, encodings[0] if encodings else None, was_refined))
+    return refined
+
+
+def to_frame_box(box, origin):
+    """Map a crop box back to full-frame coordinates"""
+    y0, x0, factor = origin
+    top, right, bottom, left = box
+    return (int(y0 + top / factor), int(x0 + right / factor),
+            int(y0 + bottom / factor), int(x0 + left / factor))
+
+
+def refined_locations(refined, origins, scale):
+    """
+    Boxes of refine_and_encode mapped onto the downscaled frame
+
+    Results and tracks keep boxes in downscaled frame coordinates; these
+    scale back up to the refined full-resolution box exactly.
+
+    Args:
+        refined: (box_in_crop, encoding, refined) per region
+        origins: Origins from crop_regions
+        scale: Resize factor of the downscaled frame
+
+    Returns:
+        list: (top, right, bottom, left) boxes
+    """
+    return [tuple(value * scale for value in to_frame_box(box, origin))
+            for (box, _, _), origin in zip(refined, origins)]
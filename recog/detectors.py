@@ -0,0 +1,200 @@
+import abc
+import os
+
+import cv2
+import face_recognition
+
+from recog.face_tracker import iou
+
+"""
+    Face detector backends.
+
+    Every backend takes an RGB frame and returns (top, right, bottom, left)
+    boxes, the format of face_recognition.face_locations, so the rest of the
+    system does not care which one found the faces.
+
+        hog / cnn     face_recognition (dlib) detectors
+        haar          OpenCV Haar cascade shipped in cv2.data
+        <file>.xml    any OpenCV cascade file, e.g. an LBP cascade
+        haar+hog      cascade proposes regions, HOG only verifies those
+
+    Cascades are an order of magnitude cheaper than HOG but produce more
+    false positives; cascade-then-verify keeps HOG's precision while HOG
+    only runs on small crops around the proposals. Detectors hold no
+    OpenCV objects themselves (classifiers are loaded once per process),
+    so they can be passed to a process pool.
+
+    Methods (FaceDetector):
+        detect(self, rgb_frame, upsample=1)
+    Functions:
+        get_detector(spec)
+        available_detectors
+"""
+
+# HOG does not find faces much smaller than this without upsampling
+MIN_HOG_FACE = 80
+
+CASCADES = {
+    'haar': 'haarcascade_frontalface_default.xml',
+    'haar_alt': 'haarcascade_frontalface_alt2.xml',
+}
+
+# cascade path -> cv2.CascadeClassifier, per process
+_classifiers = {}
+
+
+def _classifier(path):
+    classifier = _classifiers.get(path)
+    if classifier is None:
+        classifier = cv2.CascadeClassifier(path)
+        if classifier.empty():
+            raise ValueError(f"Could not load cascade {path}")
+        _classifiers[path] = classifier
+    return classifier
+
+
+class FaceDetector(abc.ABC):
+    name = 'detector'
+
+    @abc.abstractmethod
+    def detect(self, rgb_frame, upsample=1):
+        """
+        Find faces on an RGB frame
+
+        Args:
+            rgb_frame: RGB image
+            upsample: Times the frame is doubled in size to find small faces
+
+        Returns:
+            list: (top, right, bottom, left) boxes
+        """
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class DlibDetector(FaceDetector):
+    def __init__(self, model='hog'):
+        """
+        face_recognition detector
+
+        Args:
+            model: 'hog' for CPU, 'cnn' for GPU
+        """
+        self.model = model
+        self.name = model
+
+    def detect(self, rgb_frame, upsample=1):
+        return face_recognition.face_locations(rgb_frame, number_of_times_to_upsample=upsample, model=self.model)
+
+
+class CascadeDetector(FaceDetector):
+    def __init__(self, cascade='haar', scale_factor=1.1, min_neighbors=5, min_size=20):
+        """
+        OpenCV cascade detector
+
+        Args:
+            cascade: Name in CASCADES (loaded from cv2.data.haarcascades) or a
+                     path to a cascade XML file (Haar or LBP)
+            scale_factor: Image pyramid step
+            min_neighbors: Overlapping hits needed to keep a detection
+            min_size: Smallest face in pixels, before upsampling
+        """
+        if cascade in CASCADES:
+            self.path = os.path.join(cv2.data.haarcascades, CASCADES[cascade])
+            self.name = cascade
+        else:
+            self.path = cascade
+            self.name = os.path.splitext(os.path.basename(cascade))[0]
+        if not os.path.exists(self.path):
+            raise ValueError(f"Unknown detector or missing cascade file: {cascade}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, rgb_frame, upsample=1):
+        gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        factor = 2 ** upsample
+        if factor > 1:
+            gray = cv2.resize(gray, (0, 0), fx=factor, fy=factor)
+        boxes = _classifier(self.path).detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size))
+        return [(int(y / factor), int((x + w) / factor), int((y + h) / factor), int(x / factor))
+                for x, y, w, h in boxes]
+
+
+class CascadeVerifyDetector(FaceDetector):
+    def __init__(self, cascade='haar', verifier='hog', margin=0.3, min_neighbors=3):
+        """
+        Cascade proposals verified by a dlib detector on crops
+
+        The cascade runs with fewer required neighbours than on its own, so
+        it over-proposes and HOG removes the false positives. Each crop is
+        resized so the proposed face is about MIN_HOG_FACE pixels tall,
+        which lets HOG verify it without upsampling.
+
+        Args:
+            cascade: Cascade name or path, see CascadeDetector
+            verifier: dlib model that checks the proposals
+            margin: Context added around each proposal, as a fraction of its size
+            min_neighbors: Cascade neighbours for a proposal
+        """
+        self.proposer = CascadeDetector(cascade, min_neighbors=min_neighbors)
+        self.verifier = DlibDetector(verifier)
+        self.margin = margin
+        self.name = f"{self.proposer.name}+{verifier}"
+
+    def detect(self, rgb_frame, upsample=1):
+        height, width = rgb_frame.shape[:2]
+        faces = []
+        for top, right, bottom, left in self.proposer.detect(rgb_frame, upsample):
+            margin_y = int((bottom - top) * self.margin)
+            margin_x = int((right - left) * self.margin)
+            y0, y1 = max(0, top - margin_y), min(height, bottom + margin_y)
+            x0, x1 = max(0, left - margin_x), min(width, right + margin_x)
+
+            crop = rgb_frame[y0:y1, x0:x1]
+            factor = max(1.0, (MIN_HOG_FACE * 1.25) / max(bottom - top, 1))
+            if factor > 1.0:
+                crop = cv2.resize(crop, (0, 0), fx=factor, fy=factor)
+
+            for c_top, c_right, c_bottom, c_left in self.verifier.detect(crop, 0):
+                box = (int(y0 + c_top / factor), int(x0 + c_right / factor),
+                       int(y0 + c_bottom / factor), int(x0 + c_left / factor))
+                # Neighbouring proposals can verify the same face twice
+                if all(iou(box, face) < 0.5 for face in faces):
+                    faces.append(box)
+        return faces
+
+
+def get_detector(spec):
+    """
+    Resolve a detector spec
+
+    Args:
+        spec: FaceDetector instance, 'hog', 'cnn', a cascade name or XML path,
+              or '<cascade>+<hog|cnn>' for cascade-then-verify
+
+    Returns:
+        FaceDetector
+    """
+    if isinstance(spec, FaceDetector):
+        return spec
+    if spec in ('hog', 'cnn'):
+        return DlibDetector(spec)
+    if '+' in spec:
+        cascade, verifier = spec.rsplit('+', 1)
+        return CascadeVerifyDetector(cascade, verifier)
+    return CascadeDetector(spec)
+
+
+def available_detectors():
+    """Detector specs usable in this installation"""
+    specs = ['hog', 'cnn']
+    for name, filename in CASCADES.items():
+        if os.path.exists(os.path.join(cv2.data.haarcascades, filename)):
+            specs += [name, f'{name}+hog']
+    return specs
@@ -0,0 +1,146 @@
+import collections
+import threading
+import time
+
+import cv2
+import numpy as np
+
+"""
+    Perceptual-hash cache of face encodings.
+
+    In a static scene the same face crop reaches the encoder frame after
+    frame. Every crop gets a 64-bit DCT perceptual hash of its normalised
+    grey image (resized to 32x32, so brightness shifts and sensor noise
+    barely change it) and a location bucket (camera, quantised centre and
+    size of the box). A crop whose hash is within max_distance bits of the
+    entry in its bucket reuses that entry's encoding, skipping the encoder.
+    Only encodings are cached: every face is still matched against the
+    current gallery, so enrolments and removals apply on the next frame.
+
+    A different face that steps into the same spot can hash close enough
+    to reuse the previous face's encoding until the entry expires, which
+    is why the cache is opt-in (FaceRecognitionSystem(encoding_cache=...))
+    and entries live only ttl seconds.
+
+    The cache is an LRU over buckets with a size limit, and entries expire
+    ttl seconds after they were encoded so a face is re-encoded now and
+    then even if it never moves.
+
+    Methods (EncodingCache):
+        key(self, rgb_frame, box, camera_id) --- (bucket, hash)
+        get(self, key) --- encoding or None
+        put(self, key, encoding)
+        clear
+        stats
+"""
+
+
+def perceptual_hash(crop, hash_size=8):
+    """64-bit DCT hash of an RGB crop, as a Python int"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(gray, (hash_size * 4, hash_size * 4), interpolation=cv2.INTER_AREA)
+    small = cv2.equalizeHist(small)
+    low = cv2.dct(np.float32(small))[:hash_size, :hash_size]
+    bits = (low > np.median(low[1:, 1:])).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class EncodingCache:
+    def __init__(self, max_size=1024, ttl=2.0, max_distance=8, bucket_size=16):
+        """
+        LRU/TTL cache of encodings keyed by crop hash and location
+
+        Args:
+            max_size: Buckets kept, the least recently used is evicted
+            ttl: Seconds an encoding is reused before the face is encoded again
+            max_distance: Hash bits that may differ for a crop to count as
+                          near-identical (out of 64)
+            bucket_size: Pixels of box centre and size quantisation
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.bucket_size = bucket_size
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        # bucket -> (hash, encoding, stored_at)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, rgb_frame, box, camera_id):
+        """
+        Cache key of a face box on a frame
+
+        Returns:
+            tuple: (bucket, hash)
+        """
+        top, right, bottom, left = (int(v) for v in box)
+        height, width = rgb_frame.shape[:2]
+        crop = rgb_frame[max(0, top):min(height, bottom), max(0, left):min(width, right)]
+        if crop.size == 0:
+            return None
+        b = self.bucket_size
+        # The frame width keeps boxes of different resize factors apart
+        bucket = (camera_id, width, (top + bottom) // 2 // b, (left + right) // 2 // b, (bottom - top) // b)
+        return bucket, perceptual_hash(crop)
+
+    def get(self, key, now=None):
+        """
+        Look up a near-identical crop
+
+        Returns:
+            The cached encoding on a hit, None on a miss
+        """
+        if key is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        bucket, phash = key
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.get(bucket)
+            if entry is not None and now - entry[2] > self.ttl:
+                del self._entries[bucket]
+                self.expired += 1
+                entry = None
+            if entry is None or bin(entry[0] ^ phash).count('1') > self.max_distance:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(bucket)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, encoding, now=None):
+        """Store the encoding of a crop"""
+        if key is None or encoding is None:
+            return
+        bucket, phash = key
+        with self._lock:
+            self._entries[bucket] = (phash, encoding, now or time.time())
+            self._entries.move_to_end(bucket)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'size', 'hits', 'misses', 'hit_rate', 'expired', 'evictions'}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expired': self.expired,
+                'evictions': self.evictions,
+            }
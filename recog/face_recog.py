@@ -0,0 +1,1042 @@
+import cv2
+import face_recognition
+import numpy as np
+import os
+import io
+import hashlib
+import requests
+import json
+import threading
+import time
+from datetime import datetime
+import logging
+from collections import defaultdict
+
+from recog.gallery import FaceGallery, label_matches
+from recog.ann_index import BruteForceIndex
+from recog.gallery_store import gallery_exists, save_gallery, load_gallery, migrate_pickle
+from recog.gallery_journal import GalleryJournal, OP_ADD
+from recog.pipeline import RecognitionPipeline, detect_faces, encode_faces
+from recog.frame_deadline import LatestFrameReader, LatencyMonitor
+from recog.coarse_to_fine import crop_regions, refine_and_encode, refined_locations
+from recog.detectors import get_detector
+from recog.batch_encoder import BatchEncoder
+from recog.registration_cache import RegistrationCache, settings_key
+from recog.log_writer import RecognitionLogWriter
+from recog.log_store import INSERT_SESSION, epoch
+from recog.log_partitions import LogPartitions
+from recog.log_query import query_history, fetch_page
+from recog.sightings import SightingSessionizer
+
+"""
+    Methods:
+        setup_logging 
+        setup_database
+        add_known_face(self, image_path, name, metadata=None)
+        registration_settings --- registration cache key
+        _registration_encoding(self, data) --- content-addressed cache
+        _enroll(self, encoding, name, metadata=None) --- gallery + journal
+        _enroll_batch(self, encodings, names) --- one journal fsync per batch
+        bulk_enroll(self, directory, workers=None, batch_size=256, **kwargs)
+        remove_known_faces(self, names) --- tombstones, compacted in background
+        _schedule_gallery_compaction
+        _compact_gallery
+        save_face_database(self, path=None)
+        load_face_database(self, path='face_gallery', legacy_pickle='face_database.pkl')
+        _apply_journal(self, records)
+        _gallery_snapshot
+        process_frame(self, frame, camera_id="default", annotate=True)
+        camera_lock(self, camera_id) --- serialises a camera's frames across threads
+        _quality(self, camera_id) --- (scale, upsample, stride)
+        _record_quality(self, camera_id, seconds) --- feeds the governor
+        _locate_faces(self, rgb_small_frame, camera_id, upsample=1, stride=1, frame=None, scale=0.25) --- tracker stage
+        _encode_faces(self, rgb_small_frame, face_locations, frame=None, scale=0.25) --- coarse-to-fine aware
+        _identify(self, rgb_small_frame, face_locations, camera_id, frame=None, scale=0.25) --- cache aware
+        _cache_lookup(self, rgb_small_frame, face_locations, camera_id)
+        _cache_store(self, keys, face_encodings, cached)
+        _run_stage(self, fn, *args) --- in self.executor when one is set
+        _build_results(self, face_locations, matches, camera_id, scale=0.25)
+        _annotate_frame(self, frame, recognition_results)
+        _publish_results(self, recognition_results) --- database + server, expires sessions
+        match_encodings(self, face_encodings)
+        frame_interval(self, camera_id, active_interval=0.0) --- idle mode pacing
+        get_motion_stats
+        get_cache_stats
+        get_batch_stats
+        log_recognition(self, result) --- sighting session and/or raw row, queued for the log writer
+        get_log_stats --- writer queue and partitions
+        get_session_stats
+        send_to_server(self, result)
+        _post_to_server(self, data)
+        run_camera_recognition(self, camera_index=0, display=True, pipeline=False, latency_budget=0.5)
+        run_offline_recognition(self, sources, output=None, stride=5, workers=None, **kwargs)
+        query_recognitions(self, name=None, camera_id=None, since=None, until=None, ...) --- keyset-paginated generator
+        get_recognition_page(self, page_size=100, cursor=None, **filters)
+        get_recognition_stats(self, days=7, since=None, until=None) --- from the rollup tables
+        close --- write open sessions, flush logs, release database, journal and workers
+"""
+
+class FaceRecognitionSystem:
+    def __init__(self, 
+                 tolerance=0.4, 
+                 model='hog',  # 'hog' for CPU, 'cnn' for GPU
+                 server_url=None,
+                 enable_logging=True,
+                 index=None,
+                 journal_compact_bytes=4 * 1024 * 1024,
+                 tracker=None,
+                 motion_gate=None,
+                 governor=None,
+                 coarse_to_fine=False,
+                 detector=None,
+                 encoding_cache=None,
+                 batch_encoder=None,
+                 registration_cache=None,
+                 num_jitters=1,
+                 sessionizer=None,
+                 raw_logging=False,
+                 log_partitions=None,
+                 box_color=(0, 255, 0),
+                 box_thickness=2,
+                 gallery_path='face_gallery'):
+        """
+        Initialize the face recognition system
+        
+        Args:
+            tolerance: Face matching tolerance (lower = stricter)
+            model: Face detection model ('hog' for CPU, 'cnn' for GPU)
+            server_url: Optional server URL for sending recognition data
+            enable_logging: Enable detailed logging
+            index: Gallery search index, e.g. IVFIndex(n_probe=8) for very
+                   large galleries or SharedMemoryIndex(n_workers=4) to match
+                   on a process pool (defaults to exact brute-force search)
+            journal_compact_bytes: Gallery journal size that triggers a
+                   background snapshot
+            tracker: FaceTracker that lets process_frame reuse the identity
+                   of faces it already follows (default: None, encode and
+                   match every face on every frame)
+            motion_gate: MotionGate that skips detection on static frames and
+                   slows capture loops down when a camera is idle
+                   (default: None, detect on every frame)
+            governor: QualityGovernor that adapts resize factor, upsampling
+                   and detection stride to hold a target FPS per camera
+                   (default: None keeps 0.25x, HOG upsample 1 and detection
+                   on every frame)
+            coarse_to_fine: Detect on the downscaled frame but refine and
+                   encode every face from a full-resolution crop
+            detector: Detector backend for live frames: a FaceDetector or a
+                   spec such as 'haar' or 'haar+hog' (default: model)
+            encoding_cache: EncodingCache that reuses the encodings of
+                   near-identical face crops, every face is still matched
+                   against the gallery (default: None, encode every crop)
+            batch_encoder: BatchEncoder that encodes the faces of concurrent
+                   frames (several cameras or pipeline workers) together;
+                   None encodes each frame on its own
+            registration_cache: RegistrationCache holding the encodings of
+                   registration photos by content hash (default:
+                   RegistrationCache('registration_cache.db')); False
+                   always re-encodes
+            num_jitters: Encoder re-samples per registration photo
+            sessionizer: SightingSessionizer that collapses consecutive
+                   sightings of a name on a camera into one
+                   recognition_sessions row (default: SightingSessionizer());
+                   False logs every face of every frame instead
+            raw_logging: Also log every face of every frame to
+                   recognition_logs when sessions are on
+            log_partitions: LogPartitions the logs are stored in (default:
+                   LogPartitions(), one file per day under recognition_logs/,
+                   kept forever)
+            box_color: BGR colour of the boxes and labels drawn on frames
+            box_thickness: Line width of the boxes drawn on frames
+            gallery_path: Gallery directory loaded (or migrated) at startup
+        """
+        self.tolerance = tolerance
+        self.model = model
+        self.detector = get_detector(detector or model)
+        self.server_url = server_url
+        # Always usable, setup_logging only adds the file and console handlers
+        self.logger = logging.getLogger(__name__)
+        self.box_color = box_color
+        self.box_thickness = box_thickness
+        
+        # Storage for known faces
+        self.gallery = FaceGallery()
+        self.known_face_metadata = {}
+        self.index = index or BruteForceIndex()
+        self.index.attach(self.gallery)
+        
+        # Gallery persistence (snapshot + append-only journal)
+        self.gallery_path = None
+        self.gallery_lock = threading.RLock()
+        self.journal = None
+        self.journal_compact_bytes = journal_compact_bytes
+        self._gallery_compactor = None
+        
+        # Tracks faces across frames so known ones skip the encoder (opt-in)
+        self.tracker = tracker
+        
+        # Static frames reuse the last faces found on their camera (opt-in)
+        self.motion_gate = motion_gate
+        self._last_faces = {}
+        
+        # Trades resolution and detection rate for FPS under load (opt-in)
+        self.governor = governor
+        self._detect_counts = defaultdict(int)
+        
+        # process_frame runs on several threads (CameraDaemon workers): the
+        # per-camera state above is only touched under that camera's lock
+        self._camera_locks = {}
+        self._camera_locks_lock = threading.Lock()
+        
+        # Encode from full-resolution crops instead of the downscaled frame
+        self.coarse_to_fine = coarse_to_fine
+        
+        # Near-identical crops reuse their encoding (opt-in)
+        self.encoding_cache = encoding_cache
+        
+        # Registration photos are encoded once per content and settings
+        self.num_jitters = num_jitters
+        self.registration_cache = RegistrationCache() if registration_cache is None else registration_cache
+        
+        # One log row per visit, per-frame rows only on request
+        self.sessionizer = SightingSessionizer() if sessionizer is None else sessionizer
+        self.raw_logging = raw_logging or not self.sessionizer
+        
+        # Encodes the faces of concurrent frames in shared batches
+        self.batch_encoder = batch_encoder
+        if batch_encoder is not None and batch_encoder.runner is None:
+            batch_encoder.runner = self._run_stage
+        
+        # Optional process pool for detection and encoding, shared by the
+        # cameras of a CameraDaemon (dlib holds the GIL)
+        self.executor = None
+        
+        # Performance tracking
+        self.recognition_history = defaultdict(list)
+        self.frame_count = 0
+        self.fps_counter = 0
+        self.last_fps_time = time.time()
+        
+        # Database setup
+        self.log_partitions = LogPartitions() if log_partitions is None else log_partitions
+        self.setup_database()
+        
+        # Logging setup
+        if enable_logging:
+            self.setup_logging()
+        
+        # Load existing face data
+        self.load_face_database(gallery_path)
+    
+    @property
+    def known_face_encodings(self):
+        """(N, 128) float32 view of the known face encodings"""
+        return self.gallery.encodings
+    
+    @property
+    def known_face_names(self):
+        """Names of the known (not removed) faces"""
+        return self.gallery.live_names()
+    
+    def setup_logging(self):
+        """Setup logging configuration"""
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler('face_recognition.log'),
+                logging.StreamHandler()
+            ]
+        )
+    
+    def setup_database(self):
+        """Setup SQLite database for storing recognition logs"""
+        # One background thread owns every write, readers open the
+        # partitions their time range needs
+        self.log_writer = RecognitionLogWriter(self.log_partitions)
+   
+    # validate face details for face registration
+    def add_known_face(self, image_path, name, metadata=None):
+        """
+        Add a known face to the recognition database
+        
+        Args:
+            image_path: Path to the image file. This is a temporary file. If the face info is valid then this function will return true to proceed for actual saving of the file.
+            name: Name of the person
+            metadata: Additional metadata (dict)
+        """
+        try:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            status, _, face_encoding = self._registration_encoding(data)
+            
+            if status == 'no_face':
+                self.logger.warning(f"No face found in {image_path}")
+                return False
+            
+            if status == 'multiple':
+                self.logger.warning(f"Multiple faces found in {image_path}, using the first one")
+            
+            # Store the encoding and metadata
+            self._enroll(face_encoding, name, metadata)
+            
+            self.logger.info(f"Added face for {name}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error adding face for {name}: {str(e)}")
+            return False
+    
+    def registration_settings(self):
+        """Cache key of everything that changes a registration encoding"""
+        return settings_key(use='add_known_face', model=self.model, num_jitters=self.num_jitters)
+    
+    def _registration_encoding(self, data):
+        """
+        Encode the first face of a registration photo, through the cache
+        
+        Args:
+            data: Bytes of the image file
+            
+        Returns:
+            tuple: (status, box, encoding), status being 'ok', 'multiple' or 'no_face'
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        settings = self.registration_settings()
+        if self.registration_cache:
+            cached = self.registration_cache.get(content_hash, settings)
+            if cached is not None:
+                return cached
+        
+        image = face_recognition.load_image_file(io.BytesIO(data))
+        face_locations = face_recognition.face_locations(image, model=self.model)
+        if not face_locations:
+            status, box, encoding = 'no_face', None, None
+        else:
+            box = face_locations[0]
+            encoding = face_recognition.face_encodings(image, [box], num_jitters=self.num_jitters,
+                                                       model=self.model)[0]
+            status = 'ok' if len(face_locations) == 1 else 'multiple'
+        
+        if self.registration_cache:
+            self.registration_cache.put(content_hash, settings, status, box, encoding)
+        return status, box, encoding
+    
+    def _enroll(self, encoding, name, metadata=None):
+        """Add an encoding to the gallery and durably journal it"""
+        with self.gallery_lock:
+            # Journal first, a record it rejects (ValueError) leaves the gallery untouched
+            if self.journal:
+                self.journal.append_add(name, encoding, metadata)
+            self.gallery.add(encoding, name)
+            if metadata:
+                self.known_face_metadata[name] = metadata
+        
+        if self.journal:
+            self.journal.maybe_compact()
+    
+    def _enroll_batch(self, encodings, names):
+        """Add many encodings with one gallery extend and one journal fsync"""
+        with self.gallery_lock:
+            if self.journal:
+                self.journal.append_adds([(name, encoding, None) for name, encoding in zip(names, encodings)])
+            self.gallery.extend(encodings, names)
+    
+    def bulk_enroll(self, directory, workers=None, batch_size=256, **kwargs):
+        """
+        Enrol a whole photo directory on a process pool, resumable after a crash
+        
+        Args:
+            directory: <name>/<photo> folders or <name>.<ext> photos
+            workers: Pool processes (default: CPU count)
+            batch_size: Images committed to the gallery together
+            **kwargs: max_side, checkpoint (see recog.bulk_enroll)
+            
+        Returns:
+            dict: Enrolled, skipped and failed image counts
+        """
+        from recog.bulk_enroll import bulk_enroll
+        
+        return bulk_enroll(self, directory, workers=workers, batch_size=batch_size, **kwargs)
+    
+    def remove_known_faces(self, names):
+        """
+        Remove one identity or a batch of identities from the gallery
+        
+        The rows are only tombstoned, which is O(1) per identity and is
+        respected by the matcher right away. They are dropped from memory by
+        a background compaction so live recognition is not stalled.
+        
+        Args:
+            names: A name or a list of names
+            
+        Returns:
+            int: Number of face encodings removed
+        """
+        if isinstance(names, str):
+            names = [names]
+        
+        try:
+            with self.gallery_lock:
+                if self.journal:
+                    self.journal.append_removes(names)
+                removed = self.gallery.remove_names(names)
+                for name in names:
+                    self.known_face_metadata.pop(name, None)
+            
+            self.logger.info(f"Removed {removed} face encodings for {len(names)} identities")
+            if self.tracker:
+                self.tracker.invalidate()
+            self._schedule_gallery_compaction()
+            return removed
+        except Exception as e:
+            self.logger.error(f"Error removing faces: {str(e)}")
+            return 0
+    
+    def _schedule_gallery_compaction(self):
+        """Start the background gallery compaction unless it is already running"""
+        with self.gallery_lock:
+            if self._gallery_compactor is None and self.gallery.n_dead:
+                self._gallery_compactor = threading.Thread(
+                    target=self._compact_gallery,
+                    daemon=True
+                )
+                self._gallery_compactor.start()
+    
+    def _compact_gallery(self):
+        """Drop tombstoned rows until none are left"""
+        try:
+            while True:
+                dropped = self.gallery.compact(self.gallery_lock)
+                if dropped:
+                    self.logger.info(f"Compacted gallery, dropped {dropped} removed encodings")
+                with self.gallery_lock:
+                    if not self.gallery.n_dead:
+                        self._gallery_compactor = None
+                        return
+        except Exception as e:
+            self.logger.error(f"Error compacting gallery: {str(e)}")
+            with self.gallery_lock:
+                self._gallery_compactor = None
+    
+    def save_face_database(self, path=None):
+        """
+        Persist the face database
+        
+        Enrolments are already durable in the gallery journal, so for the
+        loaded gallery this only compacts the journal once it is big enough.
+        Any other path gets a full snapshot.
+        """
+        path = path or self.gallery_path or 'face_gallery'
+        try:
+            if self.journal and path == self.gallery_path:
+                self.journal.maybe_compact()
+            else:
+                with self.gallery_lock:
+                    save_gallery(self.gallery, path, self.known_face_metadata)
+                self.logger.info(f"Face database saved to {path}")
+        except Exception as e:
+            self.logger.error(f"Error saving face database: {str(e)}")
+    
+    def load_face_database(self, path='face_gallery', legacy_pickle='face_database.pkl'):
+        """
+        Load the face database from a gallery directory
+        
+        The snapshot encodings are memory-mapped read-only, so loading does
+        not copy them and several processes can share the same pages. The
+        journal written since that snapshot is replayed on top. A legacy
+        pickle database is migrated once if no gallery directory exists yet.
+        """
+        try:
+            if self.journal:
+                self.journal.close()
+            
+            if not gallery_exists(path) and legacy_pickle and os.path.exists(legacy_pickle):
+                migrated = migrate_pickle(legacy_pickle, path)
+                self.logger.info(f"Migrated {migrated} faces from {legacy_pickle} to {path}")
+            
+            with self.gallery_lock:
+                journal_seq = 1
+                if gallery_exists(path):
+                    meta = load_gallery(self.gallery, path)
+                    self.known_face_metadata = meta.get('metadata', {})
+                    journal_seq = meta.get('journal_seq', 1)
+                
+                self.gallery_path = path
+                self.journal = GalleryJournal(
+                    path,
+                    self.gallery_lock,
+                    self._gallery_snapshot,
+                    compact_bytes=self.journal_compact_bytes,
+                    logger=self.logger
+                )
+                records = self.journal.replay(journal_seq)
+                self._apply_journal(records)
+            
+            self.logger.info(f"Loaded {len(self.known_face_names)} faces from database "
+                             f"({len(records)} journal records)")
+            self.journal.maybe_compact()
+            self._schedule_gallery_compaction()
+        except Exception as e:
+            self.logger.error(f"Error loading face database: {str(e)}")
+    
+    def _apply_journal(self, records):
+        """Replay journal records on top of the loaded snapshot"""
+        encodings, names = [], []
+        
+        for op, name, encoding, metadata in records:
+            if op == OP_ADD:
+                encodings.append(encoding)
+                names.append(name)
+                if metadata:
+                    self.known_face_metadata[name] = metadata
+            else:
+                # Removal: apply the pending enrolments first to keep the order
+                if names:
+                    self.gallery.extend(encodings, names)
+                    encodings, names = [], []
+                self.gallery.remove_names([name])
+                self.known_face_metadata.pop(name, None)
+        
+        if names:
+            self.gallery.extend(encodings, names)
+    
+    def _gallery_snapshot(self):
+        """Copies of the live gallery rows for a background snapshot (gallery_lock held)"""
+        encodings, sq_norms, names = self.gallery.live_arrays()
+        return encodings, sq_norms, names, dict(self.known_face_metadata)
+    
+    def process_frame(self, frame, camera_id="default", annotate=True):
+        """
+        Process a single frame for face recognition
+        
+        Args:
+            frame: OpenCV frame/image
+            camera_id: Identifier for the camera source
+            annotate: Draw the results onto the frame (headless callers skip it)
+            
+        Returns:
+            tuple: (processed_frame, recognition_results)
+        """
+        started = time.perf_counter()
+        
+        # Frames of one camera go through the stateful steps one at a time,
+        # other cameras run in parallel
+        with self.camera_lock(camera_id):
+            scale, upsample, stride = self._quality(camera_id)
+            
+            # Resize frame for faster processing
+            small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+            
+            if self.motion_gate and not self.motion_gate.check(camera_id, small_frame):
+                # Nothing moved, the faces of the last detection still hold
+                face_locations, matches = self._last_faces.get(camera_id, ([], []))
+            else:
+                # Find faces and their identities
+                rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+                face_locations, matches = self._locate_faces(rgb_small_frame, camera_id, upsample, stride,
+                                                             frame, scale)
+                self._last_faces[camera_id] = (face_locations, matches)
+                self._record_quality(camera_id, time.perf_counter() - started)
+        
+        recognition_results = self._build_results(face_locations, matches, camera_id, scale)
+        if annotate:
+            self._annotate_frame(frame, recognition_results)
+        self._publish_results(recognition_results)
+        
+        return frame, recognition_results
+    
+    def camera_lock(self, camera_id):
+        """Lock guarding a camera's detection state (last faces, detection count, tracks)"""
+        with self._camera_locks_lock:
+            lock = self._camera_locks.get(camera_id)
+            if lock is None:
+                lock = self._camera_locks[camera_id] = threading.Lock()
+            return lock
+    
+    def _build_results(self, face_locations, matches, camera_id, scale=0.25):
+        """Recognition results in full frame coordinates (scale: the resize factor used)"""
+        recognition_results = []
+        timestamp = datetime.now()
+        
+        for (top, right, bottom, left), (name, confidence) in zip(face_locations, matches):
+            # Scale back up face locations
+            top = int(round(top / scale))
+            right = int(round(right / scale))
+            bottom = int(round(bottom / scale))
+            left = int(round(left / scale))
+            
+            recognition_results.append({
+                'name': name,
+                'confidence': confidence,
+                'location': (top, right, bottom, left),
+                'timestamp': timestamp,
+                'camera_id': camera_id
+            })
+        return recognition_results
+    
+    def _annotate_frame(self, frame, recognition_results):
+        """Draw a box and label for every result onto the frame (in place)"""
+        for result in recognition_results:
+            top, right, bottom, left = result['location']
+            
+            # Draw rectangle and label
+            cv2.rectangle(frame, (left, top), (right, bottom), self.box_color, self.box_thickness)
+            cv2.rectangle(frame, (left, bottom - 35), (right, bottom), self.box_color, cv2.FILLED)
+            
+            label = f"{result['name']} ({result['confidence']:.2f})"
+            cv2.putText(frame, label, (left + 6, bottom - 6), 
+                       cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1)
+        return frame
+    
+    def _publish_results(self, recognition_results):
+        """Log results to the database and send recognised ones to the server"""
+        for result in recognition_results:
+            # Log to database
+            self.log_recognition(result)
+            
+            # Send to server if configured
+            if self.server_url and result['name'] != "Unknown":
+                self.send_to_server(result)
+        
+        # Sessions whose people left (on any camera) are written out
+        if self.sessionizer:
+            closed = self.sessionizer.expire()
+            if closed:
+                self.log_writer.put_many(closed, INSERT_SESSION)
+    
+    def _quality(self, camera_id):
+        """(resize factor, upsample count, detection stride) for the camera's next frame"""
+        if not self.governor:
+            return 0.25, 1, 1
+        return self.governor.settings(camera_id)
+    
+    def _record_quality(self, camera_id, seconds):
+        """Feed a frame's processing time to the governor, reset geometry on a change"""
+        if self.governor and self.governor.record(camera_id, seconds):
+            # Boxes of the old resize factor no longer fit
+            self._last_faces.pop(camera_id, None)
+            if self.tracker:
+                self.tracker.reset(camera_id)
+    
+    def _locate_faces(self, rgb_small_frame, camera_id, upsample=1, stride=1, frame=None, scale=0.25):
+        """
+        Detect the faces of a frame and identify them
+        
+        With a tracker only new tracks and tracks due for a refresh go
+        through the encoder; every face is matched in one gallery pass.
+        Detection runs on every `stride`-th frame only.
+        
+        Returns:
+            tuple: (face_locations, [(name, confidence)]) in small frame coordinates
+        """
+        if not self.tracker:
+            count = self._detect_counts[camera_id]
+            self._detect_counts[camera_id] = count + 1
+            if count % stride and camera_id in self._last_faces:
+                return self._last_faces[camera_id]
+            face_locations = self._run_stage(detect_faces, rgb_small_frame, self.detector, upsample)
+            return self._identify(rgb_small_frame, face_locations, camera_id, frame, scale)
+        
+        if self.tracker.should_detect(camera_id, stride):
+            face_locations = self._run_stage(detect_faces, rgb_small_frame, self.detector, upsample)
+            tracks = self.tracker.update(camera_id, face_locations, rgb_small_frame)
+        else:
+            tracks = self.tracker.predict(camera_id, rgb_small_frame)
+        
+        stale = [track for track in tracks if self.tracker.needs_encoding(track)]
+        refined = {}
+        if stale:
+            located, matches = self._identify(rgb_small_frame, [track.box for track in stale], camera_id,
+                                              frame, scale)
+            for track, box, (name, confidence) in zip(stale, located, matches):
+                self.tracker.assign(track, name, confidence)
+                refined[track] = box
+        
+        return ([refined.get(track, track.box) for track in tracks],
+                [(track.name, track.confidence) for track in tracks])
+    
+    def _encode_faces(self, rgb_small_frame, face_locations, frame=None, scale=0.25):
+        """
+        Encode the faces found on the downscaled frame
+        
+        In coarse-to-fine mode every face is re-detected (by self.detector)
+        and encoded on a crop of the full-resolution frame; otherwise the
+        downscaled frame is encoded directly, through the batch encoder if
+        there is one.
+        
+        Returns:
+            tuple: (face_locations, encodings), the locations refined in
+                   coarse-to-fine mode
+        """
+        if not face_locations:
+            return face_locations, []
+        if self.coarse_to_fine and frame is not None:
+            regions, origins = crop_regions(frame, face_locations, scale)
+            refined = self._run_stage(refine_and_encode, regions, self.detector)
+            return refined_locations(refined, origins, scale), [encoding for _, encoding, _ in refined]
+        if self.batch_encoder is not None:
+            return face_locations, self.batch_encoder.encode(rgb_small_frame, face_locations)
+        return face_locations, self._run_stage(encode_faces, rgb_small_frame, face_locations)
+    
+    def _identify(self, rgb_small_frame, face_locations, camera_id, frame=None, scale=0.25):
+        """
+        Encode and match faces, near-identical recent crops reuse a cached encoding
+        
+        Returns:
+            tuple: (face_locations, [(name, confidence)]), the locations of
+                   freshly encoded faces refined in coarse-to-fine mode
+        """
+        keys, cached = self._cache_lookup(rgb_small_frame, face_locations, camera_id)
+        misses = [i for i, encoding in enumerate(cached) if encoding is None]
+        face_locations = list(face_locations)
+        face_encodings = list(cached)
+        located, encoded = self._encode_faces(rgb_small_frame, [face_locations[i] for i in misses], frame, scale)
+        for i, box, encoding in zip(misses, located, encoded):
+            face_locations[i] = box
+            face_encodings[i] = encoding
+        self._cache_store(keys, face_encodings, cached)
+        return face_locations, self.match_encodings(face_encodings)
+    
+    def _cache_lookup(self, rgb_small_frame, face_locations, camera_id):
+        """
+        Look a frame's faces up in the encoding cache
+        
+        Returns:
+            tuple: (keys, cached) where cached holds the encoding per hit and
+                   None per miss; keys is None without a cache
+        """
+        if not self.encoding_cache:
+            return None, [None] * len(face_locations)
+        keys = [self.encoding_cache.key(rgb_small_frame, box, camera_id) for box in face_locations]
+        return keys, [self.encoding_cache.get(key) for key in keys]
+    
+    def _cache_store(self, keys, face_encodings, cached):
+        """Cache the encodings that were just computed (cache misses)"""
+        if keys is None:
+            return
+        for key, encoding, hit in zip(keys, face_encodings, cached):
+            if hit is None:
+                self.encoding_cache.put(key, encoding)
+    
+    def _run_stage(self, fn, *args):
+        """Run a detection/encoding step, in the shared process pool if there is one"""
+        if self.executor is not None:
+            return self.executor.submit(fn, *args).result()
+        return fn(*args)
+    
+    def match_encodings(self, face_encodings):
+        """
+        Match a frame's face encodings against the gallery in one batch
+        
+        Args:
+            face_encodings: List or (Q, 128) array of face encodings
+            
+        Returns:
+            list: (name, confidence) per encoding, ("Unknown", 0.0) when no
+                  known face is within tolerance
+        """
+        if len(face_encodings) == 0:
+            return []
+        with self.gallery_lock:
+            best_index, best_distance, _, _ = self.index.search(face_encodings)
+            return label_matches(self.gallery.names, best_index, best_distance, self.tolerance)
+    
+    def frame_interval(self, camera_id, active_interval=0.0):
+        """
+        Seconds a capture loop should wait before grabbing the next frame
+        
+        Args:
+            camera_id: Camera the loop reads from
+            active_interval: Wait used while there is motion
+        """
+        if not self.motion_gate:
+            return active_interval
+        return self.motion_gate.frame_interval(camera_id, active_interval)
+    
+    def get_motion_stats(self):
+        """Motion gate hit rate per camera (share of frames that skipped detection)"""
+        if not self.motion_gate:
+            return {}
+        return self.motion_gate.stats()
+    
+    def get_cache_stats(self):
+        """Encoding cache hits and misses, empty without a cache"""
+        if not self.encoding_cache:
+            return {}
+        return self.encoding_cache.stats()
+    
+    def get_batch_stats(self):
+        """Batch encoder sizes and waits, empty without a batch encoder"""
+        if self.batch_encoder is None:
+            return {}
+        return self.batch_encoder.stats()
+    
+    def log_recognition(self, result):
+        """Add a recognition result to its sighting session, never waits for the disk"""
+        if self.sessionizer:
+            closed = self.sessionizer.observe(result['name'], result['camera_id'],
+                                              result['confidence'], result['timestamp'])
+            if closed:
+                self.log_writer.put_many(closed, INSERT_SESSION)
+        
+        if self.raw_logging:
+            self.log_writer.put((
+                result['name'],
+                result['confidence'],
+                epoch(result['timestamp']),
+                result['camera_id'],
+                None  # image_path can be added if needed
+            ))
+    
+    def get_log_stats(self):
+        """Log writer queue and partition storage counters"""
+        stats = self.log_writer.stats()
+        stats.update(self.log_partitions.stats())
+        return stats
+    
+    def get_session_stats(self):
+        """Sightings, open and written sessions, empty without sessions"""
+        if not self.sessionizer:
+            return {}
+        return self.sessionizer.stats()
+    
+    def send_to_server(self, result):
+        """Send recognition result to server"""
+        try:
+            data = {
+                'name': result['name'],
+                'confidence': result['confidence'],
+                'timestamp': result['timestamp'].isoformat(),
+                'camera_id': result['camera_id']
+            }
+            
+            # Send in a separate thread to avoid blocking
+            threading.Thread(
+                target=self._post_to_server,
+                args=(data,),
+                daemon=True
+            ).start()
+            
+        except Exception as e:
+            self.logger.error(f"Error preparing server data: {str(e)}")
+    
+    def _post_to_server(self, data):
+        """Internal method to post data to server"""
+        try:
+            response = requests.post(
+                self.server_url,
+                json=data,
+                timeout=5
+            )
+            if response.status_code == 200:
+                self.logger.info(f"Successfully sent data for {data['name']}")
+            else:
+                self.logger.warning(f"Server responded with status {response.status_code}")
+        except Exception as e:
+            self.logger.error(f"Error sending to server: {str(e)}")
+    
+    def run_camera_recognition(self, camera_index=0, display=True, pipeline=False, latency_budget=0.5):
+        """
+        Run real-time face recognition from camera
+        
+        Always works on the freshest camera frame; frames that are older
+        than latency_budget seconds by the time detection could start are
+        dropped.
+        
+        Args:
+            camera_index: Camera index (0 for default camera)
+            display: Whether to display the video feed
+            pipeline: Run capture, detection, encoding, matching and drawing
+                      as overlapping stages (RecognitionPipeline)
+            latency_budget: Capture-to-detection deadline in seconds (None: no drops)
+        """
+        cap = cv2.VideoCapture(camera_index)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 500)
+        
+        self.logger.info("Starting camera recognition...")
+        camera_id = f"camera_{camera_index}"
+        
+        stages = None
+        if pipeline:
+            stages = RecognitionPipeline(self, cap, camera_id, latency_budget=latency_budget)
+            stages.start()
+            latency = stages.latency
+        else:
+            reader = LatestFrameReader(cap).start()
+            latency = LatencyMonitor(latency_budget)
+        
+        while True:
+            if stages:
+                # The capture stage paces itself, just show what comes out
+                processed_frame, results = stages.read(timeout=0.5)
+                if processed_frame is None:
+                    if stages.finished:
+                        break
+                    continue
+                delay = 0.0
+            else:
+                ret, frame, captured_at = reader.read()
+                if not ret:
+                    if reader.ended:
+                        break
+                    continue
+                if latency.expired(captured_at):
+                    continue
+                
+                # Process frame
+                processed_frame, results = self.process_frame(frame, camera_id)
+                latency.record(captured_at)
+                
+                # Slow down while the camera is idle
+                delay = self.frame_interval(camera_id)
+            
+            # Calculate FPS
+            self.frame_count += 1
+            current_time = time.time()
+            if current_time - self.last_fps_time >= 1.0:
+                self.fps_counter = self.frame_count
+                self.frame_count = 0
+                self.last_fps_time = current_time
+            
+            # Display FPS
+            cv2.putText(processed_frame, f"FPS: {self.fps_counter}", 
+                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            
+            if display:
+                cv2.imshow('Advanced Face Recognition', processed_frame)
+                
+                # Break on 'q' key press
+                if cv2.waitKey(max(1, int(delay * 1000))) & 0xFF == ord('q'):
+                    break
+            elif delay:
+                time.sleep(delay)
+        
+        if stages:
+            report = stages.stats()
+            stages.stop()
+            for name, stage in report['stages'].items():
+                self.logger.info(f"Stage {name}: {stage['processed']} frames, {stage['fps']:.1f}/s, "
+                                 f"{stage['busy_ms']:.1f} ms each, queue {stage['queue']}, "
+                                 f"dropped {stage['dropped']}")
+        else:
+            reader.release()
+        
+        report = latency.stats()
+        self.logger.info(f"Capture-to-result latency p50 {report['p50_ms']:.0f} ms, "
+                         f"p95 {report['p95_ms']:.0f} ms, p99 {report['p99_ms']:.0f} ms, "
+                         f"max {report['max_ms']:.0f} ms; {report['expired']} frames dropped "
+                         f"past the deadline, {report['over_deadline']} finished late")
+        
+        cap.release()
+        cv2.destroyAllWindows()
+        gate = self.get_motion_stats().get(camera_id)
+        if gate:
+            self.logger.info(f"Motion gate skipped detection on {gate['skipped']}/{gate['frames']} "
+                             f"frames ({gate['hit_rate']:.0%})")
+        cache = self.get_cache_stats()
+        if cache:
+            self.logger.info(f"Encoding cache: {cache['hits']} hits, {cache['misses']} misses "
+                             f"({cache['hit_rate']:.0%})")
+        self.logger.info("Camera recognition stopped")
+    
+    def run_offline_recognition(self, sources, output=None, stride=5, workers=None, **kwargs):
+        """
+        Recognise recorded video files and image sequences on a process pool
+        
+        Args:
+            sources: Video files, image directories or glob patterns
+            output: CSV file for the results (default: the SQLite log)
+            stride: Process every n-th frame
+            workers: Pool processes (default: CPU count)
+            **kwargs: chunk_seconds, scale, upsample, start_time (see recog.offline)
+            
+        Returns:
+            dict: Frames, faces and speed summary
+        """
+        from recog.offline import run_offline
+        
+        return run_offline(self, sources, output=output, stride=stride, workers=workers, **kwargs)
+    
+    def query_recognitions(self, name=None, camera_id=None, since=None, until=None,
+                           min_confidence=None, kind='sessions', cursor=None, newest_first=True):
+        """
+        Stream recognition history, e.g. when a person was last seen on a camera
+        
+        Rows are read from read-only connections to the log partitions the
+        time range needs and never block the log writer. Sessions still
+        open are not included.
+        
+        Args:
+            name: Identity or list of identities (default: all)
+            camera_id: Camera id or list of camera ids (default: all)
+            since: Window start, datetime or epoch seconds
+            until: Window end (exclusive)
+            min_confidence: Lowest confidence (max_confidence for sessions)
+            kind: 'sessions' or 'detections' (raw per-frame rows)
+            cursor: Continue after the row this cursor came from
+            newest_first: Order by time descending
+            
+        Returns:
+            generator: Row dicts with a 'cursor' for keyset pagination
+        """
+        # Rows still queued would be missing from the result
+        self.log_writer.flush(timeout=5)
+        return query_history(self.log_partitions, kind=kind, names=name, cameras=camera_id,
+                             since=since, until=until, min_confidence=min_confidence,
+                             cursor=cursor, newest_first=newest_first)
+    
+    def get_recognition_page(self, page_size=100, cursor=None, **filters):
+        """
+        One page of query_recognitions
+        
+        Returns:
+            tuple: (rows, next_cursor), next_cursor None on the last page
+        """
+        return fetch_page(self.query_recognitions(cursor=cursor, **filters), page_size)
+    
+    def get_recognition_stats(self, days=7, since=None, until=None):
+        """
+        Get recognition statistics from the hourly and daily rollups of
+        the log partitions the window overlaps
+        
+        count is the number of frames a name was seen in, sessions the
+        number of separate visits. Periods without sessions (logs written
+        before sessions existed, or with sessions off) count their raw
+        detections, each as a visit of one frame. Sessions still open are
+        not included.
+        
+        Args:
+            days: Window length back from now
+            since: Window start (datetime or epoch seconds), overrides days
+            until: Window end (default: now)
+        """
+        try:
+            self.log_writer.flush(timeout=5)
+            if since is None:
+                since = time.time() - days * 86400
+            rows = self.log_partitions.window_stats(since, until)
+            
+            results = []
+            for name, sessions, count, total, _ in rows:
+                if count:
+                    results.append({'name': name, 'count': count,
+                                    'avg_confidence': total / count, 'sessions': sessions})
+            return sorted(results, key=lambda row: row['count'], reverse=True)
+        except Exception as e:
+            self.logger.error(f"Error getting stats: {str(e)}")
+            return []
+    
+    def close(self):
+        """Write open sessions and pending log rows, release the database, journal and worker threads"""
+        if self.sessionizer:
+            self.log_writer.put_many(self.sessionizer.flush(), INSERT_SESSION)
+        self.log_writer.close()
+        if self.batch_encoder is not None:
+            self.batch_encoder.close()
+        if self.journal:
+            self.journal.close()
+        if self.registration_cache:
+            self.registration_cache.close()
+        self.log_partitions.close()
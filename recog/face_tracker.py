@@ -0,0 +1,295 @@
+import itertools
+import threading
+
+import cv2
+import numpy as np
+
+"""
+    Detect-once, track-between stage for process_frame.
+
+    Detections are linked to the tracks of the previous frame by IoU, with a
+    centroid distance fallback for fast moving faces. A track keeps the
+    identity it was matched to, so the 128-d encoder and the gallery search
+    only run for new tracks, on a periodic refresh, or after the gallery
+    changed. Optionally, OpenCV single object trackers follow the faces on
+    the frames between two detections (detect_interval > 1).
+
+    Boxes are (top, right, bottom, left) like face_recognition uses them.
+
+    Methods (FaceTracker):
+        should_detect(self, camera_id, interval=None)
+        update(self, camera_id, face_locations, frame=None)
+        predict(self, camera_id, frame)
+        needs_encoding(self, track)
+        assign(self, track, name, confidence)
+        invalidate
+        reset(self, camera_id=None)
+"""
+
+
+class Track:
+    __slots__ = ('track_id', 'box', 'name', 'confidence', 'hits', 'missed',
+                 'seen_at', 'encoded_at', 'cv_tracker')
+
+    def __init__(self, track_id, box, frame_index):
+        self.track_id = track_id
+        self.box = box
+        self.name = None
+        self.confidence = 0.0
+        self.hits = 1
+        self.missed = 0
+        self.seen_at = frame_index
+        # Frame index of the last encode, None until the first one
+        self.encoded_at = None
+        self.cv_tracker = None
+
+
+class _CameraState:
+    def __init__(self):
+        self.tracks = []
+        self.frame_index = -1
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+def _centre(box):
+    return (box[1] + box[3]) / 2.0, (box[0] + box[2]) / 2.0
+
+
+def _create_cv_tracker():
+    """Fastest OpenCV single object tracker this build ships, or None"""
+    factories = []
+    legacy = getattr(cv2, 'legacy', None)
+    if legacy is not None:
+        factories += [getattr(legacy, 'TrackerMOSSE_create', None),
+                      getattr(legacy, 'TrackerKCF_create', None)]
+    factories += [getattr(cv2, 'TrackerKCF_create', None),
+                  getattr(cv2, 'TrackerMIL_create', None)]
+    for factory in factories:
+        if factory is not None:
+            try:
+                return factory()
+            except cv2.error:
+                continue
+    return None
+
+
+class FaceTracker:
+    def __init__(self,
+                 iou_threshold=0.3,
+                 centroid_threshold=0.5,
+                 max_missed=3,
+                 refresh_interval=30,
+                 unknown_refresh_interval=5,
+                 detect_interval=1,
+                 use_cv_trackers=False):
+        """
+        Associate faces across frames so known tracks skip re-encoding
+
+        Args:
+            iou_threshold: Minimum IoU to link a detection to a track
+            centroid_threshold: Fallback link when the centres are closer than
+                                this fraction of the track's box size
+            max_missed: Detection rounds a track survives without a detection
+            refresh_interval: Frames after which a recognised track is encoded
+                              and matched again
+            unknown_refresh_interval: Same for tracks that matched nobody, a
+                                      better pose may still be recognised
+            detect_interval: Run the detector every n-th frame, the frames in
+                             between only follow the existing tracks
+            use_cv_trackers: Follow faces with OpenCV trackers between
+                             detections (otherwise boxes are held in place)
+        """
+        self.iou_threshold = iou_threshold
+        self.centroid_threshold = centroid_threshold
+        self.max_missed = max_missed
+        self.refresh_interval = refresh_interval
+        self.unknown_refresh_interval = unknown_refresh_interval
+        self.detect_interval = max(1, detect_interval)
+        self.use_cv_trackers = use_cv_trackers
+
+        self._cameras = {}
+        self._track_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _camera(self, camera_id):
+        state = self._cameras.get(camera_id)
+        if state is None:
+            state = self._cameras[camera_id] = _CameraState()
+        return state
+
+    def should_detect(self, camera_id, interval=None):
+        """
+        Advance the camera's frame counter and tell whether to run the detector
+
+        Args:
+            camera_id: Camera of the frame
+            interval: Detection stride overriding detect_interval for this call
+        """
+        interval = max(1, interval or self.detect_interval)
+        with self._lock:
+            state = self._camera(camera_id)
+            state.frame_index += 1
+            return (state.frame_index % interval == 0
+                    or not state.tracks)
+
+    def _associate(self, tracks, face_locations):
+        """Greedy IoU matching, then centroid distance for the leftovers"""
+        pairs = []
+        if not tracks or not face_locations:
+            return pairs, set(range(len(tracks))), set(range(len(face_locations)))
+
+        scores = np.array([[iou(track.box, box) for box in face_locations] for track in tracks])
+        free_tracks = set(range(len(tracks)))
+        free_boxes = set(range(len(face_locations)))
+        for flat in np.argsort(-scores, axis=None):
+            t, d = divmod(int(flat), len(face_locations))
+            if scores[t, d] < self.iou_threshold:
+                break
+            if t in free_tracks and d in free_boxes:
+                pairs.append((t, d))
+                free_tracks.discard(t)
+                free_boxes.discard(d)
+
+        for t in sorted(free_tracks):
+            box = tracks[t].box
+            size = max(box[1] - box[3], box[2] - box[0], 1)
+            cx, cy = _centre(box)
+            best, best_dist = None, self.centroid_threshold * size
+            for d in free_boxes:
+                dx, dy = _centre(face_locations[d])
+                dist = ((cx - dx) ** 2 + (cy - dy) ** 2) ** 0.5
+                if dist < best_dist:
+                    best, best_dist = d, dist
+            if best is not None:
+                pairs.append((t, best))
+                free_tracks.discard(t)
+                free_boxes.discard(best)
+        return pairs, free_tracks, free_boxes
+
+    def update(self, camera_id, face_locations, frame=None):
+        """
+        Link a frame's detections to the camera's tracks
+
+        Args:
+            camera_id: Camera the detections belong to
+            face_locations: Detected (top, right, bottom, left) boxes
+            frame: Image the boxes refer to, needed with use_cv_trackers
+
+        Returns:
+            list: Live tracks of the camera, one per detection
+        """
+        face_locations = [tuple(int(v) for v in box) for box in face_locations]
+        with self._lock:
+            state = self._camera(camera_id)
+            pairs, free_tracks, free_boxes = self._associate(state.tracks, face_locations)
+
+            matched = []
+            for t, d in pairs:
+                track = state.tracks[t]
+                track.box = face_locations[d]
+                track.hits += 1
+                track.missed = 0
+                track.seen_at = state.frame_index
+                matched.append(track)
+
+            survivors = []
+            for t in free_tracks:
+                track = state.tracks[t]
+                track.missed += 1
+                if track.missed <= self.max_missed:
+                    survivors.append(track)
+
+            for d in sorted(free_boxes):
+                matched.append(Track(next(self._track_ids), face_locations[d], state.frame_index))
+
+            if self.use_cv_trackers and frame is not None:
+                for track in matched:
+                    track.cv_tracker = self._start_cv_tracker(frame, track.box)
+
+            # Unmatched tracks are kept (not shown) so a face that the detector
+            # misses for a frame or two keeps its identity
+            state.tracks = matched + survivors
+            return list(matched)
+
+    def predict(self, camera_id, frame):
+        """
+        Move the camera's tracks on a frame the detector skipped
+
+        Returns:
+            list: Tracks that were seen at the last detection
+        """
+        with self._lock:
+            state = self._camera(camera_id)
+            visible = [track for track in state.tracks if track.missed == 0]
+            if not self.use_cv_trackers:
+                for track in visible:
+                    track.seen_at = state.frame_index
+                return visible
+
+            followed = []
+            for track in visible:
+                track.seen_at = state.frame_index
+                if track.cv_tracker is None:
+                    followed.append(track)
+                    continue
+                ok, (x, y, w, h) = track.cv_tracker.update(frame)
+                if ok:
+                    track.box = (int(y), int(x + w), int(y + h), int(x))
+                    followed.append(track)
+                else:
+                    # Lost, let the next detection decide
+                    track.cv_tracker = None
+                    track.missed = 1
+            return followed
+
+    def _start_cv_tracker(self, frame, box):
+        tracker = _create_cv_tracker()
+        if tracker is None:
+            self.use_cv_trackers = False
+            return None
+        top, right, bottom, left = box
+        tracker.init(frame, (left, top, right - left, bottom - top))
+        return tracker
+
+    def needs_encoding(self, track):
+        """Whether the track has to go through the encoder and matcher this frame"""
+        if track.encoded_at is None:
+            return True
+        if track.name in (None, "Unknown"):
+            interval = self.unknown_refresh_interval
+        else:
+            interval = self.refresh_interval
+        return track.seen_at - track.encoded_at >= interval
+
+    def assign(self, track, name, confidence):
+        """Store the identity a track was matched to"""
+        with self._lock:
+            track.name = name
+            track.confidence = confidence
+            track.encoded_at = track.seen_at
+
+    def invalidate(self):
+        """Force every track to be re-matched, e.g. after the gallery changed"""
+        with self._lock:
+            for state in self._cameras.values():
+                for track in state.tracks:
+                    track.encoded_at = None
+
+    def reset(self, camera_id=None):
+        """Forget the tracks of one camera, or of all cameras"""
+        with self._lock:
+            if camera_id is None:
+                self._cameras.clear()
+            else:
+                self._cameras.pop(camera_id, None)
@@ -0,0 +1,161 @@
+import collections
+import threading
+import time
+
+import cv2
+import numpy as np
+
+"""
+    Keeping recognition on live video fresh.
+
+    LatestFrameReader drains a cv2.VideoCapture on its own thread and keeps
+    only the newest frame with its capture time, so the OpenCV buffer never
+    backs up behind a slow detector. LatencyMonitor enforces a per-source
+    latency budget (frames older than the deadline are dropped before
+    detection) and records the capture-to-result latency of every frame.
+
+    Methods (LatestFrameReader):
+        start
+        read(self, timeout=1.0) --- (ret, frame, captured_at)
+        isOpened
+        release
+
+    Methods (LatencyMonitor):
+        expired(self, captured_at, now=None)
+        record(self, captured_at, now=None)
+        stats
+"""
+
+
+class LatestFrameReader:
+    def __init__(self, cap):
+        """
+        Continuously read a capture, exposing only its freshest frame
+
+        Args:
+            cap: Opened cv2.VideoCapture (or anything with read/isOpened/release)
+        """
+        self.cap = cap
+        self.captured = 0
+        self.overwritten = 0
+        self.ended = False
+        self._frame = None
+        self._captured_at = None
+        self._seq = 0
+        self._read_seq = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Ask the backend not to queue frames where that is supported
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        except Exception:
+            pass
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._drain, name="latest-frame-reader", daemon=True)
+            self._thread.start()
+        return self
+
+    def _drain(self):
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            now = time.time()
+            with self._cond:
+                if not ret:
+                    self.ended = True
+                    self._cond.notify_all()
+                    return
+                if self._seq > self._read_seq:
+                    self.overwritten += 1
+                self._frame, self._captured_at = frame, now
+                self._seq += 1
+                self.captured += 1
+                self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Wait for a frame newer than the last one returned
+
+        Returns:
+            tuple: (ret, frame, captured_at); ret is False on timeout or end of stream
+        """
+        self.start()
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._read_seq or self.ended, timeout):
+                return False, None, None
+            if self._seq == self._read_seq:
+                return False, None, None
+            self._read_seq = self._seq
+            return True, self._frame, self._captured_at
+
+    def isOpened(self):
+        return self.cap.isOpened() and not self.ended
+
+    def release(self):
+        """Stop draining; the wrapped capture is left to its owner"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+
+class LatencyMonitor:
+    def __init__(self, deadline=0.5, window=1000):
+        """
+        Latency budget and capture-to-result latency record of one source
+
+        Args:
+            deadline: Seconds after capture a frame may still start
+                      detection, None disables dropping
+            window: Number of recent frame latencies kept for percentiles
+        """
+        self.deadline = deadline
+        self.expired_frames = 0
+        self.completed = 0
+        self.over_deadline = 0
+        self.max_latency = 0.0
+        self._latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def expired(self, captured_at, now=None):
+        """True (and counted as a drop) when a frame is too old to start detection"""
+        if self.deadline is None or captured_at is None:
+            return False
+        if (now or time.time()) - captured_at <= self.deadline:
+            return False
+        with self._lock:
+            self.expired_frames += 1
+        return True
+
+    def record(self, captured_at, now=None):
+        """Record the capture-to-result latency of a finished frame and return it"""
+        latency = (now or time.time()) - captured_at
+        with self._lock:
+            self._latencies.append(latency)
+            self.completed += 1
+            self.max_latency = max(self.max_latency, latency)
+            if self.deadline is not None and latency > self.deadline:
+                self.over_deadline += 1
+        return latency
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'deadline_ms', 'completed', 'expired', 'over_deadline',
+                   'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            report = {
+                'deadline_ms': None if self.deadline is None else self.deadline * 1000,
+                'completed': self.completed,
+                'expired': self.expired_frames,
+                'over_deadline': self.over_deadline,
+                'max_ms': self.max_latency * 1000,
+            }
+        for p in (50, 95, 99):
+            report[f'p{p}_ms'] = float(np.percentile(latencies, p)) if len(latencies) else 0.0
+        return report
@@ -0,0 +1,342 @@
+import numpy as np
+
+"""
+    Methods:
+        encodings (property)
+        add(self, encoding, name)
+        extend(self, encodings, names)
+        adopt(self, matrix, sq_norms, names)
+        remove_names(self, names) --- O(1) per identity, rows become tombstones
+        live_names
+        live_arrays
+        compact(self, lock)
+        clear
+        sq_distances(self, queries, rows=None)
+        match(self, face_encodings)
+        nearest_two(sq_distances) --- module level helper
+        label_matches(names, best_index, best_distance, tolerance) --- module level helper
+"""
+
+class FaceGallery:
+    def __init__(self, dim=128, capacity=64):
+        """
+        Contiguous store of known face encodings
+
+        All encodings live in one float32 (capacity x dim) matrix together with
+        their squared norms, so every face in a frame can be matched against
+        the whole gallery with a single matrix product.
+
+        Removed rows are not moved, they are flagged in a tombstone mask that
+        the matcher honours immediately; compact() drops them later.
+
+        Args:
+            dim: Length of a face encoding
+            capacity: Initial number of preallocated rows
+        """
+        self.dim = dim
+        self._matrix = np.zeros((max(capacity, 1), dim), dtype=np.float32)
+        self._sq_norms = np.zeros(max(capacity, 1), dtype=np.float32)
+        self._alive = np.ones(max(capacity, 1), dtype=bool)
+        self._rows_by_name = None
+        self.names = []
+        self.size = 0
+        self.n_dead = 0
+        # Bumped whenever rows are dropped or reordered, so indexes built
+        # on top of the gallery know they have to rebuild
+        self.generation = 0
+        # (from_generation, to_generation, old_to_new) of the last compaction,
+        # lets an index remap its row ids instead of rebuilding
+        self.last_remap = None
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def encodings(self):
+        """View of the stored encodings, shape (N, dim)"""
+        return self._matrix[:self.size]
+
+    @property
+    def sq_norms(self):
+        """Precomputed squared L2 norm of every stored encoding"""
+        return self._sq_norms[:self.size]
+
+    @property
+    def alive(self):
+        """Boolean mask of the rows that have not been removed"""
+        return self._alive[:self.size]
+
+    def _reserve(self, extra):
+        """Grow the backing matrix (doubling) so `extra` more rows fit"""
+        needed = self.size + extra
+        capacity = self._matrix.shape[0]
+        # Read-only (memory-mapped) storage is copied on the first write
+        if needed <= capacity and self._matrix.flags.writeable:
+            return
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self.size] = self._matrix[:self.size]
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        sq_norms[:self.size] = self._sq_norms[:self.size]
+        alive = np.ones(capacity, dtype=bool)
+        alive[:self.size] = self._alive[:self.size]
+        self._matrix = matrix
+        self._sq_norms = sq_norms
+        self._alive = alive
+
+    def add(self, encoding, name):
+        """Append one encoding and return its row index"""
+        return self.extend([encoding], [name])[0]
+
+    def extend(self, encodings, names):
+        """
+        Append a batch of encodings
+
+        Args:
+            encodings: Sequence or (M, dim) array of encodings
+            names: Names matching the encodings row by row
+
+        Returns:
+            range: Row indices of the appended encodings
+        """
+        block = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        names = list(names)
+        if len(names) != block.shape[0]:
+            raise ValueError("encodings and names must have the same length")
+
+        self._reserve(block.shape[0])
+        start = self.size
+        end = start + block.shape[0]
+        self._matrix[start:end] = block
+        self._sq_norms[start:end] = np.einsum('ij,ij->i', block, block)
+        self._alive[start:end] = True
+        if not isinstance(self.names, list):
+            self.names = list(self.names)
+        self.names.extend(names)
+        if self._rows_by_name is not None:
+            for row, name in enumerate(names, start):
+                self._rows_by_name.setdefault(name, []).append(row)
+        self.size = end
+        return range(start, end)
+
+    def adopt(self, matrix, sq_norms, names):
+        """
+        Use existing arrays as the gallery storage without copying them
+
+        Args:
+            matrix: (N, dim) float32 array, may be a read-only np.memmap
+            sq_norms: (N,) float32 squared norms of the rows
+            names: Sequence of N names
+        """
+        self._matrix = matrix
+        self._sq_norms = sq_norms
+        self._alive = np.ones(max(matrix.shape[0], 1), dtype=bool)
+        self._rows_by_name = None
+        self.names = names
+        self.size = matrix.shape[0]
+        self.n_dead = 0
+        self.generation += 1
+
+    def _name_index(self):
+        """name -> live rows, built on first use so loading stays O(1)"""
+        if self._rows_by_name is None:
+            rows_by_name = {}
+            alive = self.alive
+            for row, name in enumerate(self.names):
+                if alive[row]:
+                    rows_by_name.setdefault(name, []).append(row)
+            self._rows_by_name = rows_by_name
+        return self._rows_by_name
+
+    def remove_names(self, names):
+        """
+        Tombstone every row of the given identities
+
+        The rows stay in place until compact() runs, but the matcher skips
+        them from the next call on.
+
+        Returns:
+            int: Number of rows removed
+        """
+        rows_by_name = self._name_index()
+        removed = 0
+        for name in names:
+            rows = rows_by_name.pop(name, None)
+            if rows:
+                self._alive[rows] = False
+                removed += len(rows)
+        self.n_dead += removed
+        return removed
+
+    def live_names(self):
+        """Names of the rows that have not been removed"""
+        if not self.n_dead:
+            return self.names
+        alive = self.alive
+        return [name for row, name in enumerate(self.names) if alive[row]]
+
+    def live_arrays(self):
+        """
+        Copies of the live rows
+
+        Returns:
+            tuple: (encodings, sq_norms, names)
+        """
+        keep = np.flatnonzero(self.alive)
+        return self.encodings[keep], self.sq_norms[keep], [self.names[row] for row in keep]
+
+    def compact(self, lock):
+        """
+        Drop tombstoned rows
+
+        The copy of the live rows is made without holding `lock`; only the
+        final swap (which also folds in rows added or removed meanwhile)
+        happens under it, so matching is never stalled for long.
+
+        Args:
+            lock: Lock that guards every other use of the gallery
+
+        Returns:
+            int: Number of rows dropped
+        """
+        with lock:
+            if not self.n_dead:
+                return 0
+            generation = self.generation
+            snapshot_size = self.size
+            matrix, sq_norms, names = self._matrix, self._sq_norms, self.names
+            keep = np.flatnonzero(self._alive[:snapshot_size])
+
+        # Heavy part, rows below snapshot_size are never written again
+        kept_matrix = matrix[keep]
+        kept_sq_norms = sq_norms[keep]
+        kept_names = [names[row] for row in keep]
+
+        with lock:
+            if self.generation != generation:
+                return 0
+            tail = slice(snapshot_size, self.size)
+            new_matrix = np.concatenate([kept_matrix, self._matrix[tail]])
+            new_sq_norms = np.concatenate([kept_sq_norms, self._sq_norms[tail]])
+            new_alive = np.concatenate([self._alive[keep], self._alive[tail]])
+            new_names = kept_names + list(self.names[tail])
+
+            old_to_new = np.full(self.size, -1, dtype=np.int64)
+            old_to_new[keep] = np.arange(len(keep))
+            old_to_new[tail] = len(keep) + np.arange(self.size - snapshot_size)
+
+            dropped = self.size - new_matrix.shape[0]
+            self.adopt(new_matrix, new_sq_norms, new_names)
+            self._alive[:len(new_alive)] = new_alive
+            self.n_dead = int(len(new_alive) - new_alive.sum())
+            self.last_remap = (generation, self.generation, old_to_new)
+            return dropped
+
+    def clear(self):
+        """Drop every stored encoding"""
+        self.names = []
+        self.size = 0
+        self.n_dead = 0
+        self._rows_by_name = None
+        self.generation += 1
+
+    def sq_distances(self, queries, rows=None):
+        """
+        Squared L2 distances between queries and gallery rows
+
+        Args:
+            queries: (Q, dim) float32 array
+            rows: Optional array of row indices to restrict the comparison to
+
+        Returns:
+            (Q, N) or (Q, len(rows)) float32 array, removed rows are inf
+        """
+        if rows is None:
+            block, block_sq = self.encodings, self.sq_norms
+        else:
+            block, block_sq = self._matrix[rows], self._sq_norms[rows]
+
+        # ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g for every (query, gallery) pair
+        sq_distances = queries @ block.T
+        sq_distances *= -2.0
+        sq_distances += block_sq
+        sq_distances += np.einsum('ij,ij->i', queries, queries)[:, None]
+        np.maximum(sq_distances, 0.0, out=sq_distances)
+
+        if self.n_dead:
+            dead = ~(self.alive if rows is None else self._alive[rows])
+            sq_distances[:, dead] = np.inf
+        return sq_distances
+
+    def match(self, face_encodings):
+        """
+        Match a batch of query encodings against the whole gallery
+
+        Args:
+            face_encodings: Sequence or (Q, dim) array of query encodings
+
+        Returns:
+            tuple: (best_index, best_distance, runner_up_index, runner_up_distance)
+                   arrays of length Q. Indices are -1 and distances inf when
+                   the gallery has fewer rows than needed.
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.dim)
+        top2, top2_sq = nearest_two(self.sq_distances(queries))
+        return (top2[:, 0], np.sqrt(top2_sq[:, 0]),
+                top2[:, 1], np.sqrt(top2_sq[:, 1]))
+
+
+def nearest_two(sq_distances):
+    """
+    Pick the two smallest entries of every row of a distance matrix
+
+    Args:
+        sq_distances: (Q, M) array of squared distances
+
+    Returns:
+        tuple: ((Q, 2) column indices, (Q, 2) squared distances), best first.
+               Missing entries (M < 2 or inf distance) are -1 / inf.
+    """
+    n_rows, n_cols = sq_distances.shape
+    top2 = np.full((n_rows, 2), -1, dtype=np.int64)
+    top2_sq = np.full((n_rows, 2), np.inf, dtype=np.float32)
+    if n_rows == 0 or n_cols == 0:
+        return top2, top2_sq
+    if n_cols == 1:
+        top2[:, 0] = 0
+        top2_sq[:, 0] = sq_distances[:, 0]
+    else:
+        rows = np.arange(n_rows)[:, None]
+        pair = np.argpartition(sq_distances, 1, axis=1)[:, :2]
+        pair_sq = sq_distances[rows, pair]
+        order = np.argsort(pair_sq, axis=1)
+        top2[:] = pair[rows, order]
+        top2_sq[:] = pair_sq[rows, order]
+
+    top2[np.isinf(top2_sq)] = -1
+    return top2, top2_sq
+
+
+def label_matches(names, best_index, best_distance, tolerance):
+    """
+    Turn a search result into (name, confidence) pairs
+
+    Args:
+        names: Gallery names by row
+        best_index: Best row per query, -1 if none (as returned by match)
+        best_distance: Distance to that row
+        tolerance: Largest distance that still counts as the same person
+
+    Returns:
+        list: (name, confidence) per query, ("Unknown", 0.0) when no known
+              face is within tolerance
+    """
+    matches = []
+    for row, distance in zip(best_index, best_distance):
+        if row >= 0 and distance <= tolerance:
+            matches.append((names[row], float(1 - distance)))
+        else:
+            matches.append(("Unknown", 0.0))
+    return matches
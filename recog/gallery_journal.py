@@ -0,0 +1,245 @@
+import glob
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from recog.gallery import FaceGallery
+from recog.gallery_store import save_gallery
+
+"""
+    Append-only enrolment/removal journal stored next to the gallery snapshot.
+
+        face_gallery/journal-<seq>.log
+
+    Each record is  <payload length u32><crc32 u32><payload>  where the payload
+    is  <op 1 byte><name length u16><metadata length u32><name><metadata json>
+    followed, for enrolments, by the raw float32 encoding. Every record is
+    fsynced before the call returns. A torn record at the end of the last
+    segment (crash during a write) fails its CRC and is cut off on replay.
+
+    Compaction rotates to a new segment, writes a fresh snapshot in the
+    background and records the first segment that is not part of it
+    ('journal_seq' in meta.json), then deletes the old segments.
+
+    Methods:
+        replay(self, start_seq)
+        append_add(self, name, encoding, metadata=None)
+        append_adds(self, records) --- one fsync per batch
+        append_removes(self, names)
+        maybe_compact
+        compact(self, wait=False)
+        close
+"""
+
+OP_ADD = b'A'
+OP_REMOVE = b'R'
+
+_HEADER = struct.Struct('<II')
+_PAYLOAD = struct.Struct('<cHI')
+# The name length is a u16 in the record header
+MAX_NAME_BYTES = 0xFFFF
+_SEGMENT = re.compile(r'journal-(\d+)\.log$')
+
+
+def _segment_path(path, seq):
+    return os.path.join(path, f"journal-{seq:06d}.log")
+
+
+def list_segments(path):
+    """Sequence numbers of the journal segments in a gallery directory"""
+    seqs = []
+    for file_path in glob.glob(os.path.join(path, 'journal-*.log')):
+        match = _SEGMENT.search(file_path)
+        if match:
+            seqs.append(int(match.group(1)))
+    return sorted(seqs)
+
+
+def encode_record(op, name, encoding=None, metadata=None):
+    """
+    Serialise one journal record
+
+    Raises:
+        ValueError: The UTF-8 name is longer than MAX_NAME_BYTES
+    """
+    name_bytes = name.encode('utf-8')
+    if len(name_bytes) > MAX_NAME_BYTES:
+        raise ValueError(f"Name is {len(name_bytes)} bytes long, the journal allows {MAX_NAME_BYTES}")
+    meta_bytes = json.dumps(metadata, default=str).encode('utf-8') if metadata else b''
+    payload = _PAYLOAD.pack(op, len(name_bytes), len(meta_bytes)) + name_bytes + meta_bytes
+    if encoding is not None:
+        payload += np.asarray(encoding, dtype='<f4').tobytes()
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_segment(file_path):
+    """
+    Decode every intact record of a segment
+
+    Returns:
+        tuple: (records, valid_bytes) where records are
+               (op, name, encoding or None, metadata or None)
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    records = []
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        length, crc = _HEADER.unpack_from(data, offset)
+        start = offset + _HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc or length < _PAYLOAD.size:
+            break
+
+        op, name_len, meta_len = _PAYLOAD.unpack_from(payload)
+        pos = _PAYLOAD.size
+        name = payload[pos:pos + name_len].decode('utf-8')
+        pos += name_len
+        metadata = json.loads(payload[pos:pos + meta_len]) if meta_len else None
+        pos += meta_len
+        encoding = np.frombuffer(payload[pos:], dtype='<f4') if op == OP_ADD else None
+
+        records.append((op, name, encoding, metadata))
+        offset = start + length
+    return records, offset
+
+
+class GalleryJournal:
+    def __init__(self, path, lock, snapshot_fn, compact_bytes=4 * 1024 * 1024, logger=None):
+        """
+        Journal of gallery changes made since the last snapshot
+
+        Args:
+            path: Gallery directory the journal lives in
+            lock: Lock shared with the owner; held while the gallery is
+                  mutated and the matching record is appended
+            snapshot_fn: Called under `lock`, returns
+                         (encodings, sq_norms, names, metadata) copies
+            compact_bytes: Journal size that triggers background compaction
+            logger: Optional logger
+        """
+        self.path = path
+        self.lock = lock
+        self.snapshot_fn = snapshot_fn
+        self.compact_bytes = compact_bytes
+        self.logger = logger
+
+        self.seq = 1
+        self.journal_bytes = 0
+        self._file = None
+        self._compactor = None
+
+    def replay(self, start_seq):
+        """
+        Read every record since the snapshot and position the journal for appends
+
+        Args:
+            start_seq: First segment not contained in the snapshot
+
+        Returns:
+            list: Decoded records in write order
+        """
+        records = []
+        self.journal_bytes = 0
+        seqs = [seq for seq in list_segments(self.path) if seq >= start_seq]
+        for seq in seqs:
+            file_path = _segment_path(self.path, seq)
+            segment_records, valid_bytes = read_segment(file_path)
+            records.extend(segment_records)
+            self.journal_bytes += valid_bytes
+            if valid_bytes < os.path.getsize(file_path):
+                # Cut off a record torn by a crash so appends start clean
+                with open(file_path, 'r+b') as f:
+                    f.truncate(valid_bytes)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if self.logger:
+                    self.logger.warning(f"Truncated torn journal record in {file_path}")
+        self.seq = seqs[-1] if seqs else start_seq
+        return records
+
+    def _append(self, record):
+        if self._file is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._file = open(_segment_path(self.path, self.seq), 'ab')
+        self._file.write(record)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.journal_bytes += len(record)
+
+    def append_add(self, name, encoding, metadata=None):
+        """Durably record an enrolment (call with `lock` held)"""
+        self._append(encode_record(OP_ADD, name, encoding, metadata))
+
+    def append_adds(self, records):
+        """Durably record a batch of enrolments, one fsync per batch (call with `lock` held)"""
+        self._append(b''.join(encode_record(OP_ADD, name, encoding, metadata)
+                              for name, encoding, metadata in records))
+
+    def append_removes(self, names):
+        """Durably record the removal of identities, one fsync per batch (call with `lock` held)"""
+        self._append(b''.join(encode_record(OP_REMOVE, name) for name in names))
+
+    def maybe_compact(self):
+        """Start a background compaction if the journal passed its threshold"""
+        if self.journal_bytes >= self.compact_bytes:
+            self.compact()
+
+    def compact(self, wait=False):
+        """
+        Fold the journal into a fresh snapshot
+
+        Args:
+            wait: Block until the snapshot has been written
+        """
+        with self.lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                compactor = self._compactor
+            else:
+                snapshot = self.snapshot_fn()
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self.seq += 1
+                self.journal_bytes = 0
+                compactor = threading.Thread(
+                    target=self._write_snapshot,
+                    args=(snapshot, self.seq),
+                    daemon=True
+                )
+                self._compactor = compactor
+                compactor.start()
+        if wait:
+            compactor.join()
+
+    def _write_snapshot(self, snapshot, next_seq):
+        encodings, sq_norms, names, metadata = snapshot
+        try:
+            gallery = FaceGallery(dim=encodings.shape[1])
+            gallery.adopt(encodings, sq_norms, names)
+            save_gallery(gallery, self.path, metadata, extra={'journal_seq': next_seq})
+
+            for seq in list_segments(self.path):
+                if seq < next_seq:
+                    os.remove(_segment_path(self.path, seq))
+            if self.logger:
+                self.logger.info(f"Compacted gallery journal into a snapshot of {len(names)} faces")
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Error compacting gallery journal: {str(e)}")
+
+    def close(self):
+        """Wait for a running compaction and close the current segment"""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
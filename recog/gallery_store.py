@@ -0,0 +1,211 @@
+import json
+import os
+import pickle
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from recog.gallery import FaceGallery
+
+"""
+    On-disk gallery format (a directory, default 'face_gallery/'):
+
+        meta.json                 metadata sidecar, the commit point of a save
+        encodings-<gen>.f32       raw little-endian float32 (count x dim) block
+        norms-<gen>.f32           float32 squared norm of every row
+        names-<gen>.bin           UTF-8 names, concatenated
+        name_offsets-<gen>.u64    (count + 1) uint64 offsets into names-<gen>.bin
+
+    Every save writes a new generation of data files, fsyncs them and then
+    atomically replaces meta.json, so readers always see a complete gallery.
+    Loading only opens memory maps, so it is O(1) and the pages are shared
+    read-only between every process that maps the same gallery.
+
+    Functions:
+        gallery_exists(path)
+        save_gallery(gallery, path, metadata=None, extra=None)
+        load_gallery(gallery, path)
+        migrate_pickle(pickle_path, path)
+"""
+
+FORMAT_NAME = 'face-gallery'
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+
+class NameTable(Sequence):
+    """Read-only name list backed by memory-mapped offsets and UTF-8 bytes"""
+
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("name index out of range")
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return bytes(self._data[start:end]).decode('utf-8')
+
+
+def gallery_exists(path):
+    return os.path.exists(os.path.join(path, META_FILE))
+
+
+def read_meta(path):
+    """Read and validate the metadata sidecar of a gallery directory"""
+    with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT_NAME:
+        raise ValueError(f"{path} is not a face gallery")
+    if meta.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported face gallery version {meta.get('version')}")
+    return meta
+
+
+def _fsync_dir(path):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_durable(path, data):
+    """Write bytes to a file and fsync it"""
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_json_atomic(path, obj):
+    """Replace a JSON file atomically (write temp, fsync, rename)"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    _write_durable(tmp_path, json.dumps(obj, indent=2, default=str).encode('utf-8'))
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def save_gallery(gallery, path, metadata=None, extra=None):
+    """
+    Write a gallery snapshot as a new generation of the on-disk format
+
+    Args:
+        gallery: FaceGallery to persist
+        path: Gallery directory (created if needed)
+        metadata: Per-name metadata dict stored in the sidecar
+        extra: Additional top-level fields for meta.json
+    """
+    os.makedirs(path, exist_ok=True)
+    previous = read_meta(path) if gallery_exists(path) else None
+    generation = previous['generation'] + 1 if previous else 1
+
+    encodings, sq_norms, names = gallery.live_arrays()
+    encoded_names = [name.encode('utf-8') for name in names]
+    offsets = np.zeros(len(encoded_names) + 1, dtype='<u8')
+    if encoded_names:
+        offsets[1:] = np.cumsum([len(name) for name in encoded_names])
+
+    files = {
+        'encodings': f"encodings-{generation:06d}.f32",
+        'norms': f"norms-{generation:06d}.f32",
+        'names': f"names-{generation:06d}.bin",
+        'name_offsets': f"name_offsets-{generation:06d}.u64",
+    }
+    _write_durable(os.path.join(path, files['encodings']),
+                   np.ascontiguousarray(encodings, dtype='<f4').tobytes())
+    _write_durable(os.path.join(path, files['norms']),
+                   np.ascontiguousarray(sq_norms, dtype='<f4').tobytes())
+    _write_durable(os.path.join(path, files['names']), b''.join(encoded_names))
+    _write_durable(os.path.join(path, files['name_offsets']), offsets.tobytes())
+
+    meta = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'generation': generation,
+        'count': len(names),
+        'dim': gallery.dim,
+        'dtype': 'float32',
+        'saved_at': time.time(),
+        'files': files,
+        'metadata': metadata or {},
+    }
+    meta.update(extra or {})
+    write_json_atomic(os.path.join(path, META_FILE), meta)
+
+    # Readers that still map the old generation keep their pages after unlink
+    if previous:
+        for name in previous['files'].values():
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+    return meta
+
+
+def _map(path, dtype, shape):
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+def load_gallery(gallery, path):
+    """
+    Map a gallery directory into `gallery` without copying the encodings
+
+    Args:
+        gallery: FaceGallery to load into (its storage is replaced)
+        path: Gallery directory
+
+    Returns:
+        dict: The parsed metadata sidecar
+    """
+    meta = read_meta(path)
+    count, dim = meta['count'], meta['dim']
+    if dim != gallery.dim:
+        raise ValueError(f"Gallery dimension {dim} does not match {gallery.dim}")
+    files = meta['files']
+
+    matrix = _map(os.path.join(path, files['encodings']), '<f4', (count, dim))
+    sq_norms = _map(os.path.join(path, files['norms']), '<f4', (count,))
+    offsets = np.memmap(os.path.join(path, files['name_offsets']), dtype='<u8',
+                        mode='r', shape=(count + 1,))
+    if offsets[-1] > 0:
+        data = np.memmap(os.path.join(path, files['names']), dtype=np.uint8, mode='r')
+    else:
+        data = np.zeros(0, dtype=np.uint8)
+
+    gallery.adopt(matrix, sq_norms, NameTable(offsets, data))
+    return meta
+
+
+def migrate_pickle(pickle_path, path):
+    """
+    One-shot conversion of a legacy face_database.pkl into the gallery format
+
+    Args:
+        pickle_path: Path of the pickle written by the old save_face_database
+        path: Gallery directory to create
+
+    Returns:
+        int: Number of faces migrated
+    """
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+
+    gallery = FaceGallery(capacity=len(data['names']))
+    if len(data['names']) > 0:
+        gallery.extend(data['encodings'], data['names'])
+    save_gallery(gallery, path, data.get('metadata', {}))
+    return len(gallery)
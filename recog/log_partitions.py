@@ -0,0 +1,347 @@
+import calendar
+import collections
+import contextlib
+import glob
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+
+from recog.log_store import DAY, SCHEMA_VERSION, epoch, migrate, rebuild_rollups, window_stats
+
+"""
+    Time-partitioned recognition log storage.
+
+    Logs live in one SQLite file per UTC day or ISO week instead of one file
+    that grows forever:
+
+        recognition_logs/recognition_day_20261018.db
+        recognition_logs/recognition_week_20261012.db   (starts on Monday)
+
+    Every partition is a complete log database (raw logs, sessions, rollups,
+    see recog.log_store) holding the rows whose time (timestamp or
+    first_seen) falls into its period. The period is part of the file name,
+    so changing it leaves the older files readable.
+
+    Files are opened on demand: the writer keeps the few partitions it
+    writes to open, readers open the partitions a query's time range
+    overlaps and nothing else, read-only (WAL readers never block the
+    writer). Partitions of an older schema are upgraded on start-up.
+    A read_only instance (e.g. a query CLI) never writes anything. Retention deletes whole expired files, so
+    nothing ever needs a DELETE or a VACUUM on a live database.
+
+    An existing single-file log (face_recognition.db) is split into
+    partitions once, then renamed to face_recognition.db.imported. Each
+    partition records the import in its own transaction, so an interrupted
+    import resumes without duplicating rows.
+
+    Methods (LogPartitions):
+        period_start(self, timestamp) --- epoch start of the partition holding it
+        partitions(self, since=None, until=None) --- [(start, end, path)] in time order
+        writer(self, start) --- context manager, connection for the log writer
+        query(self, since, until, fn) --- fn(conn) for each overlapping partition
+        connect_read_only(self, path)
+        window_stats(self, since, until=None) --- merged recog.log_store.window_stats
+        drop_expired(self, now=None) --- retention, returns the removed paths
+        stats
+        close
+"""
+
+PERIODS = {'day': DAY, 'week': 7 * DAY}
+
+# Unix time 0 was a Thursday, weeks start on Monday
+_WEEK_OFFSET = 4 * DAY
+
+_FILENAME = re.compile(r'^recognition_(day|week)_(\d{8})\.db$')
+
+# Connections kept open by the writer and by readers
+MAX_WRITERS = 4
+MAX_READERS = 32
+
+
+class LogPartitions:
+    def __init__(self, directory='recognition_logs', period='day', retention_days=None,
+                 legacy_db='face_recognition.db', read_only=False, logger=None):
+        """
+        Partitioned recognition log
+
+        Args:
+            directory: Directory of the partition files
+            period: 'day' or 'week'
+            retention_days: Partitions that ended longer ago than this are
+                            deleted (None keeps everything)
+            legacy_db: Single-file log of older versions to import once
+                       (None skips the import)
+            read_only: Only query; no import, upgrade, retention or writer
+            logger: Logger for imports and retention
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Unknown log partition period {period!r}, use one of {sorted(PERIODS)}")
+        self.directory = directory
+        self.period = period
+        self.retention_days = retention_days
+        self.read_only = read_only
+        self.logger = logger or logging.getLogger(__name__)
+        self.dropped = 0
+
+        self._writers = collections.OrderedDict()
+        self._readers = collections.OrderedDict()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+
+        if read_only:
+            return
+        os.makedirs(directory, exist_ok=True)
+        if legacy_db and os.path.exists(legacy_db):
+            self._import_legacy(legacy_db)
+        self._upgrade()
+        self.drop_expired()
+
+    # ------------------------------ layout ------------------------------
+
+    def period_start(self, timestamp):
+        """Epoch start of the partition a timestamp (epoch seconds) belongs to"""
+        size = PERIODS[self.period]
+        if self.period == 'week':
+            return (int(timestamp) - _WEEK_OFFSET) // size * size + _WEEK_OFFSET
+        return int(timestamp) // size * size
+
+    def _path(self, start):
+        day = time.strftime('%Y%m%d', time.gmtime(start))
+        return os.path.join(self.directory, f"recognition_{self.period}_{day}.db")
+
+    def partitions(self, since=None, until=None):
+        """
+        Partition files overlapping [since, until), oldest first
+
+        Returns:
+            list: (start, end, path) tuples, epoch seconds
+        """
+        found = []
+        for path in glob.glob(os.path.join(self.directory, 'recognition_*.db')):
+            match = _FILENAME.match(os.path.basename(path))
+            if not match:
+                continue
+            start = calendar.timegm(time.strptime(match.group(2), '%Y%m%d'))
+            end = start + PERIODS[match.group(1)]
+            if (since is None or end > since) and (until is None or start < until):
+                found.append((start, end, path))
+        return sorted(found)
+
+    def _connect(self, path):
+        if self.read_only:
+            raise PermissionError(f"Log partitions in {self.directory} are opened read-only")
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL: durable on checkpoint, no fsync per transaction
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def connect_read_only(self, path):
+        """New read-only connection to a partition file"""
+        return sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True,
+                               check_same_thread=False)
+
+    def _upgrade(self):
+        """Bring partitions written by an older version to the current schema"""
+        for _, _, path in self.partitions():
+            conn = self._connect(path)
+            try:
+                if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+                    migrate(conn, self.logger)
+            finally:
+                conn.close()
+
+    # ------------------------------ writing ------------------------------
+
+    @contextlib.contextmanager
+    def writer(self, start):
+        """
+        Connection to the partition starting at `start`, created if needed
+
+        Use as `with partitions.writer(start) as conn:`; only the log writer
+        thread writes, retention waits until it is done with the file.
+        """
+        with self._write_lock:
+            yield self._writer_conn(start)
+
+    def _writer_conn(self, start):
+        conn = self._writers.get(start)
+        if conn is not None:
+            self._writers.move_to_end(start)
+            return conn
+        conn = self._connect(self._path(start))
+        migrate(conn, self.logger)
+        self._writers[start] = conn
+        while len(self._writers) > MAX_WRITERS:
+            self._writers.popitem(last=False)[1].close()
+        return conn
+
+    # ------------------------------ reading ------------------------------
+
+    def query(self, since, until, fn):
+        """
+        Run fn(conn) on every partition overlapping [since, until)
+
+        Returns:
+            list: The results, oldest partition first
+        """
+        results = []
+        with self._read_lock:
+            for start, _, path in self.partitions(since, until):
+                conn = self._readers.get(path)
+                if conn is None:
+                    conn = self._readers[path] = self.connect_read_only(path)
+                    while len(self._readers) > MAX_READERS:
+                        self._readers.popitem(last=False)[1].close()
+                else:
+                    self._readers.move_to_end(path)
+                try:
+                    results.append(fn(conn))
+                except sqlite3.OperationalError as e:
+                    # Created by the writer a moment ago, schema not committed yet
+                    self.logger.debug(f"Skipping log partition {path}: {str(e)}")
+        return results
+
+    def window_stats(self, since, until=None):
+        """
+        Per-name totals of a time window over the partitions it overlaps
+
+        Returns:
+            list: Rows like recog.log_store.window_stats, merged by name
+        """
+        since = epoch(since)
+        until = epoch(until if until is not None else time.time())
+        totals = {}
+        for rows in self.query(since, until, lambda conn: window_stats(conn, since, until)):
+            for name, *values in rows:
+                total = totals.get(name)
+                if total is None:
+                    totals[name] = list(values)
+                    continue
+                for i, value in enumerate(values):
+                    total[i] = max(total[i], value) if i == 3 else total[i] + value
+        return [(name,) + tuple(values) for name, values in totals.items()]
+
+    # ------------------------------ retention ------------------------------
+
+    def drop_expired(self, now=None):
+        """
+        Delete the partitions that ended more than retention_days ago
+
+        Returns:
+            list: Paths of the removed partition files
+        """
+        if not self.retention_days:
+            return []
+        cutoff = (now or time.time()) - self.retention_days * DAY
+        expired = [(start, path) for start, end, path in self.partitions() if end <= cutoff]
+        if not expired:
+            return []
+
+        with self._write_lock, self._read_lock:
+            for start, path in expired:
+                conn = self._writers.pop(start, None)
+                if conn is not None:
+                    conn.close()
+                conn = self._readers.pop(path, None)
+                if conn is not None:
+                    conn.close()
+                for suffix in ('', '-wal', '-shm'):
+                    try:
+                        os.remove(path + suffix)
+                    except FileNotFoundError:
+                        pass
+            self.dropped += len(expired)
+        self.logger.info(f"Log retention: removed {len(expired)} partitions older than "
+                         f"{self.retention_days} days")
+        return [path for _, path in expired]
+
+    # ------------------------------ legacy import ------------------------------
+
+    def _import_legacy(self, legacy_db):
+        started = time.time()
+        legacy = self._connect(legacy_db)
+        try:
+            # Epoch timestamps and indexes first, the copy below relies on them
+            migrate(legacy, self.logger)
+            days = {row[0] for row in legacy.execute(
+                f'SELECT DISTINCT timestamp / {DAY} FROM recognition_logs WHERE timestamp IS NOT NULL')}
+            days |= {row[0] for row in legacy.execute(
+                f'SELECT DISTINCT first_seen / {DAY} FROM recognition_sessions WHERE first_seen IS NOT NULL')}
+        finally:
+            legacy.close()
+        starts = sorted({self.period_start(day * DAY) for day in days})
+        if starts:
+            self.logger.info(f"Splitting {legacy_db} into {len(starts)} log partitions")
+
+        source = os.path.abspath(legacy_db)
+        for start in starts:
+            end = start + PERIODS[self.period]
+            with self.writer(start) as conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS legacy_import (source TEXT PRIMARY KEY)')
+                if conn.execute('SELECT 1 FROM legacy_import WHERE source = ?', (source,)).fetchone():
+                    continue
+                conn.execute('ATTACH DATABASE ? AS legacy', (legacy_db,))
+                try:
+                    with conn:
+                        conn.execute('''
+                            INSERT INTO recognition_logs (name, confidence, timestamp, camera_id, image_path)
+                            SELECT name, confidence, timestamp, camera_id, image_path
+                            FROM legacy.recognition_logs WHERE timestamp >= ? AND timestamp < ?
+                            ORDER BY id
+                        ''', (start, end))
+                        conn.execute('''
+                            INSERT INTO recognition_sessions
+                            (name, camera_id, first_seen, last_seen, frames, max_confidence, avg_confidence)
+                            SELECT name, camera_id, first_seen, last_seen, frames, max_confidence, avg_confidence
+                            FROM legacy.recognition_sessions WHERE first_seen >= ? AND first_seen < ?
+                            ORDER BY id
+                        ''', (start, end))
+                        rebuild_rollups(conn)
+                        conn.execute('INSERT INTO legacy_import (source) VALUES (?)', (source,))
+                finally:
+                    conn.execute('DETACH DATABASE legacy')
+
+        os.replace(legacy_db, legacy_db + '.imported')
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(legacy_db + suffix):
+                os.remove(legacy_db + suffix)
+        if starts:
+            self.logger.info(f"Log import done in {time.time() - started:.0f} s, "
+                             f"{legacy_db} kept as {legacy_db}.imported")
+
+    # ------------------------------ misc ------------------------------
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'partitions', 'bytes', 'oldest', 'newest', 'dropped'}
+                  (oldest/newest: partition start, epoch seconds)
+        """
+        found = self.partitions()
+        size = 0
+        for _, _, path in found:
+            for suffix in ('', '-wal'):
+                try:
+                    size += os.path.getsize(path + suffix)
+                except OSError:
+                    pass
+        return {
+            'partitions': len(found),
+            'bytes': size,
+            'oldest': found[0][0] if found else None,
+            'newest': found[-1][0] if found else None,
+            'dropped': self.dropped,
+        }
+
+    def close(self):
+        """Close every open partition connection"""
+        with self._write_lock, self._read_lock:
+            for conn in list(self._writers.values()) + list(self._readers.values()):
+                conn.close()
+            self._writers.clear()
+            self._readers.clear()
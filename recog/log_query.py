@@ -0,0 +1,210 @@
+import heapq
+import os
+import sqlite3
+from datetime import datetime
+
+from recog.log_store import epoch
+
+"""
+    Paginated history queries over the partitioned recognition log.
+
+    Rows are filtered by identity, camera, time range and confidence and
+    streamed newest first (or oldest first) from read-only connections, one
+    partition at a time, so a query never holds more than the current row
+    in memory and never blocks the log writer. Every filter maps onto an
+    index: (time, name), (name, time) or (camera_id, time).
+
+    Pagination is by key, not offset: each row carries a cursor, the
+    string form of its (time, partition, id) sort key, and a query given a
+    cursor continues strictly after that row. Pages stay cheap however deep
+    they are and rows written in the meantime never shift them.
+
+    kind='sessions' reads sighting sessions (time: first_seen, confidence:
+    max_confidence), kind='detections' the raw per-frame rows.
+
+    Functions:
+        query_history(partitions, kind='sessions', names=None, cameras=None, since=None,
+                      until=None, min_confidence=None, cursor=None, newest_first=True)
+        fetch_page(stream, page_size=100) --- (rows, next_cursor)
+"""
+
+KINDS = {
+    'sessions': {
+        'table': 'recognition_sessions',
+        'time': 'first_seen',
+        'confidence': 'max_confidence',
+        'columns': ('name', 'camera_id', 'first_seen', 'last_seen', 'frames',
+                    'max_confidence', 'avg_confidence'),
+        'times': ('first_seen', 'last_seen'),
+    },
+    'detections': {
+        'table': 'recognition_logs',
+        'time': 'timestamp',
+        'confidence': 'confidence',
+        'columns': ('name', 'confidence', 'timestamp', 'camera_id', 'image_path'),
+        'times': ('timestamp',),
+    },
+}
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (str, int)):
+        return [str(value)]
+    return [str(item) for item in value]
+
+
+def _parse_cursor(cursor):
+    """(time, partition name, id) of a cursor string"""
+    try:
+        time_value, partition, row_id = cursor.rsplit(':', 2)
+        return int(time_value), partition, int(row_id)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid history cursor {cursor!r}")
+
+
+def _partition_query(spec, names, cameras, since, until, min_confidence, after, partition, newest_first):
+    """SQL and parameters for one partition, rows strictly after the cursor key"""
+    time_column = spec['time']
+    conditions, params = [], []
+    if names:
+        conditions.append(f"name IN ({','.join('?' * len(names))})")
+        params += names
+    if cameras:
+        conditions.append(f"camera_id IN ({','.join('?' * len(cameras))})")
+        params += cameras
+    if since is not None:
+        conditions.append(f"{time_column} >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append(f"{time_column} < ?")
+        params.append(until)
+    if min_confidence is not None:
+        conditions.append(f"{spec['confidence']} >= ?")
+        params.append(min_confidence)
+
+    beyond = '<' if newest_first else '>'
+    if after is not None:
+        after_time, after_partition, after_id = after
+        if partition == after_partition:
+            conditions.append(f"({time_column} {beyond} ? OR ({time_column} = ? AND id {beyond} ?))")
+            params += [after_time, after_time, after_id]
+        elif (partition < after_partition) == newest_first:
+            # The whole partition sorts after the cursor row at equal times
+            conditions.append(f"{time_column} {beyond}= ?")
+            params.append(after_time)
+        else:
+            conditions.append(f"{time_column} {beyond} ?")
+            params.append(after_time)
+
+    direction = 'DESC' if newest_first else 'ASC'
+    sql = (f"SELECT {time_column}, id, {', '.join(spec['columns'])} FROM {spec['table']}"
+           f"{' WHERE ' + ' AND '.join(conditions) if conditions else ''}"
+           f" ORDER BY {time_column} {direction}, id {direction}")
+    return sql, params
+
+
+def _partition_rows(partitions, path, spec, filters, newest_first):
+    """Sort keys and rows of one partition, streamed from a read-only connection"""
+    partition = os.path.splitext(os.path.basename(path))[0]
+    sql, params = _partition_query(spec, *filters, partition, newest_first)
+    conn = partitions.connect_read_only(path)
+    try:
+        try:
+            cursor = conn.execute(sql, params)
+        except sqlite3.OperationalError:
+            # Created by the writer a moment ago, schema not committed yet
+            return
+        for time_value, row_id, *values in cursor:
+            yield (time_value, partition, row_id), values
+    finally:
+        conn.close()
+
+
+def _clusters(found):
+    """Group time-sorted partitions into runs that overlap (day and week files)"""
+    clusters = []
+    for start, end, path in found:
+        if clusters and start < clusters[-1][0]:
+            clusters[-1][0] = max(clusters[-1][0], end)
+            clusters[-1][1].append(path)
+        else:
+            clusters.append([end, [path]])
+    return [paths for _, paths in clusters]
+
+
+def query_history(partitions,
+                  kind='sessions',
+                  names=None,
+                  cameras=None,
+                  since=None,
+                  until=None,
+                  min_confidence=None,
+                  cursor=None,
+                  newest_first=True):
+    """
+    Stream matching log rows
+
+    Args:
+        partitions: LogPartitions to read
+        kind: 'sessions' or 'detections'
+        names: Identity or list of identities (default: all)
+        cameras: Camera id or list of camera ids (default: all)
+        since: Window start, datetime or epoch seconds (inclusive)
+        until: Window end, datetime or epoch seconds (exclusive)
+        min_confidence: Lowest confidence (max_confidence for sessions)
+        cursor: Continue after the row this cursor came from
+        newest_first: Order by time descending
+
+    Yields:
+        dict: The row's columns (times as datetime) plus 'cursor'
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown history kind {kind!r}, use one of {sorted(KINDS)}")
+    spec = KINDS[kind]
+    since = epoch(since) if since is not None else None
+    until = epoch(until) if until is not None else None
+    after = _parse_cursor(cursor) if cursor else None
+    filters = (_as_list(names), _as_list(cameras), since, until, min_confidence, after)
+
+    # Partitions entirely on the far side of the cursor are never opened
+    low, high = since, until
+    if after is not None:
+        if newest_first:
+            high = after[0] + 1 if high is None else min(high, after[0] + 1)
+        else:
+            low = after[0] if low is None else max(low, after[0])
+    clusters = _clusters(partitions.partitions(low, high))
+    if newest_first:
+        clusters.reverse()
+
+    for paths in clusters:
+        streams = [_partition_rows(partitions, path, spec, filters, newest_first) for path in paths]
+        rows = streams[0] if len(streams) == 1 else heapq.merge(
+            *streams, key=lambda item: item[0], reverse=newest_first)
+        for (time_value, partition, row_id), values in rows:
+            row = dict(zip(spec['columns'], values))
+            for column in spec['times']:
+                if row[column] is not None:
+                    row[column] = datetime.fromtimestamp(row[column])
+            row['cursor'] = f"{time_value}:{partition}:{row_id}"
+            yield row
+
+
+def fetch_page(stream, page_size=100):
+    """
+    One page of a query_history stream, which is closed afterwards
+
+    Returns:
+        tuple: (rows, next_cursor), next_cursor None on the last page
+    """
+    rows = []
+    try:
+        for row in stream:
+            if len(rows) == page_size:
+                return rows, rows[-1]['cursor']
+            rows.append(row)
+    finally:
+        stream.close()
+    return rows, None
@@ -0,0 +1,289 @@
+import time
+from collections import defaultdict
+from datetime import datetime
+
+"""
+    Schema, migrations and rollups of the recognition log database.
+
+    Timestamps are stored as integer Unix epoch seconds. recognition_logs
+    (raw per-frame rows) and recognition_sessions (sighting sessions) have
+    covering indexes on (time, name, ...) for window scans, and indexes on
+    (camera_id, time) and (name, time) for per-camera and per-identity
+    history queries (recog.log_query).
+
+    recognition_hourly and recognition_daily hold one row per (UTC hour or
+    day, name, camera) with the counts of both tables: sessions, frames and
+    confidence sums from the session rows, detections and their confidence
+    sum from the raw rows. The log writer upserts them in the transaction
+    that inserts the rows, so they never disagree with the logs. Window
+    statistics read at most two days of hourly buckets plus one daily
+    bucket per full day, whatever the size of the logs; windows are
+    resolved to the hour. A rollup row with sessions counts those, one
+    without (raw rows logged before sessions existed or with sessions off)
+    counts its raw detections, so older history stays in the statistics.
+    A missing name or camera is keyed as '' in the rollups (NULL would
+    never conflict in the upsert and pile up duplicate rows); statistics
+    report it as None again.
+
+    Databases written by older versions (DATETIME text, no rollups,
+    nullable rollup keys) are converted once on open, tracked by
+    PRAGMA user_version.
+
+    Functions:
+        epoch(value) --- datetime or number -> int seconds
+        migrate(conn, logger=None) --- create / upgrade the schema
+        rebuild_rollups(conn)
+        rollup_deltas(statement, rows) --- {(hour, name, camera_id): counts}
+        apply_rollups(conn, deltas) --- upsert into hourly and daily tables
+        window_stats(conn, since, until=None) --- per-name totals from the rollups
+"""
+
+SCHEMA_VERSION = 3
+
+HOUR = 3600
+DAY = 86400
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS recognition_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        confidence REAL,
+        timestamp INTEGER,
+        camera_id TEXT,
+        image_path TEXT
+    )
+'''
+
+INSERT = '''
+    INSERT INTO recognition_logs
+    (name, confidence, timestamp, camera_id, image_path)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# One row per sighting session, see recog.sightings
+SESSION_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS recognition_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        camera_id TEXT,
+        first_seen INTEGER,
+        last_seen INTEGER,
+        frames INTEGER,
+        max_confidence REAL,
+        avg_confidence REAL
+    )
+'''
+
+INSERT_SESSION = '''
+    INSERT INTO recognition_sessions
+    (name, camera_id, first_seen, last_seen, frames, max_confidence, avg_confidence)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Index of the time column in the rows of each insert statement
+TIME_COLUMN = {INSERT: 2, INSERT_SESSION: 2}
+
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_logs_time_name ON recognition_logs (timestamp, name, confidence)',
+    'CREATE INDEX IF NOT EXISTS idx_logs_camera_time ON recognition_logs (camera_id, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_sessions_time_name ON recognition_sessions (first_seen, name)',
+    'CREATE INDEX IF NOT EXISTS idx_sessions_camera_time ON recognition_sessions (camera_id, first_seen)',
+    # Schema 2
+    'CREATE INDEX IF NOT EXISTS idx_logs_name_time ON recognition_logs (name, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_sessions_name_time ON recognition_sessions (name, first_seen)',
+)
+
+ROLLUP_TABLES = ('recognition_hourly', 'recognition_daily')
+
+ROLLUP_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        bucket INTEGER NOT NULL,
+        name TEXT NOT NULL DEFAULT '',
+        camera_id TEXT NOT NULL DEFAULT '',
+        sessions INTEGER NOT NULL DEFAULT 0,
+        frames INTEGER NOT NULL DEFAULT 0,
+        confidence_sum REAL NOT NULL DEFAULT 0,
+        max_confidence REAL NOT NULL DEFAULT 0,
+        detections INTEGER NOT NULL DEFAULT 0,
+        detection_confidence_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket, name, camera_id)
+    )
+'''
+
+ROLLUP_UPSERT = '''
+    INSERT INTO {table}
+    (bucket, name, camera_id, sessions, frames, confidence_sum, max_confidence,
+     detections, detection_confidence_sum)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (bucket, name, camera_id) DO UPDATE SET
+        sessions = sessions + excluded.sessions,
+        frames = frames + excluded.frames,
+        confidence_sum = confidence_sum + excluded.confidence_sum,
+        max_confidence = MAX(max_confidence, excluded.max_confidence),
+        detections = detections + excluded.detections,
+        detection_confidence_sum = detection_confidence_sum + excluded.detection_confidence_sum
+'''
+
+
+def epoch(value):
+    """Integer Unix time of a datetime (naive ones are local time) or a number"""
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+def migrate(conn, logger=None):
+    """
+    Create the schema, or bring an older database up to SCHEMA_VERSION
+
+    Converting a large legacy log rewrites every row once; it runs in one
+    transaction, so an interrupted upgrade is simply redone.
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    with conn:
+        conn.execute(SCHEMA)
+        conn.execute(SESSION_SCHEMA)
+        if version < 3:
+            # Rollup keys were nullable before schema 3, rebuilt below
+            for table in ROLLUP_TABLES:
+                conn.execute(f'DROP TABLE IF EXISTS {table}')
+        for table in ROLLUP_TABLES:
+            conn.execute(ROLLUP_SCHEMA.format(table=table))
+        if version >= SCHEMA_VERSION:
+            return
+
+        started = time.time()
+        converted = 0
+        if version < 1:
+            # DATETIME text of older versions (naive local time) to epoch seconds
+            converted += conn.execute(
+                "UPDATE recognition_logs SET timestamp = CAST(strftime('%s', timestamp, 'utc') AS INTEGER) "
+                "WHERE typeof(timestamp) = 'text'").rowcount
+            converted += conn.execute(
+                "UPDATE recognition_sessions SET "
+                "first_seen = CAST(strftime('%s', first_seen, 'utc') AS INTEGER), "
+                "last_seen = CAST(strftime('%s', last_seen, 'utc') AS INTEGER) "
+                "WHERE typeof(first_seen) = 'text'").rowcount
+        if version < 3:
+            rebuild_rollups(conn)
+        for statement in INDEXES:
+            conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    if converted and logger:
+        logger.info(f"Recognition log upgraded to schema {SCHEMA_VERSION} "
+                    f"({converted} rows converted) in {time.time() - started:.1f} s")
+
+
+def rebuild_rollups(conn):
+    """Recompute the rollup tables from the logged rows (inside the caller's transaction)"""
+    for table in ROLLUP_TABLES:
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute(f'''
+        INSERT INTO recognition_hourly (bucket, name, camera_id, detections, detection_confidence_sum)
+        SELECT timestamp / {HOUR} * {HOUR}, COALESCE(name, ''), COALESCE(camera_id, ''),
+               COUNT(*), SUM(confidence)
+        FROM recognition_logs WHERE timestamp IS NOT NULL
+        GROUP BY 1, 2, 3
+    ''')
+    conn.execute(f'''
+        INSERT INTO recognition_hourly (bucket, name, camera_id, sessions, frames, confidence_sum, max_confidence)
+        SELECT first_seen / {HOUR} * {HOUR}, COALESCE(name, ''), COALESCE(camera_id, ''),
+               COUNT(*), SUM(frames), SUM(avg_confidence * frames), MAX(max_confidence)
+        FROM recognition_sessions WHERE first_seen IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON CONFLICT (bucket, name, camera_id) DO UPDATE SET
+            sessions = excluded.sessions,
+            frames = excluded.frames,
+            confidence_sum = excluded.confidence_sum,
+            max_confidence = excluded.max_confidence
+    ''')
+    conn.execute(f'''
+        INSERT INTO recognition_daily
+        SELECT bucket / {DAY} * {DAY}, name, camera_id, SUM(sessions), SUM(frames), SUM(confidence_sum),
+               MAX(max_confidence), SUM(detections), SUM(detection_confidence_sum)
+        FROM recognition_hourly GROUP BY 1, 2, 3
+    ''')
+
+
+def rollup_deltas(statement, rows):
+    """
+    Rollup increments of rows inserted with INSERT or INSERT_SESSION
+
+    Returns:
+        dict: (hour, name, camera_id) -> [sessions, frames, confidence_sum,
+              max_confidence, detections, detection_confidence_sum], with
+              '' for a missing name or camera
+    """
+    deltas = defaultdict(lambda: [0, 0, 0.0, 0.0, 0, 0.0])
+    if statement == INSERT_SESSION:
+        for name, camera_id, first_seen, _, frames, max_confidence, avg_confidence in rows:
+            delta = deltas[(first_seen // HOUR * HOUR, name or '', camera_id or '')]
+            delta[0] += 1
+            delta[1] += frames
+            delta[2] += avg_confidence * frames
+            delta[3] = max(delta[3], max_confidence)
+    elif statement == INSERT:
+        for name, confidence, timestamp, camera_id, _ in rows:
+            delta = deltas[(timestamp // HOUR * HOUR, name or '', camera_id or '')]
+            delta[4] += 1
+            delta[5] += confidence
+    return deltas
+
+
+def apply_rollups(conn, deltas):
+    """Add rollup increments to the hourly and daily tables (inside the caller's transaction)"""
+    if not deltas:
+        return
+    daily = defaultdict(lambda: [0, 0, 0.0, 0.0, 0, 0.0])
+    for (hour, name, camera_id), delta in deltas.items():
+        day = daily[(hour // DAY * DAY, name, camera_id)]
+        for i, value in enumerate(delta):
+            day[i] = max(day[i], value) if i == 3 else day[i] + value
+    for table, buckets in (('recognition_hourly', deltas), ('recognition_daily', daily)):
+        conn.executemany(ROLLUP_UPSERT.format(table=table),
+                         [key + tuple(delta) for key, delta in buckets.items()])
+
+
+def window_stats(conn, since, until=None):
+    """
+    Per-name totals of a time window, from the rollup tables only
+
+    Args:
+        conn: Connection to the log database
+        since: Window start (epoch seconds or datetime), rounded down to the hour
+        until: Window end, rounded up to the hour (default: now)
+
+    Rollup rows (bucket, name, camera) without sessions fall back to their
+    raw detections: every detection counts as a session of one frame.
+
+    Returns:
+        list: (name, sessions, frames, confidence_sum, max_confidence) tuples
+    """
+    start = epoch(since) // HOUR * HOUR
+    end = -(-epoch(until if until is not None else time.time()) // HOUR) * HOUR
+    if end <= start:
+        end = start + HOUR
+    # Whole days from the daily table, the partial days at both ends by the hour
+    first_day = -(-start // DAY) * DAY
+    last_day = end // DAY * DAY
+    if first_day >= last_day:
+        parts = [('recognition_hourly', start, end)]
+    else:
+        parts = [('recognition_hourly', start, first_day),
+                 ('recognition_daily', first_day, last_day),
+                 ('recognition_hourly', last_day, end)]
+
+    union = ' UNION ALL '.join(
+        f'SELECT name, sessions, frames, confidence_sum, max_confidence, detections, '
+        f'detection_confidence_sum FROM {table} WHERE bucket >= ? AND bucket < ?'
+        for table, _, _ in parts)
+    params = [value for _, low, high in parts for value in (low, high)]
+    return conn.execute(f'''
+        SELECT NULLIF(name, ''),
+               SUM(CASE WHEN sessions > 0 THEN sessions ELSE detections END),
+               SUM(CASE WHEN sessions > 0 THEN frames ELSE detections END),
+               SUM(CASE WHEN sessions > 0 THEN confidence_sum ELSE detection_confidence_sum END),
+               MAX(max_confidence)
+        FROM ({union})
+        GROUP BY name
+    ''', params).fetchall()
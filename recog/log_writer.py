@@ -0,0 +1,192 @@
+import atexit
+import collections
+import itertools
+import logging
+import threading
+import time
+
+from recog.log_store import INSERT, TIME_COLUMN, rollup_deltas, apply_rollups
+
+"""
+    Single-writer recognition log.
+
+    Recognition threads only append rows to a bounded in-memory queue and
+    return; they never touch the disk. A row goes to recognition_logs (raw
+    per-frame sightings) unless another statement, such as INSERT_SESSION,
+    is given with it. One writer thread owns the connections to the log
+    partitions (see recog.log_partitions; WAL mode, synchronous=NORMAL) and
+    inserts the queued rows with executemany, one transaction per batch and
+    partition that also updates the hourly and daily rollups (see
+    recog.log_store). Expired partitions are dropped by the same thread,
+    at most once an hour. A batch is written once
+    max_batch rows are waiting or the oldest row has waited max_delay
+    seconds. When the queue is full the oldest rows are dropped and counted
+    rather than stalling recognition. Rows still queued are written on
+    flush(), close() and at interpreter exit.
+
+    Methods (RecognitionLogWriter):
+        put(self, row, statement=INSERT) --- (name, confidence, timestamp, camera_id, image_path)
+        put_many(self, rows, statement=INSERT)
+        flush(self, timeout=None)
+        close
+        stats
+"""
+
+
+class RecognitionLogWriter:
+    def __init__(self, partitions, max_batch=500, max_delay=0.5, max_queue=50000, logger=None):
+        """
+        Background writer of recognition log rows
+
+        Args:
+            partitions: LogPartitions the rows are written to
+            max_batch: Rows inserted per transaction at most
+            max_delay: Seconds a row may wait for its batch to fill
+            max_queue: Rows buffered before the oldest are dropped
+            logger: Logger for write errors
+        """
+        self.partitions = partitions
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+        self._rows = collections.deque()
+        self._oldest = None
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._next_retention = time.time() + 3600
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, row, statement=INSERT):
+        """Queue one row, never blocks"""
+        self.put_many((row,), statement)
+
+    def put_many(self, rows, statement=INSERT):
+        """Queue rows, dropping the oldest queued ones if the buffer is full"""
+        with self._cond:
+            if self._closed:
+                self.dropped += len(rows)
+                return
+            first = not self._rows
+            if first:
+                self._oldest = time.time()
+            self._rows.extend((statement, row) for row in rows)
+            overflow = len(self._rows) - self.max_queue
+            if overflow > 0:
+                for _ in range(overflow):
+                    self._rows.popleft()
+                self.dropped += overflow
+            # Wake the writer to start its deadline or write a full batch
+            if first or len(self._rows) >= self.max_batch:
+                self._cond.notify_all()
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                if self._rows:
+                    due = self._oldest + self.max_delay - time.time()
+                    if len(self._rows) >= self.max_batch or due <= 0 or self._closed or self._flush_requested:
+                        break
+                    self._cond.wait(due)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+            count = min(len(self._rows), self.max_batch)
+            batch = [self._rows.popleft() for _ in range(count)]
+            self._oldest = time.time() if self._rows else None
+            if not self._rows:
+                # A flush is served once the queue has drained, not after its first batch
+                self._flush_requested = False
+            self._in_flight = len(batch)
+            return batch
+
+    def _write(self, batch):
+        """Insert a batch, one transaction per partition; returns (written, failed partitions)"""
+        by_partition = collections.defaultdict(list)
+        for statement, row in batch:
+            by_partition[self.partitions.period_start(row[TIME_COLUMN[statement]])].append((statement, row))
+
+        written, failed = 0, 0
+        for start, items in by_partition.items():
+            try:
+                with self.partitions.writer(start) as conn, conn:
+                    # Runs of the same statement, in queue order
+                    for statement, group in itertools.groupby(items, key=lambda item: item[0]):
+                        rows = [row for _, row in group]
+                        conn.executemany(statement, rows)
+                        apply_rollups(conn, rollup_deltas(statement, rows))
+                written += len(items)
+            except Exception as e:
+                failed += 1
+                self.logger.error(f"Error writing {len(items)} recognition log rows: {str(e)}")
+        return written, failed
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            written, failed = self._write(batch)
+            with self._cond:
+                self._in_flight = 0
+                self.written += written
+                self.batches += 1 if written else 0
+                self.errors += failed
+                self._cond.notify_all()
+
+            if time.time() >= self._next_retention:
+                self._next_retention = time.time() + 3600
+                try:
+                    self.partitions.drop_expired()
+                except Exception as e:
+                    self.logger.error(f"Error applying log retention: {str(e)}")
+
+    def flush(self, timeout=None):
+        """
+        Write everything queued so far
+
+        Returns:
+            bool: False if the timeout passed first
+        """
+        with self._cond:
+            if self._rows:
+                self._flush_requested = True
+                self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._rows and not self._in_flight, timeout)
+
+    def close(self):
+        """Flush the queue and stop the writer thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'queued', 'written', 'batches', 'dropped', 'errors', 'mean_batch'}
+        """
+        with self._cond:
+            return {
+                'queued': len(self._rows),
+                'written': self.written,
+                'batches': self.batches,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'mean_batch': self.written / self.batches if self.batches else 0.0,
+            }
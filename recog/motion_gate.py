@@ -0,0 +1,143 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+"""
+    Cheap motion gate in front of face detection.
+
+    Every frame is shrunk to a tiny blurred grayscale thumbnail and compared
+    with the thumbnail of the last frame. When too few pixels changed the
+    scene is considered static and the caller reuses its previous results
+    instead of running the detector. After idle_after seconds without motion
+    a camera enters idle mode, in which frame_interval() asks the capture
+    loop to slow down until motion returns.
+
+    Methods (MotionGate):
+        check(self, camera_id, frame)
+        is_idle(self, camera_id)
+        frame_interval(self, camera_id, active_interval=0.0)
+        stats(self, camera_id=None)
+"""
+
+
+class _GateState:
+    def __init__(self, now):
+        self.thumbnail = None
+        self.last_motion = now
+        self.last_detection = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.idle_frames = 0
+
+
+class MotionGate:
+    def __init__(self,
+                 thumbnail_size=(64, 48),
+                 pixel_threshold=12,
+                 min_changed_fraction=0.005,
+                 max_skip_seconds=2.0,
+                 idle_after=10.0,
+                 idle_interval=0.5):
+        """
+        Skip detection on frames where nothing moved
+
+        Args:
+            thumbnail_size: (width, height) the frame is compared at
+            pixel_threshold: Gray level change that counts a pixel as changed
+            min_changed_fraction: Fraction of changed pixels that is motion
+            max_skip_seconds: Detect at least this often even without motion,
+                              catches slow lighting drift and still faces
+            idle_after: Seconds without motion before entering idle mode
+            idle_interval: Seconds between frames while idle
+        """
+        self.thumbnail_size = thumbnail_size
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.max_skip_seconds = max_skip_seconds
+        self.idle_after = idle_after
+        self.idle_interval = idle_interval
+
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, camera_id, now):
+        state = self._states.get(camera_id)
+        if state is None:
+            state = self._states[camera_id] = _GateState(now)
+        return state
+
+    def _thumbnail(self, frame):
+        tiny = cv2.resize(frame, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        if tiny.ndim == 3:
+            tiny = cv2.cvtColor(tiny, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(tiny, (5, 5), 0)
+
+    def check(self, camera_id, frame):
+        """
+        Compare a frame with the camera's previous one
+
+        Args:
+            camera_id: Camera the frame comes from
+            frame: BGR or grayscale frame (any size)
+
+        Returns:
+            bool: True when the frame should go through detection
+        """
+        thumbnail = self._thumbnail(frame)
+        now = time.time()
+        with self._lock:
+            state = self._state(camera_id, now)
+            state.frames += 1
+            if self.is_idle(camera_id, now):
+                state.idle_frames += 1
+
+            previous, state.thumbnail = state.thumbnail, thumbnail
+            if previous is None or previous.shape != thumbnail.shape:
+                motion = True
+            else:
+                changed = np.count_nonzero(cv2.absdiff(previous, thumbnail) > self.pixel_threshold)
+                motion = changed >= self.min_changed_fraction * thumbnail.size
+
+            if motion:
+                state.last_motion = now
+            elif now - state.last_detection < self.max_skip_seconds:
+                state.skipped += 1
+                return False
+
+            state.last_detection = now
+            return True
+
+    def is_idle(self, camera_id, now=None):
+        """Whether the camera has been static for idle_after seconds"""
+        state = self._states.get(camera_id)
+        if state is None:
+            return False
+        return (now or time.time()) - state.last_motion >= self.idle_after
+
+    def frame_interval(self, camera_id, active_interval=0.0):
+        """Seconds the capture loop should wait before the next frame"""
+        return self.idle_interval if self.is_idle(camera_id) else active_interval
+
+    def stats(self, camera_id=None):
+        """
+        Gate hit rate per camera
+
+        Returns:
+            dict: camera_id -> {'frames', 'skipped', 'hit_rate', 'idle_frames', 'idle'}
+                  or that dict alone when camera_id is given
+        """
+        with self._lock:
+            report = {}
+            for cam, state in self._states.items():
+                report[cam] = {
+                    'frames': state.frames,
+                    'skipped': state.skipped,
+                    'hit_rate': state.skipped / state.frames if state.frames else 0.0,
+                    'idle_frames': state.idle_frames,
+                    'idle': self.is_idle(cam),
+                }
+        if camera_id is not None:
+            return report.get(camera_id, {})
+        return report
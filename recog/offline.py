@@ -0,0 +1,416 @@
+import collections
+import csv
+import glob
+import os
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import cv2
+import face_recognition
+
+from recog.detectors import get_detector
+from recog.gallery import FaceGallery, label_matches
+from recog.log_store import INSERT_SESSION, epoch
+
+"""
+    Offline recognition of recorded video files and image sequences.
+
+    Sources are split into chunks (a time range of a video, or a run of
+    images) that a process pool works on independently. Within a chunk only
+    every `stride`-th frame is recognised. For short strides the frames in
+    between are grabbed: still decoded (the codec needs them), but not
+    converted or copied out. Strides of SEEK_STRIDE frames or more seek to
+    the next sampled frame instead, which decodes only from the preceding
+    keyframe. Nothing is drawn. Each worker gets a copy of the live gallery once, at start-up, and
+    matches locally, with the system's encoding model and the same matching
+    rule as live frames. The camera id of every row is the name of its
+    video file or image directory. Results stream to a CSV file or into the SQLite
+    recognition log as chunks finish (so in chunk completion order, every
+    row carries its source and frame index). With sighting sessions on, the
+    chunks of a source go through one sessionizer in chunk order (a chunk
+    that finishes early waits for its predecessors), so a visit that
+    crosses a chunk boundary stays one session whatever the chunk size.
+    Raw rows are logged only if the system logs them.
+
+    Timestamps in the log are the recording start plus the frame offset.
+    The start defaults to the file's modification time minus its duration
+    (recorders close the file when the recording ends); image files use
+    their own modification time.
+
+    Functions:
+        expand_sources(sources) --- videos and image sequences
+        plan_chunks(sources, stride=5, chunk_seconds=60)
+        camera_id(label) --- camera id of a video path or image sequence label
+        process_chunk(chunk) --- module level, runs in the pool
+        run_offline(face_system, sources, output=None, stride=5, workers=None,
+                    chunk_seconds=60, scale=0.25, upsample=1, start_time=None)
+"""
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+IMAGES_PER_CHUNK = 100
+
+# From this stride on, seeking (decode from the last keyframe) beats grabbing
+# (decode every frame in between)
+SEEK_STRIDE = 30
+
+CSV_FIELDS = ('source', 'frame', 'offset', 'timestamp', 'name', 'confidence',
+              'top', 'right', 'bottom', 'left')
+
+# Gallery and settings of a pool worker, set by _init_worker
+_worker = {}
+
+
+def _is_image(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def expand_sources(sources):
+    """
+    Resolve paths, directories and glob patterns
+
+    Returns:
+        list: ('video', path) and ('images', label, [paths]) entries
+    """
+    expanded = []
+    for source in sources:
+        if os.path.isdir(source):
+            images = sorted(os.path.join(source, name) for name in os.listdir(source) if _is_image(name))
+            if images:
+                expanded.append(('images', source, images))
+            continue
+        matches = sorted(glob.glob(source)) if any(c in source for c in '*?[') else [source]
+        images = [path for path in matches if _is_image(path)]
+        if images:
+            expanded.append(('images', source, images))
+        for path in matches:
+            if not _is_image(path) and os.path.isfile(path):
+                expanded.append(('video', path))
+    return expanded
+
+
+def _video_info(path):
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None, 0
+        return cap.get(cv2.CAP_PROP_FPS) or None, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+
+def plan_chunks(sources, stride=5, chunk_seconds=60):
+    """
+    Split expanded sources into independent pieces of work
+
+    Video chunks start on a multiple of the stride, so the sampled frames
+    are the same however the file is split.
+
+    Returns:
+        list: ('video', path, start, end, fps) and ('images', label, [(index, path)]) chunks
+    """
+    chunks = []
+    for source in sources:
+        if source[0] == 'images':
+            _, label, paths = source
+            sampled = list(enumerate(paths))[::stride]
+            for i in range(0, len(sampled), IMAGES_PER_CHUNK):
+                chunks.append(('images', label, sampled[i:i + IMAGES_PER_CHUNK]))
+            continue
+
+        path = source[1]
+        fps, frames = _video_info(path)
+        if not frames:
+            # Unknown length (some containers): one chunk read to the end
+            chunks.append(('video', path, 0, None, fps))
+            continue
+        size = max(stride, int(chunk_seconds * (fps or 25)) // stride * stride)
+        for start in range(0, frames, size):
+            chunks.append(('video', path, start, min(start + size, frames), fps))
+    return chunks
+
+
+def camera_id(label):
+    """
+    Camera id of a source: the video file name, or the directory name of an image sequence
+
+    Args:
+        label: Video path, or the directory / glob pattern of an image sequence
+    """
+    path = os.path.normpath(label)
+    if any(c in os.path.basename(path) for c in '*?['):
+        path = os.path.dirname(path)
+    return os.path.basename(path) or label
+
+
+def _init_worker(encodings, sq_norms, names, settings):
+    # One worker per core, keep OpenCV from spawning threads of its own
+    cv2.setNumThreads(1)
+    _worker.update(settings)
+    gallery = FaceGallery(dim=encodings.shape[1])
+    gallery.adopt(encodings, sq_norms, names)
+    _worker['gallery'] = gallery
+    _worker['detector'] = get_detector(settings['detector'])
+
+
+def _chunk_frames(chunk, stride):
+    """(frame_index, offset_seconds, path, frame) of the sampled frames"""
+    if chunk[0] == 'images':
+        for index, path in chunk[2]:
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield index, None, path, frame
+        return
+
+    _, path, start, end, fps = chunk
+    cap = cv2.VideoCapture(path)
+    try:
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        while end is None or index < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, index / fps if fps else None, path, frame
+            index += stride
+            if end is not None and index >= end:
+                break
+            if stride >= SEEK_STRIDE:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                continue
+            # Skipped frames: decoded by grab, but not converted
+            for _ in range(stride - 1):
+                if not cap.grab():
+                    return
+    finally:
+        cap.release()
+
+
+def _match(encodings):
+    """(name, confidence) per encoding against the worker's gallery copy, as match_encodings does live"""
+    gallery = _worker['gallery']
+    best_index, best_distance, _, _ = gallery.match(encodings)
+    return label_matches(gallery.names, best_index, best_distance, _worker['tolerance'])
+
+
+def process_chunk(chunk):
+    """
+    Recognise the sampled frames of one chunk (in a pool worker)
+
+    Returns:
+        tuple: (frames processed, rows), rows being dicts with CSV_FIELDS
+               except 'timestamp'
+    """
+    scale, upsample, stride = _worker['scale'], _worker['upsample'], _worker['stride']
+    detector = _worker['detector']
+    frames, rows = 0, []
+    for index, offset, path, frame in _chunk_frames(chunk, stride):
+        frames += 1
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale) if scale != 1.0 else frame
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        locations = detector.detect(rgb, upsample)
+        if not locations:
+            continue
+        encodings = face_recognition.face_encodings(rgb, locations, model=_worker['model'])
+        for (top, right, bottom, left), (name, confidence) in zip(locations, _match(encodings)):
+            rows.append({
+                'source': path,
+                'frame': index,
+                'offset': offset,
+                'name': name,
+                'confidence': confidence,
+                'top': int(round(top / scale)),
+                'right': int(round(right / scale)),
+                'bottom': int(round(bottom / scale)),
+                'left': int(round(left / scale)),
+            })
+    return frames, rows
+
+
+class _SourceSessions:
+    def __init__(self, sessionizer, chunks):
+        """
+        Sighting sessions of recorded sources, fed in chunk order
+
+        Args:
+            sessionizer: Live SightingSessionizer, copied once per source
+            chunks: The planned chunks, in order
+        """
+        self.sessionizer = sessionizer
+        # chunk number -> (source label, position of the chunk within its source)
+        self._position = {}
+        self._total = collections.Counter()
+        for number, chunk in enumerate(chunks):
+            self._position[number] = (chunk[1], self._total[chunk[1]])
+            self._total[chunk[1]] += 1
+        self._next = collections.Counter()
+        self._pending = collections.defaultdict(dict)
+        self._open = {}
+
+    def add(self, number, rows):
+        """
+        Results of one finished chunk (rows may be empty, e.g. a failed chunk)
+
+        Returns:
+            list: Session rows closed by this and any waiting later chunks
+        """
+        source, position = self._position[number]
+        pending = self._pending[source]
+        pending[position] = rows
+        closed = []
+        while self._next[source] in pending:
+            rows = pending.pop(self._next[source])
+            # The live sessions must not see recorded timestamps
+            sessions = self._open.get(source)
+            if sessions is None:
+                sessions = self._open[source] = self.sessionizer.copy()
+            camera = camera_id(source)
+            for row in sorted(rows, key=lambda row: (row['source'], row['frame'])):
+                closed += sessions.observe(row['name'], camera, row['confidence'], row['timestamp'])
+            self._next[source] += 1
+            if self._next[source] == self._total[source]:
+                closed += self._open.pop(source).flush()
+                del self._pending[source]
+        return closed
+
+
+def _recording_start(path, fps, frames, start_time):
+    if start_time is not None:
+        return start_time
+    modified = datetime.fromtimestamp(os.path.getmtime(path))
+    if fps and frames:
+        return modified - timedelta(seconds=frames / fps)
+    return modified
+
+
+def run_offline(face_system,
+                sources,
+                output=None,
+                stride=5,
+                workers=None,
+                chunk_seconds=60,
+                scale=0.25,
+                upsample=1,
+                start_time=None):
+    """
+    Recognise faces in recorded video files and image sequences
+
+    Args:
+        face_system: FaceRecognitionSystem providing gallery, tolerance,
+                     detector and the SQLite log
+        sources: Video files, image directories or glob patterns
+        output: CSV file for the results, None logs them to the database
+        stride: Process every n-th frame (or image)
+        workers: Pool processes (default: CPU count)
+        chunk_seconds: Video seconds per unit of work
+        scale: Resize factor before detection
+        upsample: HOG upsample count
+        start_time: datetime of the first frame, for every video
+
+    Returns:
+        dict: {'sources', 'chunks', 'frames', 'faces', 'recognised',
+               'media_seconds', 'seconds', 'realtime_factor'}
+    """
+    logger = face_system.logger
+    started = time.time()
+    expanded = expand_sources(sources)
+    chunks = plan_chunks(expanded, stride, chunk_seconds)
+    workers = workers or os.cpu_count() or 1
+
+    media_seconds = 0.0
+    starts = {}
+    for chunk in chunks:
+        if chunk[0] == 'video' and chunk[1] not in starts:
+            fps, frames = _video_info(chunk[1])
+            if fps and frames:
+                media_seconds += frames / fps
+            starts[chunk[1]] = _recording_start(chunk[1], fps, frames, start_time)
+    logger.info(f"Offline recognition: {len(expanded)} sources, {len(chunks)} chunks, "
+                f"{media_seconds / 60:.1f} min of video, {workers} workers, stride {stride}")
+
+    with face_system.gallery_lock:
+        encodings, sq_norms, names = face_system.gallery.live_arrays()
+    settings = {
+        'detector': face_system.detector,
+        # Encoded like the registration photos the gallery was built from
+        'model': face_system.model,
+        'tolerance': face_system.tolerance,
+        'scale': scale,
+        'upsample': upsample,
+        'stride': stride,
+    }
+
+    writer = None
+    csv_file = None
+    if output:
+        csv_file = open(output, 'w', newline='')
+        writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+
+    sessions = None
+    if not writer and face_system.sessionizer:
+        sessions = _SourceSessions(face_system.sessionizer, chunks)
+
+    summary = {'sources': len(expanded), 'chunks': len(chunks), 'frames': 0, 'faces': 0, 'recognised': 0}
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=mp.get_context('spawn'),
+                                 initializer=_init_worker,
+                                 initargs=(encodings, sq_norms, names, settings)) as pool:
+            futures = {pool.submit(process_chunk, chunk): number for number, chunk in enumerate(chunks)}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    frames, rows = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing offline chunk: {str(e)}")
+                    if sessions:
+                        # Later chunks of the source must not wait for it
+                        _log_rows(face_system, None, [], sessions.add(futures[future], []))
+                    continue
+                for row in rows:
+                    start = starts.get(row['source'])
+                    if start is not None and row['offset'] is not None:
+                        row['timestamp'] = start + timedelta(seconds=row['offset'])
+                    else:
+                        row['timestamp'] = datetime.fromtimestamp(os.path.getmtime(row['source']))
+                if writer:
+                    writer.writerows(rows)
+                    csv_file.flush()
+                else:
+                    _log_rows(face_system, camera_id(chunks[futures[future]][1]), rows,
+                              sessions.add(futures[future], rows) if sessions else [])
+
+                summary['frames'] += frames
+                summary['faces'] += len(rows)
+                summary['recognised'] += sum(1 for row in rows if row['name'] != "Unknown")
+                logger.info(f"Offline chunk {done}/{len(chunks)}: {summary['frames']} frames, "
+                            f"{summary['faces']} faces so far")
+    finally:
+        if csv_file:
+            csv_file.close()
+
+    summary['media_seconds'] = media_seconds
+    summary['seconds'] = time.time() - started
+    summary['realtime_factor'] = media_seconds / summary['seconds'] if summary['seconds'] else 0.0
+    logger.info(f"Offline recognition done in {summary['seconds']:.0f} s: {summary['frames']} frames, "
+                f"{summary['faces']} faces ({summary['recognised']} recognised), "
+                f"{summary['realtime_factor']:.1f}x real time")
+    return summary
+
+
+def _log_rows(face_system, camera, rows, closed):
+    """Hand one chunk's results (all of one camera) and closed sessions to the log writer, wait until they are written"""
+    if not rows and not closed:
+        return
+    if rows and face_system.raw_logging:
+        face_system.log_writer.put_many([
+            (row['name'], row['confidence'], epoch(row['timestamp']),
+             camera, f"{row['source']}#{row['frame']}")
+            for row in rows])
+    if closed:
+        face_system.log_writer.put_many(closed, INSERT_SESSION)
+    # Offline chunks come in bursts far bigger than the live queue
+    face_system.log_writer.flush()
@@ -0,0 +1,503 @@
+import collections
+import multiprocessing as mp
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import face_recognition
+
+from recog.frame_deadline import LatestFrameReader, LatencyMonitor
+from recog.coarse_to_fine import crop_regions, refine_and_encode, refined_locations
+from recog.detectors import get_detector
+
+"""
+    Staged recognition pipeline around FaceRecognitionSystem.
+
+        capture -> detect (pool) -> track -> encode (pool) -> match -> render
+
+    Stages are threads joined by bounded queues that drop their oldest item
+    when full, so a slow stage sheds stale frames instead of building up
+    latency. The capture stage always takes the freshest camera frame and
+    frames older than the latency budget are dropped before detection.
+    Detection and encoding hold the GIL inside dlib, so by default their
+    workers hand the work to a process pool. The stateful steps
+    (motion gate, tracker, matcher, database logging) stay in single threads
+    and see each camera's frames in order: a frame that was overtaken by a
+    newer one on the parallel detect or encode workers is dropped by the
+    track or match stage that follows them.
+
+    Methods (DropOldestQueue):
+        put(self, item)
+        get(self, timeout=None)
+        close
+
+    Methods (RecognitionPipeline):
+        start
+        read(self, timeout=None) --- latest rendered (frame, results)
+        finished (property)
+        latest_frame
+        stats
+        stop
+"""
+
+
+def detect_faces(rgb_small_frame, detector, upsample=1):
+    """Detection step, module level so a process pool can run it"""
+    return get_detector(detector).detect(rgb_small_frame, upsample)
+
+
+def encode_faces(rgb_small_frame, face_locations):
+    """Encoding step, module level so a process pool can run it"""
+    return face_recognition.face_encodings(rgb_small_frame, face_locations)
+
+
+class DropOldestQueue:
+    def __init__(self, maxsize):
+        """Bounded FIFO whose put() never blocks, the oldest item is dropped instead"""
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.closed = False
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next item, or None on timeout or once the queue is closed and empty"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout):
+                return None
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class FrameItem:
+    __slots__ = ('seq', 'camera_id', 'frame', 'rgb_small_frame', 'captured_at',
+                 'scale', 'upsample', 'static', 'detect', 'face_locations', 'tracks',
+                 'stale', 'stale_boxes', 'cache_keys', 'cached', 'face_encodings', 'results', 'cost')
+
+    def __init__(self, seq, camera_id, frame, captured_at):
+        self.seq = seq
+        self.camera_id = camera_id
+        self.frame = frame
+        self.captured_at = captured_at
+        self.rgb_small_frame = None
+        self.scale = 0.25
+        self.upsample = 1
+        self.static = False
+        self.detect = True
+        self.face_locations = []
+        self.tracks = None
+        self.stale = []
+        # Boxes of the stale faces as encoded (refined in coarse-to-fine mode)
+        self.stale_boxes = []
+        self.cache_keys = None
+        self.cached = []
+        self.face_encodings = []
+        self.results = []
+        # Detection + encoding seconds, fed to the quality governor
+        self.cost = 0.0
+
+
+class _Stage:
+    def __init__(self, name, fn, inbox, outbox, workers=1):
+        self.name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.errors = 0
+        self._running = 0
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self, stop_event, logger):
+        self._running = self.workers
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                args=(stop_event, logger),
+                name=f"pipeline-{self.name}-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self, stop_event, logger):
+        while not stop_event.is_set():
+            item = self.inbox.get(timeout=0.1)
+            if item is None:
+                if self.inbox.closed:
+                    break
+                continue
+            started = time.perf_counter()
+            try:
+                item = self.fn(item)
+            except Exception as e:
+                item = None
+                with self._lock:
+                    self.errors += 1
+                if logger:
+                    logger.error(f"Pipeline stage {self.name} failed: {str(e)}")
+            with self._lock:
+                self.processed += 1
+                self.busy_seconds += time.perf_counter() - started
+            if item is not None and self.outbox is not None:
+                self.outbox.put(item)
+
+        # The last worker to leave passes the end of the stream on
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last and self.outbox is not None:
+            self.outbox.close()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+class RecognitionPipeline:
+    def __init__(self,
+                 face_system,
+                 source=0,
+                 camera_id=None,
+                 detect_workers=2,
+                 encode_workers=2,
+                 use_processes=True,
+                 queue_size=2,
+                 active_interval=0.0,
+                 latency_budget=0.5,
+                 on_result=None):
+        """
+        Run FaceRecognitionSystem as overlapping stages
+
+        Args:
+            face_system: FaceRecognitionSystem providing the gallery, tracker,
+                         motion gate, logging and drawing
+            source: Camera index, video path or an opened cv2.VideoCapture
+            camera_id: Name used for logging (default: camera_<source>)
+            detect_workers: Parallel face detections
+            encode_workers: Parallel face encodings
+            use_processes: Run detection/encoding in a process pool (dlib
+                           holds the GIL); False keeps them in threads
+            queue_size: Capacity of every inter-stage queue
+            active_interval: Minimum seconds between captured frames
+            latency_budget: Frames older than this (seconds since capture)
+                            are dropped before detection, None keeps all
+            on_result: Optional callback(frame, results) from the render stage
+        """
+        self.system = face_system
+        self.source = source
+        self.camera_id = camera_id or (f"camera_{source}" if isinstance(source, (int, str)) else "camera")
+        self.use_processes = use_processes
+        self.active_interval = active_interval
+        self.on_result = on_result
+
+        self.detect_queue = DropOldestQueue(queue_size)
+        self.track_queue = DropOldestQueue(queue_size)
+        self.encode_queue = DropOldestQueue(queue_size)
+        self.match_queue = DropOldestQueue(queue_size)
+        self.render_queue = DropOldestQueue(queue_size)
+        self.output_queue = DropOldestQueue(1)
+
+        self.stages = [
+            _Stage('detect', self._detect, self.detect_queue, self.track_queue, detect_workers),
+            _Stage('track', self._track, self.track_queue, self.encode_queue),
+            _Stage('encode', self._encode, self.encode_queue, self.match_queue, encode_workers),
+            _Stage('match', self._match, self.match_queue, self.render_queue),
+            _Stage('render', self._render, self.render_queue, self.output_queue),
+        ]
+
+        self.latency = LatencyMonitor(latency_budget)
+
+        self.cap = None
+        self.reader = None
+        self.captured = 0
+        self.rendered = 0
+        self._owns_cap = False
+        self._executor = None
+        self._latest_frame = None
+        # Newest frame seq per camera that passed the track / match stage
+        self._tracked_seq = {}
+        self._matched_seq = {}
+        self._stop = threading.Event()
+        self._capture_thread = None
+        self._started_at = None
+        self._lock = threading.Lock()
+
+    # ------------------------------ lifecycle ------------------------------
+
+    def start(self):
+        """Open the source and start every stage"""
+        if self._capture_thread is not None:
+            return
+        if isinstance(self.source, (int, str)):
+            self.cap = cv2.VideoCapture(self.source)
+            self._owns_cap = True
+        else:
+            self.cap = self.source
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Could not open video source {self.source}")
+        # Drains the camera so its buffer never holds stale frames
+        self.reader = LatestFrameReader(self.cap).start()
+
+        if self.use_processes:
+            workers = self.stages[0].workers + self.stages[2].workers
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn'))
+
+        self._stop.clear()
+        self._started_at = time.time()
+        logger = getattr(self.system, 'logger', None)
+        for stage in self.stages:
+            stage.start(self._stop, logger)
+        self._capture_thread = threading.Thread(target=self._capture, name="pipeline-capture", daemon=True)
+        self._capture_thread.start()
+
+    def stop(self):
+        """Stop the stages, release a source opened by the pipeline"""
+        self._stop.set()
+        for queue in (self.detect_queue, self.track_queue, self.encode_queue,
+                      self.match_queue, self.render_queue, self.output_queue):
+            queue.close()
+        if self._capture_thread is not None:
+            self._capture_thread.join(timeout=2)
+            self._capture_thread = None
+        for stage in self.stages:
+            stage.join(timeout=2)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.reader is not None:
+            self.reader.release()
+            self.reader = None
+        if self._owns_cap and self.cap is not None:
+            self.cap.release()
+        self.cap = None
+
+    @property
+    def running(self):
+        return self._capture_thread is not None and not self._stop.is_set()
+
+    @property
+    def finished(self):
+        """True once the source ended and every frame went through"""
+        return self.output_queue.closed and not len(self.output_queue)
+
+    # ------------------------------- stages --------------------------------
+
+    @staticmethod
+    def _overtaken(item, last_seq):
+        """True if a newer frame of the camera already passed; otherwise the item becomes the newest"""
+        if item.seq <= last_seq.get(item.camera_id, -1):
+            return True
+        last_seq[item.camera_id] = item.seq
+        return False
+
+    def _call(self, fn, *args):
+        if self._executor is not None:
+            return self._executor.submit(fn, *args).result()
+        return fn(*args)
+
+    def _capture(self):
+        seq = 0
+        strides = 0
+        while not self._stop.is_set():
+            ret, frame, captured_at = self.reader.read(timeout=0.5)
+            if not ret:
+                if self.reader.ended:
+                    break
+                continue
+            with self._lock:
+                self._latest_frame = frame
+                self.captured += 1
+
+            item = FrameItem(seq, self.camera_id, frame, captured_at)
+            seq += 1
+            item.scale, item.upsample, stride = self.system._quality(self.camera_id)
+            small_frame = cv2.resize(frame, (0, 0), fx=item.scale, fy=item.scale)
+            # The gate and the tracker's detect cadence need frames in order
+            gate = self.system.motion_gate
+            item.static = bool(gate) and not gate.check(self.camera_id, small_frame)
+            if not item.static:
+                tracker = self.system.tracker
+                if tracker:
+                    item.detect = tracker.should_detect(self.camera_id, stride)
+                else:
+                    # Without a tracker, frames between detections reuse the last faces
+                    item.static = strides % stride != 0
+                    strides += 1
+            if not item.static:
+                item.rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            self.detect_queue.put(item)
+
+            delay = self.system.frame_interval(self.camera_id, self.active_interval)
+            if delay:
+                self._stop.wait(delay)
+        self.detect_queue.close()
+
+    def _detect(self, item):
+        # Past the latency budget: a fresher frame is already on its way
+        if self.latency.expired(item.captured_at):
+            return None
+        if not item.static and item.detect:
+            started = time.perf_counter()
+            item.face_locations = self._call(detect_faces, item.rgb_small_frame,
+                                             self.system.detector, item.upsample)
+            item.cost += time.perf_counter() - started
+        return item
+
+    def _track(self, item):
+        # Parallel detect workers can reorder frames; an overtaken frame is stale, drop it
+        if self._overtaken(item, self._tracked_seq):
+            return None
+        if item.static:
+            return item
+
+        tracker = self.system.tracker
+        if not tracker:
+            item.stale = item.face_locations
+        elif item.detect:
+            item.tracks = tracker.update(item.camera_id, item.face_locations, item.rgb_small_frame)
+        else:
+            item.tracks = tracker.predict(item.camera_id, item.rgb_small_frame)
+        if item.tracks is not None:
+            item.stale = [track for track in item.tracks if tracker.needs_encoding(track)]
+        return item
+
+    def _encode(self, item):
+        if item.stale:
+            boxes = [track.box for track in item.stale] if item.tracks is not None else item.stale
+            started = time.perf_counter()
+            item.cache_keys, item.cached = self.system._cache_lookup(
+                item.rgb_small_frame, boxes, item.camera_id)
+            misses = [i for i, encoding in enumerate(item.cached) if encoding is None]
+            item.stale_boxes = list(boxes)
+            boxes = [boxes[i] for i in misses]
+            if not boxes:
+                encoded = []
+            elif self.system.coarse_to_fine:
+                # Crops are cut here so only they travel to the pool
+                regions, origins = crop_regions(item.frame, boxes, item.scale)
+                refined = self._call(refine_and_encode, regions, self.system.detector)
+                boxes = refined_locations(refined, origins, item.scale)
+                encoded = [encoding for _, encoding, _ in refined]
+            elif self.system.batch_encoder is not None:
+                # Batched with the frames of the other encode workers and cameras
+                encoded = self.system.batch_encoder.encode(item.rgb_small_frame, boxes)
+            else:
+                encoded = self._call(encode_faces, item.rgb_small_frame, boxes)
+            item.face_encodings = list(item.cached)
+            for i, box, encoding in zip(misses, boxes, encoded):
+                item.stale_boxes[i] = box
+                item.face_encodings[i] = encoding
+            self.system._cache_store(item.cache_keys, item.face_encodings, item.cached)
+            item.cost += time.perf_counter() - started
+        return item
+
+    def _match(self, item):
+        # Same for the encode workers: never show (or assign tracks from) an older frame
+        if self._overtaken(item, self._matched_seq):
+            return None
+        system = self.system
+        if item.static:
+            with system.camera_lock(item.camera_id):
+                face_locations, matches = system._last_faces.get(item.camera_id, ([], []))
+        else:
+            matches = system.match_encodings(item.face_encodings)
+            if item.tracks is None:
+                # Without a tracker every face was encoded
+                face_locations = item.stale_boxes
+            else:
+                for track, (name, confidence) in zip(item.stale, matches):
+                    system.tracker.assign(track, name, confidence)
+                refined = dict(zip(item.stale, item.stale_boxes))
+                face_locations = [refined.get(track, track.box) for track in item.tracks]
+                # A track whose first encode is still in flight shows as Unknown
+                matches = [(track.name or "Unknown", track.confidence) for track in item.tracks]
+            # Shared with process_frame calls on the same system
+            with system.camera_lock(item.camera_id):
+                system._last_faces[item.camera_id] = (face_locations, matches)
+                # Detection and encoding run on parallel workers
+                parallel = min(self.stages[0].workers, self.stages[2].workers)
+                system._record_quality(item.camera_id, item.cost / max(1, parallel))
+
+        item.results = system._build_results(face_locations, matches, item.camera_id, item.scale)
+        system._publish_results(item.results)
+        return item
+
+    def _render(self, item):
+        self.system._annotate_frame(item.frame, item.results)
+        self.latency.record(item.captured_at)
+        with self._lock:
+            self.rendered += 1
+        if self.on_result:
+            self.on_result(item.frame, item.results)
+        return item
+
+    # ------------------------------- output --------------------------------
+
+    def read(self, timeout=None):
+        """
+        Most recent rendered frame
+
+        Returns:
+            tuple: (frame, results), or (None, []) when nothing new is ready
+        """
+        item = self.output_queue.get(timeout=timeout)
+        if item is None:
+            return None, []
+        return item.frame, item.results
+
+    def latest_frame(self):
+        """Copy of the last captured (unannotated) frame, or None"""
+        with self._lock:
+            return None if self._latest_frame is None else self._latest_frame.copy()
+
+    def stats(self):
+        """
+        Queue depth, drops and throughput of every stage
+
+        Returns:
+            dict: {'capture_fps', 'render_fps', 'latency' (LatencyMonitor.stats),
+                   'camera_overwritten', 'encoding_cache' (EncodingCache.stats), 'stages': {name: {'queue', 'dropped', 'processed', 'fps',
+                                     'busy_ms', 'errors'}}}
+        """
+        elapsed = max(time.time() - (self._started_at or time.time()), 1e-9)
+        with self._lock:
+            report = {
+                'capture_fps': self.captured / elapsed,
+                'render_fps': self.rendered / elapsed,
+                'latency': self.latency.stats(),
+                'camera_overwritten': self.reader.overwritten if self.reader else 0,
+                'encoding_cache': self.system.get_cache_stats(),
+                'stages': {},
+            }
+        for stage in self.stages:
+            with stage._lock:
+                report['stages'][stage.name] = {
+                    'queue': len(stage.inbox),
+                    'dropped': stage.inbox.dropped,
+                    'processed': stage.processed,
+                    'fps': stage.processed / elapsed,
+                    'busy_ms': 1000 * stage.busy_seconds / stage.processed if stage.processed else 0.0,
+                    'errors': stage.errors,
+                }
+        return report
@@ -0,0 +1,182 @@
+import logging
+import threading
+
+"""
+    Closed-loop quality governor.
+
+    Every camera sits on a rung of a quality ladder. A rung fixes the resize
+    factor of the frame, the HOG upsample count and the detection stride
+    (detect on every k-th frame, the tracker covers the rest). The governor
+    averages the measured processing time per frame over a window and
+    compares it with the budget of the target FPS:
+
+        slower than the budget (+ margin)      -> one rung down right away
+        faster than up_threshold of the budget -> one rung up after
+                                                  up_patience windows
+
+    The two thresholds and the patience are the hysteresis. In addition,
+    a rung that was left because it was too slow is not tried again for
+    a while (the backoff doubles every time that happens), so the settings
+    do not oscillate. Every change is logged.
+
+    Methods (QualityGovernor):
+        settings(self, camera_id) --- (scale, upsample, stride)
+        record(self, camera_id, seconds) --- True when the settings changed
+        level(self, camera_id)
+        stats
+"""
+
+# (resize factor, upsample count, detection stride), best quality first
+QUALITY_LADDER = (
+    (0.5, 1, 1),
+    (0.5, 0, 1),
+    (0.33, 1, 1),
+    (0.25, 1, 1),   # the historical fixed setting
+    (0.25, 1, 2),
+    (0.25, 0, 2),
+    (0.25, 0, 3),
+    (0.2, 0, 4),
+)
+DEFAULT_LEVEL = 3
+
+
+class _CameraQuality:
+    def __init__(self, level):
+        self.level = level
+        self.samples = []
+        self.fast_windows = 0
+        self.skip_window = False
+        # rung -> windows to wait before trying it again
+        self.blocked = {}
+        self.backoff = {}
+        self.changes = 0
+
+
+class QualityGovernor:
+    def __init__(self,
+                 target_fps=10.0,
+                 ladder=QUALITY_LADDER,
+                 start_level=DEFAULT_LEVEL,
+                 window=15,
+                 down_margin=0.1,
+                 up_threshold=0.6,
+                 up_patience=3,
+                 logger=None):
+        """
+        Tune resize factor, upsampling and detection stride per camera
+
+        Args:
+            target_fps: Frames per second every camera should sustain
+            ladder: Rungs of (scale, upsample, stride), best quality first
+            start_level: Rung a new camera starts on
+            window: Frames averaged before each decision
+            down_margin: Tolerated overshoot of the frame budget
+            up_threshold: Share of the budget below which quality is raised
+            up_patience: Consecutive fast windows needed to raise quality
+            logger: Logger for the decisions
+        """
+        self.target_fps = target_fps
+        self.ladder = ladder
+        self.start_level = min(start_level, len(ladder) - 1)
+        self.window = window
+        self.down_margin = down_margin
+        self.up_threshold = up_threshold
+        self.up_patience = up_patience
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self):
+        """Processing seconds available per frame"""
+        return 1.0 / self.target_fps
+
+    def _camera(self, camera_id):
+        state = self._cameras.get(camera_id)
+        if state is None:
+            state = self._cameras[camera_id] = _CameraQuality(self.start_level)
+        return state
+
+    def settings(self, camera_id):
+        """(scale, upsample, stride) the camera's next frame should use"""
+        with self._lock:
+            return self.ladder[self._camera(camera_id).level]
+
+    def level(self, camera_id):
+        with self._lock:
+            return self._camera(camera_id).level
+
+    def _describe(self, level):
+        scale, upsample, stride = self.ladder[level]
+        return f"level {level} ({scale}x, upsample {upsample}, detect every {stride})"
+
+    def record(self, camera_id, seconds):
+        """
+        Add the processing time of one frame and decide once a window is full
+
+        Returns:
+            bool: True when the camera's settings changed
+        """
+        with self._lock:
+            state = self._camera(camera_id)
+            state.samples.append(seconds)
+            if len(state.samples) < self.window:
+                return False
+
+            mean = sum(state.samples) / len(state.samples)
+            state.samples = []
+            for rung in list(state.blocked):
+                state.blocked[rung] -= 1
+                if state.blocked[rung] <= 0:
+                    del state.blocked[rung]
+
+            if state.skip_window:
+                # The first window after a change still mixes both settings
+                state.skip_window = False
+                return False
+
+            budget = self.budget
+            old = state.level
+            if mean > budget * (1 + self.down_margin) and old < len(self.ladder) - 1:
+                new = old + 1
+                state.fast_windows = 0
+                # The rung we leave was too slow, back off before retrying it
+                backoff = min(state.backoff.get(old, 2) * 2, 64)
+                state.backoff[old] = backoff
+                state.blocked[old] = backoff
+                reason = f"{mean * 1000:.0f} ms per frame > {budget * 1000:.0f} ms budget"
+            elif mean < budget * self.up_threshold and old > 0:
+                state.fast_windows += 1
+                if state.fast_windows < self.up_patience or (old - 1) in state.blocked:
+                    return False
+                new = old - 1
+                state.fast_windows = 0
+                reason = (f"{mean * 1000:.0f} ms per frame < "
+                          f"{budget * self.up_threshold * 1000:.0f} ms for {self.up_patience} windows")
+            else:
+                state.fast_windows = 0
+                return False
+
+            state.level = new
+            state.changes += 1
+            state.skip_window = True
+
+        self.logger.info(f"Quality governor {camera_id}: {self._describe(old)} -> "
+                         f"{self._describe(new)}, {reason}")
+        return True
+
+    def stats(self):
+        """camera_id -> {'level', 'scale', 'upsample', 'stride', 'changes'}"""
+        with self._lock:
+            report = {}
+            for camera_id, state in self._cameras.items():
+                scale, upsample, stride = self.ladder[state.level]
+                report[camera_id] = {
+                    'level': state.level,
+                    'scale': scale,
+                    'upsample': upsample,
+                    'stride': stride,
+                    'changes': state.changes,
+                }
+            return report
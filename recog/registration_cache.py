@@ -0,0 +1,176 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+"""
+    Content-addressed cache of registration encodings.
+
+    Enrolling a photo means decoding it, finding the face and running the
+    encoder. The result only depends on the image bytes and the encoder
+    settings, so it is stored in SQLite under
+
+        (sha256 of the file content, settings key)
+
+    together with the face box and the outcome ('ok', 'no_face', ...).
+    Re-enrolling a photo or rebuilding the gallery from the photo archive
+    then only hashes the files. The settings key is a canonical JSON of
+    everything that changes the encoding (detection model, jitters, resize
+    limit, face choice): changing any of them simply stops matching the
+    old rows, and prune() drops them.
+
+    Methods (RegistrationCache):
+        get(self, content_hash, settings) --- (status, box, encoding) or None
+        get_many(self, content_hashes, settings) --- {hash: (status, box, encoding)}
+        put(self, content_hash, settings, status, box, encoding)
+        put_many(self, settings, entries)
+        prune(self, keep_settings)
+        stats
+        close
+    Functions:
+        file_hash(path) --- sha256 hex digest
+        settings_key(**settings)
+"""
+
+ENCODER_VERSION = 'dlib_face_recognition_resnet_model_v1'
+
+_CHUNK = 1024 * 1024
+
+
+def file_hash(path):
+    """sha256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_key(**settings):
+    """Canonical key of the encoder settings, including the encoder itself"""
+    settings.setdefault('encoder', ENCODER_VERSION)
+    return json.dumps(settings, sort_keys=True, separators=(',', ':'))
+
+
+class RegistrationCache:
+    def __init__(self, path='registration_cache.db'):
+        """
+        Persistent encoding cache for registration images
+
+        Args:
+            path: SQLite file of the cache
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS registration_encodings (
+                content_hash TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                status TEXT NOT NULL,
+                box TEXT,
+                encoding BLOB,
+                created REAL,
+                PRIMARY KEY (content_hash, settings)
+            )
+        ''')
+        self.conn.commit()
+
+    @staticmethod
+    def _decode(row):
+        status, box, encoding = row
+        return (status,
+                tuple(json.loads(box)) if box else None,
+                np.frombuffer(encoding, dtype='<f8').copy() if encoding is not None else None)
+
+    def get(self, content_hash, settings):
+        """
+        Look up one image
+
+        Returns:
+            tuple: (status, box, encoding) or None on a miss
+        """
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT status, box, encoding FROM registration_encodings '
+                'WHERE content_hash = ? AND settings = ?', (content_hash, settings)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self._decode(row)
+
+    def get_many(self, content_hashes, settings):
+        """
+        Look up many images in a few queries
+
+        Returns:
+            dict: content_hash -> (status, box, encoding) for the hits
+        """
+        content_hashes = list(dict.fromkeys(content_hashes))
+        found = {}
+        with self._lock:
+            for start in range(0, len(content_hashes), 500):
+                chunk = content_hashes[start:start + 500]
+                rows = self.conn.execute(
+                    'SELECT content_hash, status, box, encoding FROM registration_encodings '
+                    f'WHERE settings = ? AND content_hash IN ({",".join("?" * len(chunk))})',
+                    [settings] + chunk).fetchall()
+                for content_hash, *row in rows:
+                    found[content_hash] = row
+            self.hits += len(found)
+            self.misses += len(content_hashes) - len(found)
+        return {content_hash: self._decode(row) for content_hash, row in found.items()}
+
+    def put(self, content_hash, settings, status, box, encoding):
+        """Store the outcome of encoding one image"""
+        self.put_many(settings, [(content_hash, status, box, encoding)])
+
+    def put_many(self, settings, entries):
+        """Store (content_hash, status, box, encoding) entries in one transaction"""
+        now = time.time()
+        rows = [(content_hash, settings, status,
+                 json.dumps([int(v) for v in box]) if box is not None else None,
+                 np.asarray(encoding, dtype='<f8').tobytes() if encoding is not None else None,
+                 now)
+                for content_hash, status, box, encoding in entries]
+        with self._lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO registration_encodings '
+                '(content_hash, settings, status, box, encoding, created) VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self.conn.commit()
+
+    def prune(self, keep_settings):
+        """Drop the entries of every other settings key, returns the number removed"""
+        if isinstance(keep_settings, str):
+            keep_settings = [keep_settings]
+        with self._lock:
+            cursor = self.conn.execute(
+                f'DELETE FROM registration_encodings WHERE settings NOT IN ({",".join("?" * len(keep_settings))})',
+                list(keep_settings))
+            self.conn.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'entries', 'hits', 'misses', 'hit_rate'}
+        """
+        with self._lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM registration_encodings').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,311 @@
+import atexit
+import itertools
+import multiprocessing as mp
+import os
+import struct
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+
+"""
+    Gallery served from multiprocessing.shared_memory to a pool of matcher
+    processes. Every worker maps the block read-only and scans its own shard;
+    the parent merges the per-shard top-k.
+
+    Block layout (one block per gallery generation):
+        header    magic u64, generation u64, capacity u64, dim u64
+        encodings float32 (capacity x dim)
+        sq_norms  float32 (capacity)
+        alive     uint8   (capacity)
+
+    Rows are only ever appended inside a generation and tombstones only
+    clear alive flags in place (a single byte per row). Anything that
+    reorders or drops rows (compaction, growth past capacity) publishes a
+    complete new block. Each task carries the block name and the row count
+    it may read, so a worker never sees a half-written gallery.
+
+    Methods (SharedMemoryIndex):
+        attach(self, gallery)
+        start
+        topk(self, face_encodings, k=2)
+        search(self, face_encodings)
+        close
+"""
+
+_MAGIC = 0x46414345_47414c31  # "FACEGAL1"
+_HEADER = struct.Struct('<QQQQ')
+_HEADER_SIZE = 64
+_BLAS_THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+def _layout(capacity, dim):
+    encodings_size = capacity * dim * 4
+    norms_size = capacity * 4
+    return {
+        'encodings': (_HEADER_SIZE, encodings_size),
+        'sq_norms': (_HEADER_SIZE + encodings_size, norms_size),
+        'alive': (_HEADER_SIZE + encodings_size + norms_size, capacity),
+        'total': _HEADER_SIZE + encodings_size + norms_size + capacity,
+    }
+
+
+def _views(shm, capacity, dim):
+    layout = _layout(capacity, dim)
+    buf = shm.buf
+    offset, _ = layout['encodings']
+    encodings = np.ndarray((capacity, dim), dtype=np.float32, buffer=buf, offset=offset)
+    offset, _ = layout['sq_norms']
+    sq_norms = np.ndarray((capacity,), dtype=np.float32, buffer=buf, offset=offset)
+    offset, _ = layout['alive']
+    alive = np.ndarray((capacity,), dtype=np.bool_, buffer=buf, offset=offset)
+    return encodings, sq_norms, alive
+
+
+def _attach(name):
+    """
+    Attach to an existing block
+
+    Spawned workers share the parent's resource tracker, so the parent's
+    unlink stays the only cleanup of a block.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no `track` argument
+        return shared_memory.SharedMemory(name=name)
+
+
+def _match_shard(views, shard_id, n_shards, count, queries, k):
+    """Top-k rows of one shard, as global row indices and squared distances"""
+    encodings, sq_norms, alive = views
+    start = count * shard_id // n_shards
+    end = count * (shard_id + 1) // n_shards
+    if end <= start:
+        return None, None
+
+    sq = queries @ encodings[start:end].T
+    sq *= -2.0
+    sq += sq_norms[start:end]
+    sq += np.einsum('ij,ij->i', queries, queries)[:, None]
+    np.maximum(sq, 0.0, out=sq)
+    sq[:, ~alive[start:end]] = np.inf
+
+    kk = min(k, end - start)
+    top = np.argpartition(sq, kk - 1, axis=1)[:, :kk]
+    return top + start, np.take_along_axis(sq, top, axis=1)
+
+
+def _matcher_worker(shard_id, n_shards, tasks, results):
+    """Matcher process: map the current block and answer top-k for its shard"""
+    shm = None
+    block_name = None
+    views = None
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, name, capacity, dim, count, queries, k = task
+        try:
+            if name != block_name:
+                # A new generation was published, drop the old mapping
+                views = None
+                if shm is not None:
+                    shm.close()
+                    shm = None
+                block_name = None
+                shm = _attach(name)
+                magic, _, block_capacity, block_dim = _HEADER.unpack_from(shm.buf, 0)
+                if magic != _MAGIC or block_capacity != capacity or block_dim != dim:
+                    raise ValueError(f"Unexpected shared gallery block {name}")
+                views = _views(shm, capacity, dim)
+                block_name = name
+
+            top, top_sq = _match_shard(views, shard_id, n_shards, count, queries, k)
+            results.put((task_id, shard_id, top, top_sq, None))
+        except Exception as e:
+            results.put((task_id, shard_id, None, None, str(e)))
+
+    views = None
+    if shm is not None:
+        shm.close()
+
+
+class SharedMemoryIndex:
+    def __init__(self, n_workers=None, min_shared_size=10000, prefix=None):
+        """
+        Gallery index that matches on a pool of processes over shared memory
+
+        Args:
+            n_workers: Matcher processes, one gallery shard each (default: CPU count)
+            min_shared_size: Smaller galleries are matched in-process
+            prefix: Name prefix of the shared memory blocks, unique per index by default
+        """
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.min_shared_size = min_shared_size
+        self.prefix = prefix or f"facegal_{uuid.uuid4().hex[:12]}"
+
+        self.gallery = None
+        self._workers = []
+        self._tasks = []
+        self._results = None
+        self._task_ids = itertools.count()
+        self._block_ids = itertools.count(1)
+
+        self._shm = None
+        self._views = None
+        self._capacity = 0
+        self._count = 0
+        self._generation = None
+        self._dead = 0
+
+    def attach(self, gallery):
+        self.gallery = gallery
+        self._generation = None
+
+    def start(self):
+        """Spawn the matcher processes"""
+        if self._workers:
+            return
+        ctx = mp.get_context('spawn')
+        self._results = ctx.Queue()
+
+        # One BLAS thread per worker, the pool itself provides the parallelism
+        saved_env = {var: os.environ.get(var) for var in _BLAS_THREAD_VARS}
+        os.environ.update({var: '1' for var in _BLAS_THREAD_VARS})
+        try:
+            for shard_id in range(self.n_workers):
+                tasks = ctx.Queue()
+                worker = ctx.Process(
+                    target=_matcher_worker,
+                    args=(shard_id, self.n_workers, tasks, self._results),
+                    daemon=True
+                )
+                worker.start()
+                self._tasks.append(tasks)
+                self._workers.append(worker)
+        finally:
+            for var, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+        atexit.register(self.close)
+
+    # ----------------------------- publishing -----------------------------
+
+    def _publish(self):
+        """Copy the gallery into a fresh block; the old block is unlinked"""
+        gallery = self.gallery
+        size = len(gallery)
+        capacity = max(64, 1 << (size - 1).bit_length()) if size else 64
+        generation = next(self._block_ids)
+        name = f"{self.prefix}_{generation}"
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_layout(capacity, gallery.dim)['total'])
+        encodings, sq_norms, alive = _views(shm, capacity, gallery.dim)
+        encodings[:size] = gallery.encodings
+        sq_norms[:size] = gallery.sq_norms
+        alive[:size] = gallery.alive
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, generation, capacity, gallery.dim)
+
+        old = self._shm
+        self._shm, self._views = shm, (encodings, sq_norms, alive)
+        self._capacity, self._count = capacity, size
+        self._generation, self._dead = gallery.generation, gallery.n_dead
+        if old is not None:
+            old.close()
+            old.unlink()
+
+    def _sync(self):
+        gallery = self.gallery
+        size = len(gallery)
+        if (self._shm is None
+                or gallery.generation != self._generation
+                or size > self._capacity
+                or size < self._count):
+            self._publish()
+            return
+        encodings, sq_norms, alive = self._views
+        if gallery.n_dead != self._dead:
+            # Tombstones: flip the flags of the published rows in place
+            alive[:self._count] = gallery.alive[:self._count]
+            self._dead = gallery.n_dead
+        if size > self._count:
+            # Append in place; workers only read up to the count in their task
+            encodings[self._count:size] = gallery.encodings[self._count:size]
+            sq_norms[self._count:size] = gallery.sq_norms[self._count:size]
+            alive[self._count:size] = gallery.alive[self._count:size]
+            self._count = size
+
+    # ------------------------------ matching ------------------------------
+
+    def topk(self, face_encodings, k=2):
+        """
+        k nearest gallery rows for every query, merged over all shards
+
+        Returns:
+            tuple: ((Q, k) row indices, (Q, k) distances), best first,
+                   -1 / inf where fewer than k rows exist
+        """
+        gallery = self.gallery
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, gallery.dim)
+        n_queries = queries.shape[0]
+
+        self.start()
+        self._sync()
+        task_id = next(self._task_ids)
+        task = (task_id, self._shm.name, self._capacity, gallery.dim, self._count, queries, k)
+        for tasks in self._tasks:
+            tasks.put(task)
+
+        indices, sq_distances = [], []
+        pending = len(self._tasks)
+        while pending:
+            result_id, shard_id, top, top_sq, error = self._results.get()
+            if result_id != task_id:
+                continue  # answer to an abandoned call
+            pending -= 1
+            if error:
+                raise RuntimeError(f"Matcher shard {shard_id} failed: {error}")
+            if top is not None:
+                indices.append(top)
+                sq_distances.append(top_sq)
+
+        merged_index = np.full((n_queries, k), -1, dtype=np.int64)
+        merged_distance = np.full((n_queries, k), np.inf, dtype=np.float32)
+        if not indices:
+            return merged_index, merged_distance
+
+        indices = np.concatenate(indices, axis=1)
+        sq_distances = np.concatenate(sq_distances, axis=1)
+        order = np.argsort(sq_distances, axis=1)[:, :k]
+        kk = order.shape[1]
+        merged_index[:, :kk] = np.take_along_axis(indices, order, axis=1)
+        merged_distance[:, :kk] = np.sqrt(np.take_along_axis(sq_distances, order, axis=1))
+        merged_index[np.isinf(merged_distance)] = -1
+        return merged_index, merged_distance
+
+    def search(self, face_encodings):
+        """Same contract as FaceGallery.match"""
+        if len(self.gallery) < self.min_shared_size or len(face_encodings) == 0:
+            return self.gallery.match(face_encodings)
+
+        index, distance = self.topk(face_encodings, k=2)
+        return index[:, 0], distance[:, 0], index[:, 1], distance[:, 1]
+
+    def close(self):
+        """Stop the workers and release the shared memory"""
+        atexit.unregister(self.close)
+        for tasks in self._tasks:
+            tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._tasks, self._workers = [], []
+
+        self._views = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
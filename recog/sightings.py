@@ -0,0 +1,138 @@
+import threading
+from datetime import datetime, timedelta
+
+from recog.log_store import epoch
+
+"""
+    Sighting sessions: one log row per visit instead of one per frame.
+
+    Consecutive sightings of the same name on the same camera belong to one
+    session as long as no more than `gap` seconds pass between two of them.
+    A session records first and last seen, the number of frames it was seen
+    in and its maximum and average confidence. It is closed (and returned
+    for writing) once the gap has passed without a sighting, when it has
+    been open for `max_duration` seconds (someone at a desk all day still
+    gets a row every few minutes) or on flush.
+
+    Sightings of one frame share their timestamp, so several "Unknown"
+    faces in one frame count as one frame of the camera's Unknown session.
+
+    Session rows are (name, camera_id, first_seen, last_seen, frames,
+    max_confidence, avg_confidence) with epoch second timestamps, the
+    column order of recog.log_store.INSERT_SESSION.
+
+    Methods (SightingSessionizer):
+        observe(self, name, camera_id, confidence, timestamp) --- closed session rows
+        expire(self, now=None) --- rows of sessions past their gap
+        flush --- rows of every open session
+        copy --- empty sessionizer with the same settings
+        stats
+"""
+
+
+class Session:
+    __slots__ = ('name', 'camera_id', 'first_seen', 'last_seen', 'frames',
+                 'max_confidence', 'confidence_sum', 'frame_confidence')
+
+    def __init__(self, name, camera_id, timestamp):
+        self.name = name
+        self.camera_id = camera_id
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.frames = 0
+        self.max_confidence = 0.0
+        self.confidence_sum = 0.0
+        # Best confidence of the last frame, one value per frame is averaged
+        self.frame_confidence = 0.0
+
+    def row(self):
+        return (self.name, self.camera_id, epoch(self.first_seen), epoch(self.last_seen), self.frames,
+                self.max_confidence, self.confidence_sum / self.frames if self.frames else 0.0)
+
+
+class SightingSessionizer:
+    def __init__(self, gap=5.0, max_duration=300.0):
+        """
+        Collapse per-frame sightings into sessions
+
+        Args:
+            gap: Seconds without a sighting that end a session
+            max_duration: Seconds after which an open session is written
+                          and a new one started (None: never)
+        """
+        self.gap = timedelta(seconds=gap)
+        self.max_duration = timedelta(seconds=max_duration) if max_duration else None
+        self.sightings = 0
+        self.closed = 0
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, camera_id, confidence, timestamp):
+        """
+        Add one sighting
+
+        Returns:
+            list: Rows of the sessions this sighting closed (usually none)
+        """
+        closed = []
+        key = (camera_id, name)
+        with self._lock:
+            self.sightings += 1
+            session = self._open.get(key)
+            if session is not None and (
+                    timestamp - session.last_seen > self.gap or
+                    (self.max_duration and timestamp - session.first_seen >= self.max_duration)):
+                closed.append(self._open.pop(key).row())
+                session = None
+            if session is None:
+                session = self._open[key] = Session(name, camera_id, timestamp)
+
+            confidence = float(confidence)
+            if timestamp != session.last_seen or not session.frames:
+                # First face of its frame in this session
+                session.frames += 1
+                session.confidence_sum += confidence
+                session.frame_confidence = confidence
+            elif confidence > session.frame_confidence:
+                # Another face of the same frame: keep the frame's best
+                session.confidence_sum += confidence - session.frame_confidence
+                session.frame_confidence = confidence
+            session.last_seen = max(session.last_seen, timestamp)
+            session.max_confidence = max(session.max_confidence, confidence)
+            self.closed += len(closed)
+        return closed
+
+    def expire(self, now=None):
+        """Close the sessions whose gap has passed, returns their rows"""
+        now = now or datetime.now()
+        with self._lock:
+            keys = [key for key, session in self._open.items() if now - session.last_seen > self.gap]
+            closed = [self._open.pop(key).row() for key in keys]
+            self.closed += len(closed)
+        return closed
+
+    def flush(self):
+        """Close every open session, returns their rows"""
+        with self._lock:
+            closed = [session.row() for session in self._open.values()]
+            self._open.clear()
+            self.closed += len(closed)
+        return closed
+
+    def copy(self):
+        """Empty sessionizer with the same gap and maximum duration"""
+        return SightingSessionizer(self.gap.total_seconds(),
+                                   self.max_duration.total_seconds() if self.max_duration else None)
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'sightings', 'open', 'closed', 'rows_saved'}
+        """
+        with self._lock:
+            return {
+                'sightings': self.sightings,
+                'open': len(self._open),
+                'closed': self.closed,
+                'rows_saved': self.sightings - self.closed - len(self._open),
+            }
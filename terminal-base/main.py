@@ -1,4 +1,16 @@
+import argparse
+import csv
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+# The recognition engine (recog/) is shared by every app, it lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from recog.face_recog import FaceRecognitionSystem
+from recog.log_partitions import LogPartitions
+from recog.log_query import query_history, fetch_page
 from recog.face_regis import capture_and_register_face
 from recog.available_cam import list_available_cameras
 
@@ -58,6 +70,158 @@ def registration_menu():
             break
         else:
             print("Invalid choice")
+    
+    face_system.close()
+
+def run_daemon(config_path):
+    """Headless recognition of every camera in a config file"""
+    from recog.camera_daemon import daemon_from_config
+    
+    daemon = daemon_from_config(config_path)
+    try:
+        daemon.run()
+    finally:
+        daemon.system.close()
+
+def run_batch(args):
+    """Offline recognition of recorded footage"""
+    face_system = FaceRecognitionSystem(
+        tolerance=0.43,
+        model='hog',
+        detector=args.detector,
+        enable_logging=True
+    )
+    summary = face_system.run_offline_recognition(
+        args.sources,
+        output=args.output,
+        stride=args.stride,
+        workers=args.workers,
+        chunk_seconds=args.chunk_seconds,
+        scale=args.scale,
+        upsample=args.upsample
+    )
+    face_system.close()
+    print(f"{summary['frames']} frames, {summary['faces']} faces "
+          f"({summary['recognised']} recognised) in {summary['seconds']:.0f} s")
+
+def run_enroll(args):
+    """Bulk enrolment of a photo directory"""
+    face_system = FaceRecognitionSystem(
+        tolerance=0.43,
+        model='hog',
+        enable_logging=True
+    )
+    summary = face_system.bulk_enroll(
+        args.directory,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_side=args.max_side,
+        checkpoint=args.checkpoint
+    )
+    face_system.close()
+    print(f"{summary['enrolled']} enrolled, {summary['skipped']} skipped, "
+          f"{summary['no_face'] + summary['unreadable']} failed")
+
+def parse_time(text):
+    """ISO date/time, or a time ago such as 30m, 2h or 7d"""
+    match = re.fullmatch(r'(\d+)([smhdw])', text.strip())
+    if match:
+        unit = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}[match.group(2)]
+        return datetime.now() - timedelta(**{unit: int(match.group(1))})
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time {text!r}, use e.g. 2026-10-18T08:00 or 2h")
+
+def run_history(args):
+    """Query the recognition log from the command line (read-only, no camera or gallery)"""
+    partitions = LogPartitions(args.log_dir, read_only=True)
+    stream = query_history(
+        partitions,
+        kind='detections' if args.raw else 'sessions',
+        names=args.name,
+        cameras=args.camera,
+        since=args.since,
+        until=args.until,
+        min_confidence=args.min_confidence,
+        cursor=args.cursor,
+        newest_first=not args.oldest_first
+    )
+    if args.all:
+        rows, next_cursor = stream, None
+    else:
+        rows, next_cursor = fetch_page(stream, args.limit)
+    
+    writer = None
+    for row in rows:
+        if writer is None:
+            fields = [field for field in row if field != 'cursor'] + ['cursor']
+            if args.csv:
+                writer = csv.DictWriter(sys.stdout, fieldnames=fields)
+                writer.writeheader()
+            else:
+                writer = fields
+                print('  '.join(fields))
+        if args.csv:
+            writer.writerow(row)
+        else:
+            print('  '.join(value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime)
+                            else f"{value:.2f}" if isinstance(value, float)
+                            else str(value) for value in (row[field] for field in writer)))
+    if writer is None:
+        print("No matching recognitions", file=sys.stderr)
+    if next_cursor:
+        print(f"More results: --cursor {next_cursor}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Face Recognition System")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    daemon_parser = subparsers.add_parser('daemon', help="headless multi-camera recognition")
+    daemon_parser.add_argument('--config', required=True, help="JSON camera config")
+    
+    batch_parser = subparsers.add_parser('batch', help="offline recognition of video files and image folders")
+    batch_parser.add_argument('sources', nargs='+', help="video files, image directories or glob patterns")
+    batch_parser.add_argument('--output', default=None, help="CSV file (default: the SQLite log)")
+    batch_parser.add_argument('--stride', type=int, default=5, help="process every n-th frame")
+    batch_parser.add_argument('--workers', type=int, default=None, help="processes (default: CPU count)")
+    batch_parser.add_argument('--chunk-seconds', type=float, default=60, help="video seconds per work unit")
+    batch_parser.add_argument('--scale', type=float, default=0.25, help="resize factor before detection")
+    batch_parser.add_argument('--upsample', type=int, default=1, help="HOG upsample count")
+    batch_parser.add_argument('--detector', default=None, help="detector spec, e.g. hog or haar+hog")
+    
+    enroll_parser = subparsers.add_parser('enroll', help="bulk enrolment from a photo directory")
+    enroll_parser.add_argument('directory', help="<name>/<photo> folders or <name>.jpg photos")
+    enroll_parser.add_argument('--workers', type=int, default=None, help="processes (default: CPU count)")
+    enroll_parser.add_argument('--batch-size', type=int, default=256, help="images committed together")
+    enroll_parser.add_argument('--max-side', type=int, default=1600, help="downscale larger photos to this")
+    enroll_parser.add_argument('--checkpoint', default=None, help="progress file for resuming")
+    
+    history_parser = subparsers.add_parser('history', help="query the recognition log")
+    history_parser.add_argument('--name', action='append', help="identity (repeatable)")
+    history_parser.add_argument('--camera', action='append', help="camera id (repeatable)")
+    history_parser.add_argument('--since', type=parse_time, default=None, help="start, ISO time or e.g. 2h / 7d ago")
+    history_parser.add_argument('--until', type=parse_time, default=None, help="end, ISO time or e.g. 1h ago")
+    history_parser.add_argument('--min-confidence', type=float, default=None)
+    history_parser.add_argument('--raw', action='store_true', help="per-frame detections instead of sessions")
+    history_parser.add_argument('--oldest-first', action='store_true')
+    history_parser.add_argument('--limit', type=int, default=50, help="rows per page")
+    history_parser.add_argument('--cursor', default=None, help="continue after this row (printed with each page)")
+    history_parser.add_argument('--all', action='store_true', help="stream every match instead of one page")
+    history_parser.add_argument('--csv', action='store_true', help="CSV output")
+    history_parser.add_argument('--log-dir', default='recognition_logs', help="log partition directory")
+    
+    args = parser.parse_args()
+    if args.command == 'daemon':
+        run_daemon(args.config)
+    elif args.command == 'batch':
+        run_batch(args)
+    elif args.command == 'enroll':
+        run_enroll(args)
+    elif args.command == 'history':
+        run_history(args)
+    else:
+        registration_menu()
 
 if __name__ == "__main__":
-    registration_menu()
+    main()
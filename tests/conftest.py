@@ -0,0 +1,124 @@
+import os
+import sys
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+# The recognition engine (recog/) is shared by every app, it lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _face_locations(img, number_of_times_to_upsample=1, model='hog'):
+    # Every bright blob is a face: tests draw faces as filled squares on a black frame
+    gray = img.max(axis=2) if img.ndim == 3 else img
+    _, _, stats, _ = cv2.connectedComponentsWithStats((gray > 0).astype(np.uint8))
+    return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h, _ in stats[1:] if w >= 4 and h >= 4]
+
+
+def _face_encodings(img, known_face_locations=None, num_jitters=1, model='small'):
+    # The colour in the middle of a face picks its encoding. Channels are binned by 32 levels so a
+    # lossy video codec keeps the identity of a face drawn in the middle of a bin (16, 48, ..., 240)
+    if known_face_locations is None:
+        known_face_locations = _face_locations(img)
+    encodings = []
+    for top, right, bottom, left in known_face_locations:
+        colour = np.asarray(img[(top + bottom) // 2, (left + right) // 2], dtype=np.uint8) // 32
+        seed = int.from_bytes(colour.tobytes().ljust(4, b'\0'), 'little')
+        encoding = np.random.default_rng(seed).normal(size=128)
+        encodings.append(encoding / np.linalg.norm(encoding))
+    return encodings
+
+
+def _load_image_file(file):
+    # A path or a file object, like face_recognition accepts
+    if hasattr(file, 'read'):
+        image = cv2.imdecode(np.frombuffer(file.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        image = cv2.imread(str(file))
+    if image is None:
+        raise ValueError(f"cannot identify image file {file}")
+    return np.ascontiguousarray(image[:, :, ::-1])
+
+
+# Tests run against a deterministic face_recognition so they neither need dlib nor depend on its models
+face_recognition = types.ModuleType('face_recognition')
+face_recognition.api = types.ModuleType('face_recognition.api')
+face_recognition.face_locations = _face_locations
+face_recognition.face_encodings = _face_encodings
+face_recognition.load_image_file = _load_image_file
+sys.modules['face_recognition'] = face_recognition
+sys.modules['face_recognition.api'] = face_recognition.api
+
+try:
+    import requests  # noqa: F401
+except ImportError:
+    # Only _post_to_server uses requests, and it logs any error it raises
+    def _post(*args, **kwargs):
+        raise ConnectionError("no server in tests")
+
+    requests = types.ModuleType('requests')
+    requests.post = _post
+    sys.modules['requests'] = requests
+
+
+def _draw_faces(faces, shape=(480, 640)):
+    """
+    Black BGR frame with a filled square per face
+
+    Args:
+        faces: (bgr_colour, top, left, side) per face; the colour is the identity
+    """
+    frame = np.zeros(shape + (3,), dtype=np.uint8)
+    for colour, top, left, side in faces:
+        frame[top:top + side, left:left + side] = colour
+    return frame
+
+
+@pytest.fixture
+def draw_faces():
+    return _draw_faces
+
+
+@pytest.fixture
+def face_photo(tmp_path):
+    """Writes a registration photo of one face colour and returns its path"""
+    def write(colour, name='photo'):
+        path = str(tmp_path / f"{name}.png")
+        cv2.imwrite(path, _draw_faces([(colour, 100, 100, 200)]))
+        return path
+    return write
+
+
+@pytest.fixture
+def make_system(tmp_path, monkeypatch):
+    """FaceRecognitionSystem factory working in a scratch directory, every system is closed afterwards"""
+    from recog.face_recog import FaceRecognitionSystem
+
+    # Gallery, registration cache and logs are created in the working directory
+    monkeypatch.chdir(tmp_path)
+    systems = []
+
+    def make(**kwargs):
+        kwargs.setdefault('enable_logging', False)
+        systems.append(FaceRecognitionSystem(**kwargs))
+        return systems[-1]
+
+    yield make
+    for system in systems:
+        system.close()
+
+
+@pytest.fixture
+def count_encodings(monkeypatch):
+    """Counts the faces passed to face_recognition.face_encodings"""
+    counter = {'faces': 0}
+
+    def face_encodings(img, known_face_locations=None, num_jitters=1, model='small'):
+        encodings = _face_encodings(img, known_face_locations, num_jitters, model)
+        counter['faces'] += len(encodings)
+        return encodings
+
+    monkeypatch.setattr(face_recognition, 'face_encodings', face_encodings)
+    return counter
@@ -0,0 +1,98 @@
+import sys
+import threading
+import types
+
+import face_recognition
+import numpy as np
+import pytest
+
+from recog.batch_encoder import BatchEncoder, encode_batch, face_crops
+
+COLOURS = [(48, 176, 80), (208, 80, 176), (16, 16, 240), (240, 112, 16)]
+
+
+def _faces(draw_faces, colours):
+    frame = draw_faces([(colour, 40, 20 + 150 * i, 100) for i, colour in enumerate(colours)], shape=(200, 640))
+    rgb = np.ascontiguousarray(frame[:, :, ::-1])
+    return rgb, face_recognition.face_locations(rgb)
+
+
+def _crop_runner(batches):
+    """Encodes every crop on its own, remembering the batch sizes and models"""
+    def run(fn, crops, model):
+        batches.append((len(crops), model))
+        return [face_recognition.face_encodings(crop, [box])[0] for crop, box in crops]
+    return run
+
+
+def test_concurrent_requests_get_their_own_encodings(draw_faces):
+    batches = []
+    encoder = BatchEncoder(max_batch=4, max_wait=0.05, runner=_crop_runner(batches))
+    frames = [_faces(draw_faces, COLOURS[i % 4:i % 4 + 1 + i % 3]) for i in range(8)]
+    results = [None] * len(frames)
+
+    def submit(i):
+        results[i] = encoder.encode(*frames[i], timeout=5)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(frames))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    encoder.close()
+
+    for (rgb, locations), encodings in zip(frames, results):
+        expected = face_recognition.face_encodings(rgb, locations)
+        assert len(encodings) == len(locations)
+        assert all(np.allclose(a, b) for a, b in zip(encodings, expected))
+    # Whole requests only, never above max_batch, and fewer batches than requests
+    assert all(size <= 4 for size, _ in batches)
+    assert sum(size for size, _ in batches) == sum(len(locations) for _, locations in frames)
+    assert len(batches) < len(frames)
+    assert {model for _, model in batches} == {'small'}
+    assert encoder.stats()['faces'] == sum(size for size, _ in batches)
+
+
+def test_a_failed_batch_fails_only_its_requests(draw_faces):
+    calls = []
+
+    def runner(fn, crops, model):
+        calls.append(len(crops))
+        if len(calls) == 1:
+            raise RuntimeError("encoder crashed")
+        return [np.zeros(128)] * len(crops)
+
+    encoder = BatchEncoder(max_batch=1, max_wait=0.0, runner=runner)
+    first = encoder.submit(*_faces(draw_faces, COLOURS[:1]))
+    with pytest.raises(RuntimeError):
+        first.result(timeout=5)
+    assert len(encoder.encode(*_faces(draw_faces, COLOURS[1:2]), timeout=5)) == 1
+    # Frames without faces never reach the runner
+    assert encoder.encode(np.zeros((50, 50, 3), dtype=np.uint8), []) == []
+    encoder.close()
+    assert calls == [1, 1]
+
+
+def test_batch_uses_the_landmark_model_of_face_encodings(draw_faces, monkeypatch):
+    chips = []
+    dlib = types.ModuleType('dlib')
+    dlib.rectangle = lambda left, top, right, bottom: (left, top, right, bottom)
+    dlib.get_face_chip = lambda crop, landmarks, size, padding: (landmarks, size, padding)
+    monkeypatch.setitem(sys.modules, 'dlib', dlib)
+
+    def compute_face_descriptor(batch):
+        chips.extend(batch)
+        return [np.zeros(128) for _ in batch]
+
+    api = face_recognition.api
+    monkeypatch.setattr(api, 'pose_predictor_5_point', lambda crop, rect: '5-point', raising=False)
+    monkeypatch.setattr(api, 'pose_predictor_68_point', lambda crop, rect: '68-point', raising=False)
+    monkeypatch.setattr(api, 'face_encoder', types.SimpleNamespace(compute_face_descriptor=compute_face_descriptor),
+                        raising=False)
+
+    # face_encodings' default model is 'small', the 5-point predictor; chips as compute_face_descriptor cuts them
+    crops = face_crops(*_faces(draw_faces, COLOURS[:2]))
+    assert len(encode_batch(crops)) == 2
+    assert chips == [('5-point', 150, 0.25)] * 2
+    encode_batch(crops, model='large')
+    assert chips[2:] == [('68-point', 150, 0.25)] * 2
@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import face_recognition
+import pytest
+
+import recog.bulk_enroll
+from recog.bulk_enroll import find_images
+
+COLOURS = {"alice": (48, 176, 80), "bob": (208, 80, 176), "carol": (16, 16, 240)}
+
+
+@pytest.fixture
+def in_process_pool(monkeypatch):
+    """Encodes on threads: spawned workers would not see the test face_recognition"""
+    def pool(max_workers, mp_context):
+        return ThreadPoolExecutor(max_workers)
+    monkeypatch.setattr(recog.bulk_enroll, 'ProcessPoolExecutor', pool)
+
+
+@pytest.fixture
+def photos(tmp_path, draw_faces):
+    root = tmp_path / "photos"
+    (root / "alice").mkdir(parents=True)
+    for i in range(2):
+        cv2.imwrite(str(root / "alice" / f"{i}.png"), draw_faces([(COLOURS["alice"], 100, 100 + 50 * i, 150)]))
+    cv2.imwrite(str(root / "bob_20260101_120000.png"), draw_faces([(COLOURS["bob"], 100, 100, 150)]))
+    cv2.imwrite(str(root / "carol.png"), draw_faces([(COLOURS["carol"], 100, 100, 150),
+                                                    (COLOURS["bob"], 300, 400, 60)]))
+    cv2.imwrite(str(root / "nobody.png"), draw_faces([]))
+    (root / "broken.jpg").write_bytes(b"not an image")
+    return str(root)
+
+
+def test_find_images_understands_both_layouts(photos):
+    found = [(os.path.relpath(path, photos), name) for path, name in find_images(photos)]
+    assert found == [("bob_20260101_120000.png", "bob"), ("broken.jpg", "broken"), ("carol.png", "carol"),
+                     ("nobody.png", "nobody"), (os.path.join("alice", "0.png"), "alice"),
+                     (os.path.join("alice", "1.png"), "alice")]
+
+
+def test_enrol_and_rerun(make_system, photos, in_process_pool, monkeypatch):
+    models = []
+    face_encodings = face_recognition.face_encodings
+
+    def recording(img, known_face_locations=None, num_jitters=1, model='small'):
+        models.append(model)
+        return face_encodings(img, known_face_locations, num_jitters, model)
+
+    monkeypatch.setattr(face_recognition, 'face_encodings', recording)
+    system = make_system()
+    summary = system.bulk_enroll(photos, workers=2, batch_size=2)
+    assert {key: summary[key] for key in ('images', 'enrolled', 'multiple', 'no_face', 'unreadable', 'skipped')} == \
+        {'images': 6, 'enrolled': 4, 'multiple': 1, 'no_face': 1, 'unreadable': 1, 'skipped': 0}
+    assert sorted(system.known_face_names) == ["alice", "alice", "bob", "carol"]
+    # Encoded with the system's model, like add_known_face
+    assert set(models) == {system.model}
+
+    # Everything is in the checkpoint, a rerun has nothing to do
+    summary = system.bulk_enroll(photos, workers=2, batch_size=2)
+    assert (summary['skipped'], summary['enrolled']) == (6, 0)
+
+
+def test_resume_after_a_crash_does_not_enrol_twice(make_system, photos, in_process_pool):
+    system = make_system()
+    system.bulk_enroll(photos, workers=2, batch_size=2)
+    checkpoint = os.path.join(system.gallery_path, 'bulk_enroll.jsonl')
+    with open(checkpoint) as f:
+        lines = f.readlines()
+    # Crash after the last batches reached the journal, before their checkpoint lines (one torn)
+    with open(checkpoint, 'w') as f:
+        f.writelines(lines[:2])
+        f.write(lines[2][:10])
+
+    summary = system.bulk_enroll(photos, workers=2, batch_size=2)
+    assert summary['skipped'] == 2
+    assert summary['enrolled'] == 0
+    # Re-read from the registration cache, recognised as already enrolled
+    assert summary['cached'] == 4
+    assert summary['duplicates'] == 3
+    assert sorted(system.known_face_names) == ["alice", "alice", "bob", "carol"]
@@ -0,0 +1,83 @@
+import collections
+import time
+
+import cv2
+
+import recog.camera_daemon
+from recog.camera_daemon import CameraDaemon
+
+ALICE = (48, 176, 80)
+
+
+def _daemon(make_system, cameras, **kwargs):
+    return CameraDaemon(make_system(), cameras, use_processes=False, **kwargs)
+
+
+def _run_picks(daemon, rounds):
+    """Every camera always has a fresh frame waiting, count who is picked"""
+    picked = collections.Counter()
+    now = time.time()
+    with daemon._cond:
+        for _ in range(rounds):
+            for camera in daemon.cameras:
+                camera.pending = (None, now)
+            camera = daemon._pick(now)
+            picked[camera.id] += 1
+    return picked
+
+
+def test_weighted_fair_share(make_system):
+    daemon = _daemon(make_system, [{'id': "entrance", 'source': 0, 'weight': 2},
+                                   {'id': "lobby", 'source': 1},
+                                   {'id': "yard", 'source': 2}])
+    assert _run_picks(daemon, 40) == {"entrance": 20, "lobby": 10, "yard": 10}
+
+
+def test_returning_camera_gets_no_burst(make_system):
+    daemon = _daemon(make_system, [{'id': "a", 'source': 0}, {'id': "b", 'source': 1}])
+    now = time.time()
+    with daemon._cond:
+        # Only a has frames for a while
+        for _ in range(10):
+            daemon.cameras[0].pending = (None, now)
+            assert daemon._pick(now).id == "a"
+    # Back in the race, b is not owed the 10 frames it had nothing to show
+    assert _run_picks(daemon, 10) == {"a": 5, "b": 5}
+
+
+def test_busy_rate_limited_and_expired_cameras_wait(make_system):
+    daemon = _daemon(make_system, [{'id': "a", 'source': 0, 'deadline': 0.3},
+                                   {'id': "b", 'source': 1}, {'id': "c", 'source': 2}])
+    a, b, c = daemon.cameras
+    now = time.time()
+    with daemon._cond:
+        a.pending = (None, now - 1.0)
+        b.pending = (None, now)
+        c.pending = (None, now)
+        b.busy = True
+        c.next_due = now + 1.0
+        # a's frame is past its deadline, b is processing, c is over its max_fps
+        assert daemon._pick(now) is None
+        assert a.pending is None
+        c.pending = (None, now + 0.9)
+        assert daemon._pick(now + 1.0).id == "c"
+
+
+def test_file_sources_are_processed_frame_by_frame(make_system, draw_faces, tmp_path, monkeypatch):
+    sources = []
+    for name, frames in (("door", 6), ("hall", 4)):
+        path = str(tmp_path / f"{name}.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (320, 240))
+        for i in range(frames):
+            writer.write(draw_faces([(ALICE, 40, 40 + 5 * i, 120)], shape=(240, 320)))
+        writer.release()
+        sources.append({'id': name, 'source': path})
+
+    daemon = _daemon(make_system, sources, workers=2, stats_interval=60)
+    # Keep pytest's own SIGINT handling
+    monkeypatch.setattr(recog.camera_daemon.signal, 'signal', lambda *args: None)
+    daemon.run()
+    cameras = daemon.stats()['cameras']
+    # Files are never dropped, every frame is scheduled once
+    assert {name: (camera['processed'], camera['dropped'], camera['faces'])
+            for name, camera in cameras.items()} == {"door": (6, 0, 6), "hall": (4, 0, 4)}
@@ -0,0 +1,62 @@
+import numpy as np
+
+from recog.encoding_cache import EncodingCache
+
+ALICE = (48, 176, 80)
+BOX = (40, 100, 100, 40)
+
+
+def _frame(seed, brightness=0):
+    frame = np.zeros((240, 320, 3), dtype=np.int16)
+    frame[40:100, 40:100] = np.random.default_rng(seed).integers(0, 200, size=(60, 60, 1))
+    return np.clip(frame + brightness, 0, 255).astype(np.uint8)
+
+
+def test_near_identical_crop_hits():
+    cache = EncodingCache(ttl=2.0)
+    encoding = np.ones(128)
+    key = cache.key(_frame(0), BOX, "cam")
+    assert cache.get(key, now=100.0) is None
+    cache.put(key, encoding, now=100.0)
+
+    # Same face a little brighter: hit
+    assert cache.get(cache.key(_frame(0, brightness=12), BOX, "cam"), now=101.0) is encoding
+    # A different face on the same spot: miss
+    assert cache.get(cache.key(_frame(1), BOX, "cam"), now=101.0) is None
+    # Same crop on another camera or another spot: different bucket
+    assert cache.get(cache.key(_frame(0), BOX, "other"), now=101.0) is None
+    moved = np.roll(_frame(0), 80, axis=1)
+    assert cache.get(cache.key(moved, (40, 180, 100, 120), "cam"), now=101.0) is None
+
+    # Expired entries are encoded again
+    assert cache.get(key, now=102.5) is None
+    assert cache.stats() == {'size': 0, 'hits': 1, 'misses': 5, 'hit_rate': 1 / 6, 'expired': 1, 'evictions': 0}
+
+
+def test_least_recently_used_bucket_is_evicted():
+    cache = EncodingCache(max_size=2)
+    frame = _frame(0)
+    keys = [cache.key(np.roll(frame, dx, axis=1), (40, 100 + dx, 100, 40 + dx), "cam") for dx in (0, 60, 120)]
+    cache.put(keys[0], "a", now=1.0)
+    cache.put(keys[1], "b", now=1.0)
+    assert cache.get(keys[0], now=1.5) == "a"
+    cache.put(keys[2], "c", now=1.5)
+    assert cache.get(keys[1], now=1.5) is None
+    assert [cache.get(keys[0], now=1.5), cache.get(keys[2], now=1.5)] == ["a", "c"]
+    assert cache.stats()['evictions'] == 1
+
+
+def test_system_reuses_encodings_but_matches_every_frame(make_system, face_photo, draw_faces, count_encodings):
+    system = make_system(encoding_cache=EncodingCache(ttl=60))
+    frame = draw_faces([(ALICE, 100, 100, 120)])
+    _, results = system.process_frame(frame.copy(), "cam", annotate=False)
+    assert [result['name'] for result in results] == ["Unknown"]
+    assert count_encodings['faces'] == 1
+
+    # Enrolled in between: the cached encoding is matched against the new gallery
+    system.add_known_face(face_photo(ALICE, 'alice'), "alice")
+    count_encodings['faces'] = 0
+    _, results = system.process_frame(frame.copy(), "cam", annotate=False)
+    assert [result['name'] for result in results] == ["alice"]
+    assert count_encodings['faces'] == 0
+    assert system.get_cache_stats()['hits'] == 1
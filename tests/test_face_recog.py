@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from recog.face_recog import FaceRecognitionSystem
+
+
+@pytest.fixture
+def system(tmp_path, monkeypatch):
+    # Gallery, registration cache and logs are created in the working directory
+    monkeypatch.chdir(tmp_path)
+    system = FaceRecognitionSystem(enable_logging=False)
+    yield system
+    system.close()
+
+
+def test_constructs_without_logging_setup(system):
+    # The logger is usable even though setup_logging never ran
+    system.logger.info("constructed")
+    assert system.gallery_path == 'face_gallery'
+    assert len(system.known_face_names) == 0
+
+
+def test_blank_frame_has_no_results(system):
+    frame, results = system.process_frame(np.zeros((240, 320, 3), dtype=np.uint8), "cam", annotate=False)
+    assert results == []
+    assert frame.shape == (240, 320, 3)
@@ -0,0 +1,46 @@
+from recog.face_tracker import FaceTracker
+
+ALICE = (40, 180, 90)
+BOB = (200, 60, 160)
+
+
+def test_known_tracks_skip_the_encoder(make_system, face_photo, draw_faces, count_encodings):
+    system = make_system(tracker=FaceTracker(refresh_interval=30))
+    assert system.add_known_face(face_photo(ALICE, 'alice'), "alice")
+    count_encodings['faces'] = 0
+
+    # Two faces walking slowly to the right: each is encoded once, on its first frame
+    def frame(step):
+        return draw_faces([(ALICE, 80, 60 + 8 * step, 120), (BOB, 280, 300 + 8 * step, 120)])
+
+    for step in range(5):
+        _, results = system.process_frame(frame(step), "cam", annotate=False)
+        assert sorted(result['name'] for result in results) == ["Unknown", "alice"]
+    assert count_encodings['faces'] == 2
+
+    # The unknown face is retried after unknown_refresh_interval frames, alice is not
+    system.process_frame(frame(5), "cam", annotate=False)
+    assert count_encodings['faces'] == 3
+
+
+def test_gallery_change_forces_a_rematch(make_system, face_photo, draw_faces, count_encodings):
+    system = make_system(tracker=FaceTracker())
+    system.add_known_face(face_photo(ALICE, 'alice'), "alice")
+    frame = draw_faces([(ALICE, 80, 60, 120)])
+    system.process_frame(frame.copy(), "cam", annotate=False)
+    count_encodings['faces'] = 0
+
+    system.remove_known_faces("alice")
+    _, results = system.process_frame(frame.copy(), "cam", annotate=False)
+    assert [result['name'] for result in results] == ["Unknown"]
+    assert count_encodings['faces'] == 1
+
+
+def test_new_face_starts_a_new_track(make_system, face_photo, draw_faces):
+    system = make_system(tracker=FaceTracker())
+    system.add_known_face(face_photo(ALICE, 'alice'), "alice")
+    system.process_frame(draw_faces([(ALICE, 80, 60, 120)]), "cam", annotate=False)
+
+    # Far from the alice track: a new track that is encoded and matched on its own
+    _, results = system.process_frame(draw_faces([(BOB, 300, 480, 120)]), "cam", annotate=False)
+    assert [result['name'] for result in results] == ["Unknown"]
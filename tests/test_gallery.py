@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+
+from recog.ann_index import IVFIndex
+from recog.gallery import FaceGallery
+from recog.gallery_store import load_gallery, save_gallery
+
+
+def _encodings(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, 128)).astype(np.float32)
+
+
+def _gallery(n):
+    gallery = FaceGallery()
+    gallery.extend(_encodings(n), [f"p{i}" for i in range(n)])
+    return gallery
+
+
+def test_enrol_and_match():
+    gallery = _gallery(10)
+    gallery.add(_encodings(1, seed=1)[0], "new")
+
+    best, distance, runner_up, _ = gallery.match(gallery.encodings[[3, 10]])
+    assert len(gallery) == 11
+    assert list(best) == [3, 10]
+    assert np.allclose(distance, 0.0, atol=1e-2)
+    assert all(runner_up >= 0)
+
+
+def test_ivf_follows_compaction_without_retraining():
+    gallery = _gallery(400)
+    index = IVFIndex(n_lists=8, n_probe=8, min_train_size=100)
+    index.attach(gallery)
+
+    best, _, _, _ = index.search(gallery.encodings[:5])
+    assert list(best) == [0, 1, 2, 3, 4]
+    centroids = index.centroids
+
+    gallery.remove_names([f"p{i}" for i in range(0, 400, 4)])
+    gallery.compact(threading.Lock())
+    queries = _encodings(400)[[1, 2, 3, 398, 399]]
+    best, distance, _, _ = index.search(queries)
+
+    assert index.centroids is centroids
+    assert [gallery.names[row] for row in best] == ["p1", "p2", "p3", "p398", "p399"]
+    assert np.allclose(distance, 0.0, atol=1e-2)
+    # Rows enrolled after the compaction are indexed too
+    gallery.add(_encodings(1, seed=7)[0], "late")
+    best, _, _, _ = index.search(_encodings(1, seed=7))
+    assert gallery.names[best[0]] == "late"
+
+
+def test_snapshot_round_trip(tmp_path):
+    gallery = _gallery(20)
+    gallery.remove_names(["p0"])
+    save_gallery(gallery, str(tmp_path / "gallery"), {"p1": {"role": "staff"}})
+
+    loaded = FaceGallery()
+    meta = load_gallery(loaded, str(tmp_path / "gallery"))
+    # Only live rows are written
+    assert len(loaded) == 19
+    assert list(loaded.live_names()) == [f"p{i}" for i in range(1, 20)]
+    assert meta["metadata"] == {"p1": {"role": "staff"}}
+    assert np.allclose(loaded.encodings, gallery.encodings[1:])
+
+
+def test_remove_tombstones_until_compact():
+    gallery = _gallery(10)
+    assert gallery.remove_names(["p2", "p5", "missing"]) == 2
+
+    # Rows stay in place but are never matched
+    assert len(gallery) == 10 and gallery.n_dead == 2
+    best, _, _, _ = gallery.match(gallery.encodings[[2]])
+    assert best[0] != 2
+    assert "p2" not in gallery.live_names()
+
+    generation = gallery.generation
+    assert gallery.compact(threading.Lock()) == 2
+    assert len(gallery) == 8 and gallery.n_dead == 0
+    assert gallery.names == [f"p{i}" for i in range(10) if i not in (2, 5)]
+    assert gallery.generation != generation
+
+    old_to_new = gallery.last_remap[2]
+    assert list(old_to_new[[0, 2, 3, 9]]) == [0, -1, 2, 7]
@@ -0,0 +1,82 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from recog.gallery_journal import MAX_NAME_BYTES, OP_ADD, OP_REMOVE, GalleryJournal, list_segments
+
+
+def _journal(path):
+    return GalleryJournal(str(path), threading.Lock(), lambda: None, compact_bytes=1 << 30)
+
+
+def _segment(path, seq):
+    return os.path.join(str(path), f"journal-{seq:06d}.log")
+
+
+def _write(path):
+    journal = _journal(path)
+    journal.replay(1)
+    journal.append_add("alice", np.full(128, 0.5, dtype=np.float32), {"team": "a"})
+    journal.append_adds([("bob", np.ones(128, dtype=np.float32), None),
+                         ("carol", np.zeros(128, dtype=np.float32), None)])
+    journal.append_removes(["bob"])
+    journal.close()
+
+
+def test_replay_returns_records_in_order(tmp_path):
+    _write(tmp_path)
+
+    records = _journal(tmp_path).replay(1)
+    assert [(op, name) for op, name, _, _ in records] == [
+        (OP_ADD, "alice"), (OP_ADD, "bob"), (OP_ADD, "carol"), (OP_REMOVE, "bob")]
+    assert np.allclose(records[0][2], 0.5)
+    assert records[0][3] == {"team": "a"}
+    assert records[3][2] is None
+
+
+def test_torn_record_is_cut_off(tmp_path):
+    _write(tmp_path)
+    segment = _segment(tmp_path, list_segments(str(tmp_path))[-1])
+    intact = os.path.getsize(segment)
+    with open(segment, 'ab') as f:
+        f.write(b'\x40\x00\x00\x00garbage')
+
+    journal = _journal(tmp_path)
+    assert len(journal.replay(1)) == 4
+    assert os.path.getsize(segment) == intact
+
+    # Appends continue after the last intact record
+    journal.append_removes(["carol"])
+    journal.close()
+    assert [name for _, name, _, _ in _journal(tmp_path).replay(1)][-1] == "carol"
+
+
+def test_crc_mismatch_drops_the_record_and_the_rest(tmp_path):
+    _write(tmp_path)
+    segment = _segment(tmp_path, list_segments(str(tmp_path))[-1])
+    with open(segment, 'r+b') as f:
+        data = bytearray(f.read())
+        # Flip a byte in the payload of the last record (the removal of bob)
+        data[-1] ^= 0xFF
+        f.seek(0)
+        f.write(data)
+
+    records = _journal(tmp_path).replay(1)
+    assert [name for _, name, _, _ in records] == ["alice", "bob", "carol"]
+
+
+def test_overlong_name_is_rejected_before_writing(tmp_path):
+    _write(tmp_path)
+    journal = _journal(tmp_path)
+    journal.replay(1)
+    segments = {seq: os.path.getsize(_segment(tmp_path, seq)) for seq in list_segments(str(tmp_path))}
+
+    # 2 bytes per character in UTF-8, so this is just over the u16 length field
+    name = "é" * (MAX_NAME_BYTES // 2 + 1)
+    with pytest.raises(ValueError):
+        journal.append_adds([("dave", np.ones(128, dtype=np.float32), None),
+                             (name, np.ones(128, dtype=np.float32), None)])
+    journal.close()
+    assert {seq: os.path.getsize(_segment(tmp_path, seq)) for seq in list_segments(str(tmp_path))} == segments
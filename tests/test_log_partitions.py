@@ -0,0 +1,78 @@
+import os
+import sqlite3
+
+from recog.log_partitions import LogPartitions
+from recog.log_store import INSERT, INSERT_SESSION, SCHEMA, SESSION_SCHEMA, apply_rollups, rollup_deltas
+
+DAY = 86400
+# 2026-10-18 00:00 UTC
+MIDNIGHT = 1792281600
+
+
+def _write(partitions, statement, rows, time_column=2):
+    for row in rows:
+        with partitions.writer(partitions.period_start(row[time_column])) as conn, conn:
+            conn.execute(statement, row)
+            apply_rollups(conn, rollup_deltas(statement, [row]))
+
+
+def test_rows_land_in_their_day(tmp_path):
+    partitions = LogPartitions(str(tmp_path / "logs"), legacy_db=None)
+    _write(partitions, INSERT, [("alice", 0.9, MIDNIGHT - 10, "cam", None),
+                                ("alice", 0.9, MIDNIGHT + 10, "cam", None)])
+
+    found = partitions.partitions()
+    assert [os.path.basename(path) for _, _, path in found] == [
+        "recognition_day_20261017.db", "recognition_day_20261018.db"]
+    assert [start for start, _, _ in partitions.partitions(since=MIDNIGHT)] == [MIDNIGHT]
+    assert partitions.window_stats(MIDNIGHT - DAY, MIDNIGHT + DAY) == [("alice", 2, 2, 1.8, 0.0)]
+    partitions.close()
+
+
+def test_week_partitions_start_on_monday(tmp_path):
+    partitions = LogPartitions(str(tmp_path / "logs"), period='week', legacy_db=None)
+    # 2026-10-18 is a Sunday, its week started on Monday 2026-10-12
+    assert partitions.period_start(MIDNIGHT + 3600) == MIDNIGHT - 6 * DAY
+    partitions.close()
+
+
+def test_retention_deletes_expired_partitions(tmp_path):
+    partitions = LogPartitions(str(tmp_path / "logs"), retention_days=2, legacy_db=None)
+    _write(partitions, INSERT, [("alice", 0.9, MIDNIGHT - day * DAY + 60, "cam", None) for day in range(5)])
+    assert len(partitions.partitions()) == 5
+
+    removed = partitions.drop_expired(now=MIDNIGHT + 3600)
+    assert [os.path.basename(path) for path in removed] == [
+        "recognition_day_20261014.db", "recognition_day_20261015.db"]
+    assert [start for start, _, _ in partitions.partitions()] == [
+        MIDNIGHT - 2 * DAY, MIDNIGHT - DAY, MIDNIGHT]
+    assert partitions.stats()['dropped'] == 2
+    partitions.close()
+
+
+def test_legacy_database_is_split_once(tmp_path):
+    legacy_db = str(tmp_path / "face_recognition.db")
+    legacy = sqlite3.connect(legacy_db)
+    legacy.execute(SCHEMA)
+    legacy.execute(SESSION_SCHEMA)
+    legacy.executemany(INSERT, [("alice", 0.8, MIDNIGHT - 100, "cam", None),
+                                ("bob", 0.6, MIDNIGHT + 100, "cam", None),
+                                ("bob", 0.7, MIDNIGHT + 200, "cam", None)])
+    legacy.execute(INSERT_SESSION, ("carol", "cam", MIDNIGHT + 300, MIDNIGHT + 320, 8, 0.9, 0.85))
+    legacy.commit()
+    legacy.close()
+
+    partitions = LogPartitions(str(tmp_path / "logs"), legacy_db=legacy_db)
+    assert not os.path.exists(legacy_db)
+    assert os.path.exists(legacy_db + ".imported")
+    assert len(partitions.partitions()) == 2
+
+    stats = {row[0]: row[1:3] for row in partitions.window_stats(MIDNIGHT - DAY, MIDNIGHT + DAY)}
+    assert stats == {"alice": (1, 1), "bob": (2, 2), "carol": (1, 8)}
+    partitions.close()
+
+    # Nothing left to import on the next start
+    partitions = LogPartitions(str(tmp_path / "logs"), legacy_db=legacy_db)
+    stats = {row[0]: row[1:3] for row in partitions.window_stats(MIDNIGHT - DAY, MIDNIGHT + DAY)}
+    assert stats["bob"] == (2, 2)
+    partitions.close()
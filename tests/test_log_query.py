@@ -0,0 +1,77 @@
+from recog.log_partitions import LogPartitions
+from recog.log_query import fetch_page, query_history
+from recog.log_store import INSERT, apply_rollups, rollup_deltas
+
+DAY = 86400
+# 2026-10-18 00:00 UTC
+MIDNIGHT = 1792281600
+
+
+def _partitions(tmp_path, rows):
+    partitions = LogPartitions(str(tmp_path / "logs"), legacy_db=None)
+    for row in rows:
+        with partitions.writer(partitions.period_start(row[2])) as conn, conn:
+            conn.execute(INSERT, row)
+            apply_rollups(conn, rollup_deltas(INSERT, [row]))
+    return partitions
+
+
+def _pages(partitions, page_size, **filters):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = fetch_page(query_history(partitions, kind='detections', cursor=cursor, **filters),
+                                  page_size)
+        pages.append([(row['name'], row['confidence']) for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_row_once_across_partitions(tmp_path):
+    # Ten rows over two days, two of them sharing a timestamp
+    rows = [("alice" if i % 2 else "bob", i / 10, MIDNIGHT - DAY + i * 20000, "cam", None) for i in range(9)]
+    rows.append(("alice", 0.95, rows[-1][2], "cam", None))
+    partitions = _partitions(tmp_path, rows)
+
+    pages = _pages(partitions, 3)
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    flat = [row for page in pages for row in page]
+    assert sorted(flat) == sorted((name, confidence) for name, confidence, _, _, _ in rows)
+    # Newest first
+    assert flat[-1] == ("bob", 0.0)
+
+    oldest = [row for page in _pages(partitions, 4, newest_first=False) for row in page]
+    assert oldest == flat[::-1]
+    partitions.close()
+
+
+def test_cursor_is_stable_under_new_rows(tmp_path):
+    partitions = _partitions(tmp_path, [("alice", 0.5, MIDNIGHT + i * 60, "cam", None) for i in range(6)])
+
+    first, cursor = fetch_page(query_history(partitions, kind='detections'), 3)
+    # A row written meanwhile is newer than the cursor, it does not shift the next page
+    with partitions.writer(MIDNIGHT) as conn, conn:
+        conn.execute(INSERT, ("late", 0.5, MIDNIGHT + 3600, "cam", None))
+    second, cursor = fetch_page(query_history(partitions, kind='detections', cursor=cursor), 3)
+
+    assert cursor is None
+    assert [row['timestamp'] for row in first + second] == sorted(
+        (row['timestamp'] for row in first + second), reverse=True)
+    assert len({row['cursor'] for row in first + second}) == 6
+    assert all(row['name'] == "alice" for row in second)
+    partitions.close()
+
+
+def test_filters(tmp_path):
+    partitions = _partitions(tmp_path, [
+        ("alice", 0.9, MIDNIGHT + 10, "door", None),
+        ("alice", 0.4, MIDNIGHT + 20, "hall", None),
+        ("bob", 0.9, MIDNIGHT + 30, "door", None),
+    ])
+
+    def names(**filters):
+        return [(row['name'], row['camera_id']) for row in query_history(partitions, kind='detections', **filters)]
+
+    assert names(names="alice") == [("alice", "hall"), ("alice", "door")]
+    assert names(cameras=["door"]) == [("bob", "door"), ("alice", "door")]
+    assert names(min_confidence=0.5, since=MIDNIGHT + 15) == [("bob", "door")]
+    partitions.close()
@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from recog.log_store import (INSERT, INSERT_SESSION, ROLLUP_SCHEMA, SCHEMA, SCHEMA_VERSION,
+                             SESSION_SCHEMA, apply_rollups, migrate, rollup_deltas, window_stats)
+
+HOUR = 3600
+DAY = 86400
+# 2026-10-18 00:00 UTC
+MIDNIGHT = 1792281600
+
+
+def _insert(conn, statement, rows):
+    with conn:
+        conn.executemany(statement, rows)
+        apply_rollups(conn, rollup_deltas(statement, rows))
+
+
+def _rollup(conn, table='recognition_hourly'):
+    return conn.execute(f'SELECT bucket, name, camera_id, sessions, frames, detections '
+                        f'FROM {table} ORDER BY bucket, name, camera_id').fetchall()
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def test_upserts_accumulate_per_bucket(conn):
+    t = MIDNIGHT + 9 * HOUR
+    _insert(conn, INSERT, [("alice", 0.9, t, "cam", None), ("alice", 0.7, t + 60, "cam", None)])
+    _insert(conn, INSERT, [("alice", 0.8, t + 120, "cam", None), ("alice", 0.8, t + HOUR, "cam", None)])
+    _insert(conn, INSERT_SESSION, [("alice", "cam", t, t + 30, 12, 0.95, 0.85)])
+
+    assert _rollup(conn) == [(t, "alice", "cam", 1, 12, 3), (t + HOUR, "alice", "cam", 0, 0, 1)]
+    assert _rollup(conn, 'recognition_daily') == [(MIDNIGHT, "alice", "cam", 1, 12, 4)]
+
+
+def test_missing_name_or_camera_upserts_one_row(conn):
+    t = MIDNIGHT + HOUR
+    for _ in range(3):
+        _insert(conn, INSERT, [(None, 0.5, t, None, None)])
+
+    assert _rollup(conn) == [(t, "", "", 0, 0, 3)]
+    assert window_stats(conn, t, t + HOUR) == [(None, 3, 3, pytest.approx(1.5), 0.0)]
+
+
+def test_window_stats_prefers_sessions_and_falls_back_to_detections(conn):
+    t = MIDNIGHT + 10 * HOUR
+    # alice has sessions (and raw rows), bob only raw rows
+    _insert(conn, INSERT, [("alice", 0.9, t, "cam", None)] * 5 + [("bob", 0.6, t, "cam", None)] * 2)
+    _insert(conn, INSERT_SESSION, [("alice", "cam", t, t + 4, 5, 0.9, 0.9)])
+
+    stats = {row[0]: row[1:] for row in window_stats(conn, MIDNIGHT - 2 * DAY, MIDNIGHT + DAY)}
+    assert stats["alice"][:2] == (1, 5)
+    assert stats["bob"][:2] == (2, 2)
+    assert stats["bob"][2] == pytest.approx(1.2)
+
+
+def test_schema_2_rollups_are_rebuilt(conn):
+    legacy = sqlite3.connect(':memory:')
+    legacy.execute(SCHEMA)
+    legacy.execute(SESSION_SCHEMA)
+    for table in ('recognition_hourly', 'recognition_daily'):
+        legacy.execute(ROLLUP_SCHEMA.format(table=table).replace("NOT NULL DEFAULT ''", ""))
+    t = MIDNIGHT + HOUR
+    legacy.executemany(INSERT, [(None, 0.5, t, None, None)] * 2)
+    # Duplicated NULL-key rows, as schema 2 wrote them
+    legacy.executemany('INSERT INTO recognition_hourly (bucket, name, camera_id, detections) '
+                       'VALUES (?, NULL, NULL, 1)', [(t,), (t,)])
+    legacy.execute('PRAGMA user_version = 2')
+    legacy.commit()
+
+    migrate(legacy)
+    assert legacy.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    assert _rollup(legacy) == [(t, "", "", 0, 0, 2)]
+    _insert(legacy, INSERT, [(None, 0.5, t, None, None)])
+    assert _rollup(legacy) == [(t, "", "", 0, 0, 3)]
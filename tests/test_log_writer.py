@@ -0,0 +1,60 @@
+import time
+
+from recog.log_partitions import LogPartitions
+from recog.log_query import query_history
+from recog.log_writer import RecognitionLogWriter
+
+MIDNIGHT = 1792281600  # 2026-10-18 00:00 UTC
+
+
+def _rows(count, first=0):
+    return [(f"p{i}", 0.9, MIDNIGHT + i, "cam", f"frame{i}.jpg") for i in range(first, first + count)]
+
+
+def _names(partitions):
+    return [row['name'] for row in query_history(partitions, kind='detections', newest_first=False)]
+
+
+def test_flush_drains_every_batch_at_once(tmp_path):
+    partitions = LogPartitions(str(tmp_path / "logs"))
+    writer = RecognitionLogWriter(partitions, max_batch=10, max_delay=30)
+    writer.put_many(_rows(35))
+
+    started = time.time()
+    assert writer.flush(timeout=10)
+    # Not max_delay per batch after the first one
+    assert time.time() - started < 5
+    assert writer.stats()['written'] == 35
+    assert writer.stats()['batches'] == 4
+
+    # The next rows are batched again instead of being written right away
+    writer.put_many(_rows(3, first=35))
+    time.sleep(0.2)
+    assert writer.stats()['queued'] == 3
+    writer.close()
+    assert len(_names(partitions)) == 38
+    partitions.close()
+
+
+def test_full_queue_drops_the_oldest_rows(tmp_path):
+    partitions = LogPartitions(str(tmp_path / "logs"))
+    writer = RecognitionLogWriter(partitions, max_batch=100, max_delay=30, max_queue=10)
+    writer.put_many(_rows(15))
+    assert writer.flush(timeout=10)
+    assert writer.stats()['dropped'] == 5
+    assert _names(partitions) == [f"p{i}" for i in range(5, 15)]
+    writer.close()
+    partitions.close()
+
+
+def test_close_writes_what_is_queued_and_refuses_more(tmp_path):
+    partitions = LogPartitions(str(tmp_path / "logs"))
+    writer = RecognitionLogWriter(partitions, max_batch=100, max_delay=30)
+    writer.put_many(_rows(5))
+    writer.close()
+    writer.close()
+    writer.put(_rows(1, first=5)[0])
+    assert writer.stats()['written'] == 5
+    assert writer.stats()['dropped'] == 1
+    assert len(_names(partitions)) == 5
+    partitions.close()
@@ -0,0 +1,73 @@
+import numpy as np
+
+import recog.motion_gate
+from recog.motion_gate import MotionGate
+
+ALICE = (40, 180, 90)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _gate(monkeypatch, **kwargs):
+    clock = _Clock()
+    monkeypatch.setattr(recog.motion_gate.time, 'time', clock)
+    return MotionGate(**kwargs), clock
+
+
+def test_static_frames_skip_detection(monkeypatch, draw_faces):
+    gate, clock = _gate(monkeypatch, max_skip_seconds=2.0)
+    still = draw_faces([(ALICE, 100, 100, 120)])
+    moved = draw_faces([(ALICE, 100, 220, 120)])
+
+    assert gate.check("cam", still)
+    clock.now += 0.1
+    assert not gate.check("cam", still)
+    # Cameras are gated independently
+    assert gate.check("other", still)
+    clock.now += 0.1
+    assert gate.check("cam", moved)
+
+    # Still frames are detected at least every max_skip_seconds
+    clock.now += 1.0
+    assert not gate.check("cam", moved)
+    clock.now += 1.5
+    assert gate.check("cam", moved)
+    assert gate.stats("cam") == {'frames': 5, 'skipped': 2, 'hit_rate': 0.4, 'idle_frames': 0, 'idle': False}
+
+
+def test_idle_camera_slows_down_until_motion(monkeypatch):
+    gate, clock = _gate(monkeypatch, idle_after=10.0, idle_interval=0.5)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    gate.check("cam", frame)
+    assert gate.frame_interval("cam", 0.05) == 0.05
+
+    clock.now += 11
+    gate.check("cam", frame)
+    assert gate.is_idle("cam")
+    assert gate.frame_interval("cam", 0.05) == 0.5
+
+    frame[100:200, 100:200] = 255
+    gate.check("cam", frame)
+    assert not gate.is_idle("cam")
+    assert gate.frame_interval("cam", 0.05) == 0.05
+
+
+def test_system_reuses_faces_on_static_frames(monkeypatch, make_system, face_photo, draw_faces, count_encodings):
+    gate, clock = _gate(monkeypatch)
+    system = make_system(motion_gate=gate)
+    system.add_known_face(face_photo(ALICE, 'alice'), "alice")
+    count_encodings['faces'] = 0
+
+    frame = draw_faces([(ALICE, 100, 100, 120)])
+    for _ in range(3):
+        clock.now += 0.1
+        _, results = system.process_frame(frame.copy(), "cam", annotate=False)
+        assert [(result['name'], result['location']) for result in results] == [("alice", (100, 220, 220, 100))]
+    assert count_encodings['faces'] == 1
+    assert system.get_motion_stats()["cam"]['skipped'] == 2
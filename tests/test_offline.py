@@ -0,0 +1,78 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+import recog.offline
+from recog.log_query import query_history
+from recog.offline import _chunk_frames, camera_id, expand_sources, plan_chunks, run_offline
+
+ALICE = (48, 176, 80)
+
+
+@pytest.fixture
+def in_process_pool(monkeypatch):
+    """Runs the offline pool on threads: spawned workers would not see the test face_recognition"""
+    def pool(max_workers, mp_context, initializer, initargs):
+        return ThreadPoolExecutor(max_workers, initializer=initializer, initargs=initargs)
+    monkeypatch.setattr(recog.offline, 'ProcessPoolExecutor', pool)
+
+
+def _video(path, frames, draw_faces, fps=10):
+    # Frame i shows the face i pixels further right
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (320, 240))
+    for i in range(frames):
+        writer.write(draw_faces([(ALICE, 40, 40 + 4 * i, 100)], shape=(240, 320)))
+    writer.release()
+    return path
+
+
+def _frame_number(frame):
+    columns = np.nonzero(frame[90].max(axis=1) > 100)[0]
+    return int(round((columns[0] - 40) / 4))
+
+
+def test_camera_id_of_sources():
+    assert camera_id("/recordings/door.mp4") == "door.mp4"
+    assert camera_id("/recordings/lobby/") == "lobby"
+    assert camera_id("/recordings/lobby/*.jpg") == "lobby"
+
+
+@pytest.mark.parametrize('seek_stride', [30, 2])
+def test_chunks_sample_the_same_frames_however_split(tmp_path, draw_faces, monkeypatch, seek_stride):
+    monkeypatch.setattr(recog.offline, 'SEEK_STRIDE', seek_stride)
+    path = _video(str(tmp_path / "door.avi"), 25, draw_faces)
+
+    chunks = plan_chunks(expand_sources([path]), stride=3, chunk_seconds=1)
+    # 10 frames per second, cut down to a multiple of the stride
+    assert [(start, end) for _, _, start, end, _ in chunks] == [(0, 9), (9, 18), (18, 25)]
+    sampled = [(index, _frame_number(frame)) for chunk in chunks for index, _, _, frame in _chunk_frames(chunk, 3)]
+    assert sampled == [(index, index) for index in range(0, 25, 3)]
+
+
+def test_image_sequence_is_one_camera_and_one_session(make_system, face_photo, draw_faces, tmp_path,
+                                                      monkeypatch, in_process_pool):
+    monkeypatch.setattr(recog.offline, 'IMAGES_PER_CHUNK', 2)
+    system = make_system(raw_logging=True)
+    system.add_known_face(face_photo(ALICE, 'alice'), "alice")
+
+    sequence = tmp_path / "lobby"
+    sequence.mkdir()
+    start = int(time.time()) - 600
+    for i in range(6):
+        path = str(sequence / f"{i:04d}.png")
+        cv2.imwrite(path, draw_faces([(ALICE, 100, 100 + 10 * i, 120)]))
+        os.utime(path, (start + i, start + i))
+
+    summary = run_offline(system, [str(sequence)], stride=1, workers=2)
+    assert (summary['chunks'], summary['frames'], summary['recognised']) == (3, 6, 6)
+
+    detections = list(query_history(system.log_partitions, kind='detections'))
+    assert len(detections) == 6
+    assert {row['camera_id'] for row in detections} == {"lobby"}
+    # Three chunks, one visit
+    sessions = list(query_history(system.log_partitions, kind='sessions'))
+    assert [(row['name'], row['camera_id'], row['frames']) for row in sessions] == [("alice", "lobby", 6)]
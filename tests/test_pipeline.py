@@ -0,0 +1,84 @@
+import time
+
+from recog.pipeline import DropOldestQueue, FrameItem, RecognitionPipeline
+
+ALICE = (40, 180, 90)
+
+
+class _FakeCapture:
+    def __init__(self, frames, delay=0.01):
+        self.frames = list(frames)
+        self.delay = delay
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return False
+
+    def read(self):
+        time.sleep(self.delay)
+        if not self.frames:
+            return False, None
+        return True, self.frames.pop(0)
+
+    def release(self):
+        pass
+
+
+def test_queue_drops_oldest_when_full():
+    queue = DropOldestQueue(2)
+    for item in range(5):
+        queue.put(item)
+    assert queue.dropped == 3
+    assert [queue.get(timeout=0), queue.get(timeout=0)] == [3, 4]
+    assert queue.get(timeout=0) is None
+
+    queue.put(5)
+    queue.close()
+    # Whatever was queued is still handed out after close
+    assert queue.get() == 5
+    assert queue.get() is None
+
+
+def test_overtaken_frames_are_dropped_after_the_parallel_stages(make_system, draw_faces):
+    system = make_system()
+    pipeline = RecognitionPipeline(system, source=_FakeCapture([]), camera_id="cam", use_processes=False)
+    frame = draw_faces([(ALICE, 100, 100, 120)])
+
+    def item(seq):
+        return FrameItem(seq, "cam", frame, time.time())
+
+    # Detection workers finished frame 2 before frame 1
+    assert pipeline._track(item(2)) is not None
+    assert pipeline._track(item(1)) is None
+    # Same for the encode workers in front of the match stage
+    assert pipeline._match(item(2)) is not None
+    assert pipeline._match(item(1)) is None
+    # Other cameras keep their own order
+    other = item(1)
+    other.camera_id = "other"
+    assert pipeline._match(other) is not None
+
+
+def test_pipeline_recognises_every_frame_in_order(make_system, face_photo, draw_faces):
+    system = make_system()
+    system.add_known_face(face_photo(ALICE, 'alice'), "alice")
+    frames = [draw_faces([(ALICE, 100, 100 + 10 * i, 120)]) for i in range(8)]
+    results = []
+    pipeline = RecognitionPipeline(system, source=_FakeCapture(frames, delay=0.05), camera_id="cam",
+                                   use_processes=False, latency_budget=None, encode_workers=3,
+                                   on_result=lambda frame, frame_results: results.append(frame_results))
+    pipeline.start()
+    try:
+        deadline = time.time() + 10
+        while not pipeline.finished and time.time() < deadline:
+            pipeline.read(timeout=0.1)
+    finally:
+        pipeline.stop()
+
+    assert results
+    assert all([result['name'] for result in frame_results] == ["alice"] for frame_results in results)
+    # Rendered in capture order, whatever the encode workers did
+    lefts = [frame_results[0]['location'][3] for frame_results in results]
+    assert lefts == sorted(lefts)
@@ -0,0 +1,68 @@
+from recog.quality_governor import DEFAULT_LEVEL, QUALITY_LADDER, QualityGovernor
+
+ALICE = (48, 176, 80)
+
+
+def _windows(governor, seconds, count, camera_id="cam"):
+    """Record `count` full windows of frames taking `seconds`, return the settings changes"""
+    return [governor.record(camera_id, seconds) for _ in range(count * governor.window)].count(True)
+
+
+def test_slow_camera_steps_down_one_rung_at_a_time():
+    governor = QualityGovernor(target_fps=10, window=5)
+    assert governor.settings("cam") == QUALITY_LADDER[DEFAULT_LEVEL]
+
+    assert _windows(governor, 0.2, 1) == 1
+    assert governor.level("cam") == DEFAULT_LEVEL + 1
+    # The window after a change mixes both settings and is not judged
+    assert _windows(governor, 0.2, 1) == 0
+    assert _windows(governor, 0.2, 1) == 1
+    assert governor.level("cam") == DEFAULT_LEVEL + 2
+
+    # Never past the last rung
+    _windows(governor, 0.2, 20)
+    assert governor.level("cam") == len(QUALITY_LADDER) - 1
+    # Other cameras are not affected
+    assert governor.level("other") == DEFAULT_LEVEL
+
+
+def test_fast_camera_steps_up_after_patience():
+    governor = QualityGovernor(target_fps=10, window=5, up_patience=3)
+    assert _windows(governor, 0.01, 2) == 0
+    assert _windows(governor, 0.01, 1) == 1
+    assert governor.level("cam") == DEFAULT_LEVEL - 1
+
+    # Within the budget but not fast enough to step up: stays put
+    assert _windows(governor, 0.08, 10) == 0
+    assert governor.level("cam") == DEFAULT_LEVEL - 1
+
+
+def test_rung_that_was_too_slow_is_blocked_for_a_while():
+    governor = QualityGovernor(target_fps=10, window=5, up_patience=1)
+    _windows(governor, 0.2, 1)
+    assert governor.level("cam") == DEFAULT_LEVEL + 1
+
+    # Fast again, but the rung it left is blocked for 4 windows
+    # (the first of them would be skipped after the change anyway)
+    changes = [_windows(governor, 0.01, 1) for _ in range(4)]
+    assert changes == [0, 0, 0, 1]
+    assert governor.level("cam") == DEFAULT_LEVEL
+
+    # Failing on it again doubles the wait
+    _windows(governor, 0.01, 1)  # skipped window after the change
+    _windows(governor, 0.2, 1)
+    assert governor.level("cam") == DEFAULT_LEVEL + 1
+    changes = [_windows(governor, 0.01, 1) for _ in range(8)]
+    assert changes == [0] * 7 + [1]
+    assert governor.stats()["cam"]['changes'] == 4
+
+
+def test_system_follows_the_governor(make_system, face_photo, draw_faces):
+    governor = QualityGovernor(start_level=0)
+    system = make_system(governor=governor)
+    system.add_known_face(face_photo(ALICE, 'alice'), "alice")
+
+    _, results = system.process_frame(draw_faces([(ALICE, 100, 100, 120)]), "cam", annotate=False)
+    # Detected at 0.5x, reported in frame coordinates
+    assert [(result['name'], result['location']) for result in results] == [("alice", (100, 220, 220, 100))]
+    assert governor.stats()["cam"]['scale'] == 0.5
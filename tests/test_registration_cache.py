@@ -0,0 +1,52 @@
+import shutil
+
+import cv2
+import numpy as np
+
+from recog.registration_cache import RegistrationCache, file_hash, settings_key
+
+ALICE = (48, 176, 80)
+
+
+def test_entries_are_keyed_by_content_and_settings(tmp_path):
+    cache = RegistrationCache(str(tmp_path / "cache.db"))
+    hog = settings_key(use='add_known_face', model='hog', num_jitters=1)
+    cnn = settings_key(use='add_known_face', model='cnn', num_jitters=1)
+    encoding = np.linspace(-1, 1, 128)
+    cache.put("abc", hog, 'ok', (1, 2, 3, 4), encoding)
+    cache.put("empty", hog, 'no_face', None, None)
+
+    status, box, cached = cache.get("abc", hog)
+    assert (status, box) == ('ok', (1, 2, 3, 4)) and np.array_equal(cached, encoding)
+    # Other settings or other content miss
+    assert cache.get("abc", cnn) is None
+    assert cache.get("abd", hog) is None
+    assert cache.get_many(["abc", "empty", "abd"], hog)["empty"] == ('no_face', None, None)
+
+    cache.put("abc", cnn, 'ok', (1, 2, 3, 4), encoding)
+    assert cache.prune(hog) == 1
+    assert cache.get("abc", cnn) is None
+    assert cache.stats()['entries'] == 2
+    cache.close()
+
+
+def test_file_hash_follows_content_not_name(tmp_path, draw_faces):
+    first, copy, other = (str(tmp_path / name) for name in ("a.png", "b.png", "c.png"))
+    cv2.imwrite(first, draw_faces([(ALICE, 100, 100, 120)]))
+    shutil.copy(first, copy)
+    cv2.imwrite(other, draw_faces([(ALICE, 100, 104, 120)]))
+    assert file_hash(first) == file_hash(copy) != file_hash(other)
+
+
+def test_system_reencodes_only_when_settings_change(make_system, face_photo, count_encodings):
+    system = make_system()
+    photo = face_photo(ALICE, 'alice')
+    assert system.add_known_face(photo, "alice")
+    assert system.add_known_face(photo, "alice")
+    assert count_encodings['faces'] == 1
+
+    # More jitters give a different encoding, the cached one no longer applies
+    system.num_jitters = 5
+    assert system.add_known_face(photo, "alice")
+    assert count_encodings['faces'] == 2
+    assert system.registration_cache.stats()['entries'] == 2
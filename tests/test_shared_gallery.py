@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+
+from recog.gallery import FaceGallery
+from recog.shared_gallery import SharedMemoryIndex
+
+
+def _encodings(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, 128)).astype(np.float32)
+
+
+def _assert_same(index, gallery, queries):
+    expected = gallery.match(queries)
+    got = index.search(queries)
+    assert list(got[0]) == list(expected[0])
+    assert list(got[2]) == list(expected[2])
+    # float32 cancellation: self-distances come out anywhere near 0
+    assert np.allclose(got[1], expected[1], atol=5e-2)
+    assert np.allclose(got[3], expected[3], atol=5e-2)
+
+
+def test_matches_brute_force_through_changes():
+    gallery = FaceGallery()
+    gallery.extend(_encodings(300), [f"p{i}" for i in range(300)])
+    index = SharedMemoryIndex(n_workers=3, min_shared_size=0)
+    index.attach(gallery)
+    # A second index in the same process gets blocks of its own
+    other = SharedMemoryIndex(n_workers=1, min_shared_size=0)
+    other.attach(gallery)
+    try:
+        queries = np.concatenate([gallery.encodings[[0, 150, 299]], _encodings(5, seed=1)])
+        _assert_same(index, gallery, queries)
+        _assert_same(other, gallery, queries)
+        assert index.prefix != other.prefix
+
+        # Tombstones and appends are synced into the published block
+        gallery.remove_names(["p0", "p150"])
+        gallery.extend(_encodings(3, seed=2), ["late0", "late1", "late2"])
+        _assert_same(index, gallery, np.concatenate([queries, _encodings(3, seed=2)]))
+
+        # A compaction renumbers the rows and republishes
+        gallery.compact(threading.Lock())
+        _assert_same(index, gallery, queries)
+    finally:
+        index.close()
+        other.close()
+
+
+def test_small_gallery_is_matched_in_process():
+    gallery = FaceGallery()
+    gallery.extend(_encodings(10), [f"p{i}" for i in range(10)])
+    index = SharedMemoryIndex(n_workers=2, min_shared_size=100)
+    index.attach(gallery)
+    best, _, _, _ = index.search(gallery.encodings[[4]])
+    assert best[0] == 4
+    assert index._workers == []
+    index.close()
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from recog.sightings import SightingSessionizer
+
+T0 = datetime(2026, 10, 18, 9, 0, 0)
+
+
+def _at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+def test_gap_splits_sessions():
+    sessions = SightingSessionizer(gap=5.0)
+    assert sessions.observe("alice", "cam", 0.8, _at(0)) == []
+    assert sessions.observe("alice", "cam", 0.6, _at(3)) == []
+
+    closed = sessions.observe("alice", "cam", 0.9, _at(10))
+    assert len(closed) == 1
+    name, camera_id, first_seen, last_seen, frames, max_confidence, avg_confidence = closed[0]
+    assert (name, camera_id, frames) == ("alice", "cam", 2)
+    assert last_seen - first_seen == 3
+    assert max_confidence == pytest.approx(0.8)
+    assert avg_confidence == pytest.approx(0.7)
+
+    assert [row[4] for row in sessions.flush()] == [1]
+
+
+def test_cameras_and_names_are_separate_sessions():
+    sessions = SightingSessionizer(gap=5.0)
+    sessions.observe("alice", "cam1", 0.8, _at(0))
+    sessions.observe("alice", "cam2", 0.8, _at(0))
+    sessions.observe("bob", "cam1", 0.8, _at(1))
+    assert sorted((row[0], row[1]) for row in sessions.flush()) == [
+        ("alice", "cam1"), ("alice", "cam2"), ("bob", "cam1")]
+
+
+def test_faces_of_one_frame_count_once():
+    sessions = SightingSessionizer(gap=5.0)
+    sessions.observe("Unknown", "cam", 0.0, _at(0))
+    sessions.observe("Unknown", "cam", 0.0, _at(0))
+    sessions.observe("Unknown", "cam", 0.0, _at(1))
+    assert [row[4] for row in sessions.flush()] == [2]
+
+
+def test_max_duration_and_expiry():
+    sessions = SightingSessionizer(gap=5.0, max_duration=10.0)
+    closed = []
+    for second in range(0, 25, 2):
+        closed += sessions.observe("alice", "cam", 0.9, _at(second))
+    assert [row[4] for row in closed] == [5, 5]
+
+    assert sessions.expire(now=_at(26)) == []
+    assert [row[4] for row in sessions.expire(now=_at(40))] == [3]
+    assert sessions.flush() == []
+
+
+def test_offline_chunks_merge_into_one_session():
+    from recog.offline import _SourceSessions
+
+    chunks = [('video', 'hall.mp4', 0, 250, 25), ('video', 'hall.mp4', 250, 500, 25),
+              ('video', 'door.mp4', 0, 250, 25)]
+    merger = _SourceSessions(SightingSessionizer(gap=5.0), chunks)
+
+    def rows(source, frames):
+        return [{'source': source, 'frame': frame, 'name': "alice", 'confidence': 0.9,
+                 'timestamp': _at(frame / 25)} for frame in frames]
+
+    # The second chunk finishes first and waits for the first one
+    assert merger.add(1, rows('hall.mp4', range(250, 300, 5))) == []
+    closed = merger.add(0, rows('hall.mp4', range(200, 250, 5)))
+    assert [(row[1], row[4]) for row in closed] == [("hall.mp4", 20)]
+
+    # A failed chunk still completes its source
+    assert merger.add(2, []) == []